@@ -1,10 +1,222 @@
-from openai_client import llm
+import functools
+
+from openai_client import llm, allm
+from structured import llm_json, allm_json
+
+
+class Prompt:
+    """An agent's system/user prompt plus llm() options, sent by the agent or awaited via agent.arun."""
+
+    def __init__(self, system, user, **options):
+        self.system = system
+        self.user = user
+        self.options = options
+
+    def run(self):
+        return llm(self.system, self.user, **self.options)
+
+    async def arun(self):
+        return await allm(self.system, self.user, **self.options)
+
+
+class JSONPrompt(Prompt):
+    """A Prompt answered through llm_json() (schema, check and repair retries)."""
+
+    def run(self):
+        return llm_json(self.system, self.user, **self.options)
+
+    async def arun(self):
+        return await allm_json(self.system, self.user, **self.options)
+
+
+def agent(build):
+    """Make an agent from a function building its Prompt.
+
+    Calling the agent returns the model's text; `await agent.arun(...)` does the same
+    on the event loop, and `agent.prompt(...)` returns the Prompt without calling the model.
+    """
+    @functools.wraps(build)
+    def run(*args, **kwargs):
+        return build(*args, **kwargs).run()
+
+    async def arun(*args, **kwargs):
+        return await build(*args, **kwargs).arun()
+
+    run.arun = arun
+    run.prompt = build
+    return run
+
 
 def lang_rule(lang):
     return "Respond in Swedish." if lang == "sv" else "Respond in English."
 
 
 
+@agent
+def extract_maps(cv, job, role, lang):
+    system = f"You are an extraction agent that turns a CV and a job posting into compact structured maps. {lang_rule(lang)} Output STRICT JSON only."
+    user = f'''
+Return JSON ONLY with this schema:
+{{
+  "job_map": {{
+    "title": "job title",
+    "seniority": "junior|mid|senior|lead|unknown",
+    "must_have": ["required skills/experience, one short item each"],
+    "nice_to_have": ["preferred skills/experience"],
+    "responsibilities": ["main duties"],
+    "tools": ["technologies, tools, methods"],
+    "languages": ["spoken/written language requirements"],
+    "eligibility": ["citizenship/clearance/sponsorship/degree/certification/location constraints"],
+    "culture_signals": ["team, values and working-style signals"]
+  }},
+  "candidate_map": {{
+    "headline": "one-line professional summary",
+    "years_experience": "number or range as stated/derivable",
+    "roles": [{{"title": "...", "employer": "...", "period": "...", "highlights": ["achievements with any stated metrics"]}}],
+    "skills": ["..."],
+    "tools": ["..."],
+    "education": ["..."],
+    "certifications": ["..."],
+    "languages": ["..."],
+    "eligibility_statements": ["explicit citizenship/work permit/clearance statements"]
+  }}
+}}
+
+Rules:
+- Only include facts explicitly present in the texts. Do NOT infer or invent.
+- Keep items short (max ~15 words) and keep stated numbers exactly.
+- Use empty lists when nothing is stated.
+
+ROLE: {role}
+
+CV:
+{cv}
+
+JOB:
+{job}
+'''
+    return JSONPrompt(system, user, agent="extract_maps", schema=MAPS_SCHEMA, check=check_maps)
+
+
+# JSON schemas sent as response_format (strict mode: every property required, no extras).
+GATE_FIELDS = {
+    "type": {"type": "string", "enum": [
+        "citizenship", "right_to_work", "security_clearance", "no_sponsorship", "degree",
+        "certification", "residency", "location", "language", "other"]},
+    "requirement": {"type": "string"},
+    "severity": {"type": "string", "enum": ["hard_gate", "strong_preference", "unknown"]},
+    "evidence_quote": {"type": "string"},
+    "cv_evidence_status": {"type": "string", "enum": ["satisfied", "unclear", "missing"]},
+    "recommended_action": {"type": "string"},
+}
+# The job-side half of a gate, before any CV is checked against it.
+JOB_GATE_FIELDS = ("type", "requirement", "severity", "evidence_quote")
+
+
+def _gates_schema(fields):
+    return {
+        "type": "object",
+        "properties": {
+            "hard_gates": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {f: GATE_FIELDS[f] for f in fields},
+                    "required": list(fields),
+                    "additionalProperties": False,
+                },
+            },
+        },
+        "required": ["hard_gates"],
+        "additionalProperties": False,
+    }
+
+
+HARD_GATES_SCHEMA = _gates_schema(list(GATE_FIELDS))
+JOB_GATES_SCHEMA = _gates_schema(JOB_GATE_FIELDS)
+
+_STRING_LIST = {"type": "array", "items": {"type": "string"}}
+
+MATCH_SCHEMA = {
+    "type": "object",
+    "properties": {
+        # match_score first, so a streamed answer yields the score before the lists.
+        "match_score": {"type": "integer"},
+        "blockers": _STRING_LIST,
+        "critical_gaps": _STRING_LIST,
+        "moderate_gaps": _STRING_LIST,
+        "minor_gaps": _STRING_LIST,
+        "evidence_quality": {"type": "string", "enum": ["strong", "medium", "weak"]},
+        "timeline_risk": {"type": "string", "enum": ["low", "medium", "high"]},
+        "short_rationale": {"type": "string"},
+    },
+    "required": ["match_score", "blockers", "critical_gaps", "moderate_gaps", "minor_gaps",
+                 "evidence_quality", "timeline_risk", "short_rationale"],
+    "additionalProperties": False,
+}
+
+
+def _object(properties):
+    return {"type": "object", "properties": properties, "required": list(properties), "additionalProperties": False}
+
+
+MAPS_SCHEMA = _object({
+    "job_map": _object({
+        "title": {"type": "string"},
+        "seniority": {"type": "string", "enum": ["junior", "mid", "senior", "lead", "unknown"]},
+        **{f: _STRING_LIST for f in ("must_have", "nice_to_have", "responsibilities", "tools", "languages",
+                                     "eligibility", "culture_signals")},
+    }),
+    "candidate_map": _object({
+        "headline": {"type": "string"},
+        "years_experience": {"type": "string"},
+        "roles": {"type": "array", "items": _object({
+            "title": {"type": "string"},
+            "employer": {"type": "string"},
+            "period": {"type": "string"},
+            "highlights": _STRING_LIST,
+        })},
+        **{f: _STRING_LIST for f in ("skills", "tools", "education", "certifications", "languages",
+                                     "eligibility_statements")},
+    }),
+})
+
+
+# Sections answered together by consolidated_sections, keyed by the agent that answers each alone.
+# hireability_score is not one of them: no /run step calls it; the hire section is explain_hireability,
+# computed from the match without a call of its own.
+CONSOLIDATED_SECTIONS = ("requirement_intelligence", "recruiter_psychology", "interview_pack")
+CONSOLIDATED_SCHEMA = _object({key: {"type": "string"} for key in CONSOLIDATED_SECTIONS})
+
+
+def check_consolidated(data):
+    # Empty sections are fine here: the pipeline calls that section's own agent instead.
+    for key in CONSOLIDATED_SECTIONS:
+        if not isinstance(data.get(key), str):
+            raise ValueError(f"'{key}' must be a string")
+
+
+def check_maps(data):
+    for key in ("job_map", "candidate_map"):
+        if not isinstance(data.get(key), dict) or not data[key]:
+            raise ValueError(f"'{key}' must be a non-empty object")
+
+
+def check_hard_gates(data):
+    if not isinstance(data.get("hard_gates"), list):
+        raise ValueError("'hard_gates' must be a list")
+
+
+def check_match(data):
+    try:
+        score = int(data.get("match_score"))
+    except (TypeError, ValueError):
+        raise ValueError("'match_score' must be an integer")
+    if not 0 <= score <= 100:
+        raise ValueError("'match_score' must be between 0 and 100")
+
+
+@agent
 def hard_gate_extract(cv, job, role, lang):
     system = f"You are an automated hiring system (ATS) focusing on eligibility and knockout gates. {lang_rule(lang)} Output STRICT JSON only."
     user = f'''
@@ -42,9 +254,80 @@ CV:
 JOB:
 {job}
 '''
-    return llm(system, user)
+    return JSONPrompt(system, user, agent="hard_gate_extract", schema=HARD_GATES_SCHEMA, check=check_hard_gates)
+
+@agent
+def job_gate_extract(job, lang):
+    """Job-side half of hard_gate_extract: the posting's eligibility constraints, no CV involved."""
+    system = f"You are an automated hiring system (ATS) focusing on eligibility and knockout gates. {lang_rule(lang)} Output STRICT JSON only."
+    user = f'''
+Extract ALL eligibility constraints / hard gates from the JOB posting.
+
+Return JSON ONLY with this schema:
+{{
+  "hard_gates": [
+    {{
+      "type": "citizenship|right_to_work|security_clearance|no_sponsorship|degree|certification|residency|location|language|other",
+      "requirement": "short requirement statement",
+      "severity": "hard_gate|strong_preference|unknown",
+      "evidence_quote": "verbatim quote from the JOB (max 25 words)"
+    }}
+  ]
+}}
+
+Rules:
+- Only use evidence_quote from the JOB text.
+- Include language requirements (e.g., fluent Swedish/English) when stated as required/mandatory.
+- Use severity="hard_gate" only when the job says required/mandatory/must. Use strong_preference for "preferred/plus".
+- Use an empty list when the job states no such constraints.
+
+JOB:
+{job}
+'''
+    return JSONPrompt(system, user, agent="job_gate_extract", schema=JOB_GATES_SCHEMA, check=check_hard_gates)
+
+
+@agent
+def cv_gate_check(cv, job_gates_json, role, lang):
+    """CV-side half of hard_gate_extract: check a CV against gates already extracted from the job."""
+    system = f"You are an automated hiring system (ATS) focusing on eligibility and knockout gates. {lang_rule(lang)} Output STRICT JSON only."
+    user = f'''
+Check whether the CV explicitly satisfies each hard gate extracted from the job posting.
+
+Return JSON ONLY with this schema, with one entry per input gate, copying type, requirement, severity and evidence_quote unchanged:
+{{
+  "hard_gates": [
+    {{
+      "type": "...",
+      "requirement": "...",
+      "severity": "...",
+      "evidence_quote": "...",
+      "cv_evidence_status": "satisfied|unclear|missing",
+      "recommended_action": "what the candidate should do next"
+    }}
+  ]
+}}
+
+Rules:
+- Do NOT guess candidate eligibility beyond what is explicitly in the CV.
+- For cv_evidence_status:
+  - satisfied: CV explicitly states it (e.g., language skills, citizenship/work authorization, certifications)
+  - unclear: not stated in CV
+  - missing: CV contradicts or clearly lacks a required item (e.g., "needs sponsorship" while job says no sponsorship)
+
+HARD GATES (JSON):
+{job_gates_json}
+
+ROLE: {role}
+
+CV:
+{cv}
+'''
+    return JSONPrompt(system, user, agent="cv_gate_check", schema=HARD_GATES_SCHEMA, check=check_hard_gates)
 
-def recruiter_match(cv, job, role, lang, hard_gates_json=None):
+
+@agent
+def recruiter_match(cv, job, role, lang, hard_gates_json=None, on_field=None):
     system = f"You are a recruiter and ATS screener. Be realistic and strict. {lang_rule(lang)} Output STRICT JSON only (no markdown)."
     user = f'''
 Return JSON only with this schema:
@@ -76,18 +359,22 @@ CV:
 JOB:
 {job}
 '''
-    return llm(system, user)
+    return JSONPrompt(system, user, agent="recruiter_match", schema=MATCH_SCHEMA, check=check_match,
+                      on_field=on_field)
+@agent
 def optimize_cv(cv, match, lang):
-    return llm(
+    return Prompt(
         f"You are a CV strategist. Use X-Y-Z bullets when possible. Do not invent metrics. {lang_rule(lang)}",
         f"""Rewrite CV experience based on: {match}
 
 CV:
 {cv}
-"""
+""",
+        agent="optimize_cv"
     )
+@agent
 def ats_audit(cv, job, role, lang, hard_gates_json=None):
-    return llm(
+    return Prompt(
         f"You are an ATS system similar to SmartRecruiters/Workday. Audit parsing, screening, and hard gates. {lang_rule(lang)}",
         f'''Return a structured report with these sections:
 1) Eligibility & Hard Gates (citizenship/right-to-work/clearance/no sponsorship/degree/certs/location). Use evidence quotes from the JOB.
@@ -106,11 +393,13 @@ CV (optimized experience section or ATS version):
 
 JOB:
 {job}
-'''
+''',
+        agent="ats_audit"
     )
 
+@agent
 def ats_submission(cv, job, role, lang, hard_gates_json=None):
-    return llm(
+    return Prompt(
         f"You generate an ATS submission CV. One column. Standard headings. No tables/icons. {lang_rule(lang)}",
         f'''Create an ATS submission CV that targets the JOB requirements without inventing facts.
 - Use headings: Summary, Skills, Work Experience, Education, Certifications (if present)
@@ -127,35 +416,74 @@ CV:
 
 JOB:
 {job}
-'''
+''',
+        agent="ats_submission"
     )
 
+@agent
 def interview_pack(cv, job, role, lang):
-    return llm(
+    return Prompt(
         f"You are a hiring manager. {lang_rule(lang)}",
-        f"Generate technical, HR and strategic questions. CV:{cv} JOB:{job} ROLE:{role}"
+        f"Generate technical, HR and strategic questions. CV:{cv} JOB:{job} ROLE:{role}",
+        agent="interview_pack"
     )
 
+@agent
 def requirement_intelligence(cv, job, role, lang):
-    return llm(
+    return Prompt(
         f"You analyze job deeply. {lang_rule(lang)}",
-        f"Break job into core skills, hidden signals, seniority expectations and alignment. CV:{cv} JOB:{job} ROLE:{role}"
+        f"Break job into core skills, hidden signals, seniority expectations and alignment. CV:{cv} JOB:{job} ROLE:{role}",
+        agent="requirement_intelligence"
     )
 
+@agent
 def hireability_score(cv, job, role, lang):
-    return llm(
+    return Prompt(
         f"You calculate hireability score. {lang_rule(lang)}",
-        f"Return numeric hireability score (0-100) and explanation. CV:{cv} JOB:{job} ROLE:{role}"
+        f"Return numeric hireability score (0-100) and explanation. CV:{cv} JOB:{job} ROLE:{role}",
+        agent="hireability_score"
     )
 
+@agent
 def recruiter_psychology(cv, job, role, lang):
-    return llm(
+    return Prompt(
         f"You simulate recruiter psychology. {lang_rule(lang)}",
-        f"Simulate recruiter reaction. CV:{cv} JOB:{job} ROLE:{role}"
+        f"Simulate recruiter reaction. CV:{cv} JOB:{job} ROLE:{role}",
+        agent="recruiter_psychology"
     )
 
-def culture_analysis(company, culture, reviews, lang):
-    return llm(
+@agent
+def consolidated_sections(cv, job, role, lang):
+    system = f"You are a hiring panel: job analyst, recruiter and hiring manager. {lang_rule(lang)} Output STRICT JSON only (no markdown)."
+    user = f'''
+Return JSON ONLY with this schema (each value is a plain-text report, use \\n for line breaks):
+{{
+  "requirement_intelligence": "Break the job into core skills, hidden signals, seniority expectations and alignment with the CV.",
+  "recruiter_psychology": "Simulate the recruiter's reaction to this CV for this job.",
+  "interview_pack": "Technical, HR and strategic interview questions for this candidate and job."
+}}
+
+Rules:
+- Fill every key with a complete report; never leave one empty.
+- Do NOT invent facts not present in the CV or JOB.
+
+ROLE: {role}
+
+CV:
+{cv}
+
+JOB:
+{job}
+'''
+    return JSONPrompt(system, user, agent="consolidated_sections", schema=CONSOLIDATED_SCHEMA,
+                      check=check_consolidated)
+
+
+@agent
+def culture_analysis(company, culture, reviews, lang, cache=True):
+    return Prompt(
         f"You analyze company culture alignment. {lang_rule(lang)}",
-        f"Compare official culture vs employee reviews and identify risks. Company:{company} Official:{culture} Reviews:{reviews}"
+        f"Compare official culture vs employee reviews and identify risks. Company:{company} Official:{culture} Reviews:{reviews}",
+        cache=cache,
+        agent="culture_analysis"
     )
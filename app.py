@@ -1,30 +1,25 @@
 import os
-import re
 import json
-from io import BytesIO
-from typing import Any, Dict, Tuple, Optional
+import uuid
+import queue
+import threading
+from typing import Any, Optional, Tuple
 
-from flask import Flask, render_template, request, session, redirect, url_for, send_file
+from flask import Flask, Response, render_template, request, session, redirect, url_for, send_file, stream_with_context
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 
 from translations import translations
-from job_fetcher import fetch_job_from_url, fetch_job_preview
-from pdf_report import build_pdf_report
-
-from agents import (
-    requirement_intelligence,
-    ats_audit,
-    recruiter_match,
-    recruiter_psychology,
-    optimize_cv,
-    ats_submission,
-    interview_pack,
-    culture_analysis,
-    hard_gate_extract,
-)
-
-from openai_client import llm
+from job_fetcher import fetch_job_preview, require_job_text
+from reports import schedule_reports, get_report
+from pipeline import run_analysis, dashboard_sections, progress_events, partial_events
+from jobs import submit as submit_run, queue_depth, QueueFull
+from run_store import get_run, create_run, update_run, save_result
+from metrics import render as render_metrics
+from batch import run_batch, normalize_items, as_jsonl, as_csv, BATCH_MAX_PAIRS
+from culture import precompute as precompute_culture
+from shared_state import get_state, secret_key, limiter_storage_uri
+from singleflight import run_key, claim_run, release_run
 
 
 # -----------------------------
@@ -33,275 +28,31 @@ from openai_client import llm
 
 ACCESS_PASSWORD = os.getenv("ACCESS_PASSWORD", "1234")
 
+# "sync" runs the pipeline inside the request; "queue" hands it to the background workers.
+RUN_MODE = os.getenv("RUN_MODE", "sync").strip().lower()
+QUEUE_RETRY_AFTER_SECONDS = 30
+
 
 def get_t(lang: str) -> dict:
     lang = (lang or "en").lower()
     return translations.get(lang, translations["en"])
 
 
-def parse_json_with_repair(raw: Any) -> dict:
-    """Parse JSON from LLM. Lightweight repair: extract first {...} block."""
-    if raw is None:
-        return {}
-    if isinstance(raw, dict):
-        return raw
-    s = str(raw).strip()
-    try:
-        return json.loads(s)
-    except Exception:
-        m = re.search(r"\{.*\}", s, re.DOTALL)
-        if m:
-            try:
-                return json.loads(m.group(0))
-            except Exception:
-                return {}
-        return {}
-
-
-def apply_hard_gate_caps(score: int, hard_gate_status: str) -> int:
-    try:
-        score = int(score)
-    except Exception:
-        return score
-    if hard_gate_status == "fail":
-        return min(score, 25)
-    if hard_gate_status == "risk":
-        return min(score, 45)
-    return score
-
-
-def compute_hard_gate_status(hard_gates_output: Any) -> str:
-    """Return 'clear' | 'risk' | 'fail' from hard-gates output."""
-    if hard_gates_output is None:
-        return "clear"
-
-    gates = []
-    if isinstance(hard_gates_output, list):
-        gates = hard_gates_output
-    elif isinstance(hard_gates_output, dict):
-        gates = hard_gates_output.get("hard_gates") or []
-    else:
-        data = parse_json_with_repair(hard_gates_output)
-        if isinstance(data, dict):
-            gates = data.get("hard_gates") or []
-        elif isinstance(data, list):
-            gates = data
-
-    # gates are dicts like {"gate": "...", "status":"pass|risk|fail", ...}
-    status_rank = {"clear": 0, "pass": 0, "risk": 1, "fail": 2}
-    worst = 0
-    for g in gates or []:
-        if not isinstance(g, dict):
-            continue
-        s = (g.get("status") or "").lower().strip()
-        worst = max(worst, status_rank.get(s, 0))
-    return "fail" if worst == 2 else ("risk" if worst == 1 else "clear")
-
-
-def extract_score_fallback(text: str, kind: str = "match") -> int:
-    """Fallback extraction if JSON missing; avoids crashing."""
-    if not text:
-        return 0
-    # Find last percentage-like number
-    nums = re.findall(r"\b(\d{1,3})\b", str(text))
-    for n in reversed(nums):
-        try:
-            v = int(n)
-            if 0 <= v <= 100:
-                return v
-        except Exception:
-            continue
-    return 0
-
-
-# -----------------------------
-# Deterministic hireability model
-# -----------------------------
-
-def compute_penalties(match_data: dict) -> Tuple[int, dict]:
-    critical = match_data.get("critical_gaps") or []
-    moderate = match_data.get("moderate_gaps") or []
-    minor = match_data.get("minor_gaps") or []
-
-    crit_pen = 15 * len(critical)
-    mod_pen = 7 * len(moderate)
-    min_pen = 3 * len(minor)
-
-    evq = (match_data.get("evidence_quality") or "medium").lower()
-    tl = (match_data.get("timeline_risk") or "low").lower()
-
-    ev_pen = 0 if evq == "strong" else (5 if evq == "medium" else 10)
-    tl_pen = 0 if tl == "low" else (5 if tl == "medium" else 10)
-
-    total = crit_pen + mod_pen + min_pen + ev_pen + tl_pen
-    total = max(0, min(total, 90))
-
-    breakdown = {
-        "critical_gaps": len(critical),
-        "moderate_gaps": len(moderate),
-        "minor_gaps": len(minor),
-        "critical_penalty": crit_pen,
-        "moderate_penalty": mod_pen,
-        "minor_penalty": min_pen,
-        "evidence_quality": evq,
-        "evidence_penalty": ev_pen,
-        "timeline_risk": tl,
-        "timeline_penalty": tl_pen,
-        "total_penalty": total,
-    }
-    return total, breakdown
-
-
-def compute_hireability_from_match(match_score: int, match_data: dict, hard_gate_status: str) -> Tuple[int, dict]:
-    penalties, breakdown = compute_penalties(match_data)
-    raw = max(0, min(100, int(match_score) - penalties))
-
-    capped = raw
-    if hard_gate_status == "fail":
-        capped = min(capped, 25)
-    elif hard_gate_status == "risk":
-        capped = min(capped, 45)
-
-    breakdown["raw_hireability"] = raw
-    breakdown["final_hireability"] = capped
-    breakdown["hard_gate_status"] = hard_gate_status
-    return capped, breakdown
-
-
-# -----------------------------
-# Layer 2: deterministic explanation (A + B)
-# -----------------------------
-
-def build_hireability_sections(match_score: int, hire_score: int, match_data: dict, breakdown: dict) -> str:
-    crit = breakdown.get("critical_gaps", 0)
-    mod = breakdown.get("moderate_gaps", 0)
-    minor = breakdown.get("minor_gaps", 0)
-    evq = breakdown.get("evidence_quality", "medium")
-    tlr = breakdown.get("timeline_risk", "low")
-    total_pen = breakdown.get("total_penalty", 0)
-    hard_gate_status = breakdown.get("hard_gate_status", "clear")
-
-    if hire_score >= 75:
-        summary_line = "Overall likelihood of progressing is strong."
-    elif hire_score >= 50:
-        summary_line = "Overall likelihood of progressing is moderate."
-    elif hire_score >= 30:
-        summary_line = "Overall likelihood of progressing is limited due to significant gaps."
-    else:
-        summary_line = "Overall likelihood of progressing is low due to major misalignment or blockers."
-
-    hard_gate_note = ""
-    if hard_gate_status == "fail":
-        hard_gate_note = "Eligibility hard gate status is FAIL. This typically stops the application from progressing regardless of fit."
-    elif hard_gate_status == "risk":
-        hard_gate_note = "Eligibility hard gate status is RISK (unclear). This can materially reduce the chance of progressing until clarified."
-
-    def bullets(items, maxn=6):
-        items = [str(x).strip() for x in (items or []) if str(x).strip()]
-        return "\n".join([f"- {x}" for x in items[:maxn]]) if items else "- None identified"
-
-    blockers = match_data.get("blockers") or []
-    critical_list = match_data.get("critical_gaps") or []
-    moderate_list = match_data.get("moderate_gaps") or []
-    minor_list = match_data.get("minor_gaps") or []
-
-    a = []
-    a.append("Section A: Executive Summary (Narrative)")
-    a.append("")
-    a.append(f"The Recruiter Match Score for this role is {match_score}/100, indicating alignment between job requirements and CV evidence.")
-    a.append(f"The Hireability Score for this role is {hire_score}/100.")
-    a.append("")
-    a.append(f"Key drivers: {crit} critical gap(s), {mod} moderate gap(s), and {minor} minor issue(s). Evidence quality is {evq} and timeline risk is {tlr}.")
-    if blockers:
-        a.append("Notable blockers identified by the recruiter assessment:")
-        a.append(bullets(blockers, 4))
-    if hard_gate_note:
-        a.append("")
-        a.append(hard_gate_note)
-    a.append("")
-    a.append(summary_line)
-
-    b = []
-    b.append("Section B: Scoring Breakdown (Technical)")
-    b.append("")
-    b.append(f"Base fit (Recruiter Match): {match_score}/100")
-    b.append(f"Total penalties applied: {total_pen}")
-    b.append("")
-    b.append("Penalty breakdown:")
-    b.append(f"- Critical gaps: {crit} × 15 = {breakdown.get('critical_penalty', 0)}")
-    b.append(f"- Moderate gaps: {mod} × 7 = {breakdown.get('moderate_penalty', 0)}")
-    b.append(f"- Minor issues: {minor} × 3 = {breakdown.get('minor_penalty', 0)}")
-    b.append(f"- Evidence quality ({evq}): {breakdown.get('evidence_penalty', 0)}")
-    b.append(f"- Timeline risk ({tlr}): {breakdown.get('timeline_penalty', 0)}")
-    b.append("")
-    b.append(f"Hireability = Match ({match_score}) − Penalties ({total_pen}) (then hard-gate caps if applicable).")
-    b.append("")
-    b.append("Critical gaps:")
-    b.append(bullets(critical_list))
-    b.append("")
-    b.append("Moderate gaps:")
-    b.append(bullets(moderate_list))
-    b.append("")
-    b.append("Minor issues:")
-    b.append(bullets(minor_list))
-
-    return "\n".join(a + ["", ""] + b)
-
-
-# -----------------------------
-# Layer 3: optional safe LLM rewriter
-# -----------------------------
-
-def _numbers_in_text(s: str) -> set[str]:
-    return set(re.findall(r"\b\d{1,3}\b", s or ""))
-
-
-def validate_rewriter_output(output_text: str, allowed_numbers: set[str]) -> bool:
-    if not output_text:
-        return False
-    if "Section A:" not in output_text or "Section B:" not in output_text:
-        return False
-    found = _numbers_in_text(output_text)
-    return found.issubset(allowed_numbers)
-
-
-def polish_narrative_with_llm(structured: dict, draft_text: str) -> Optional[str]:
-    system = (
-        "You are a scoring explanation rewriter. "
-        "You MUST only use the structured data provided. "
-        "You MUST NOT add new facts, skills, requirements, certifications, languages, citizenship, or assumptions. "
-        "You MUST NOT change any numeric values. "
-        "If information is not in the JSON, you must not mention it. "
-        "Rewrite for clarity and executive tone. Output plain text only with the same two sections."
-    )
-    user = f"""Using ONLY this structured scoring data and the draft explanation, rewrite the text to be clearer and more executive.
-Do not add any facts not present below.
-
-Structured scoring data (JSON):
-{json.dumps(structured, ensure_ascii=False)}
-
-Draft explanation:
-{draft_text}
-"""
-    try:
-        return llm(system, user)
-    except Exception:
-        return None
-
-
 # -----------------------------
 # Flask app + auth gate
 # -----------------------------
 
 app = Flask(__name__)
-app.secret_key = os.getenv("FLASK_SECRET_KEY", os.urandom(24))
+# Shared by all workers, so a session cookie signed by one is accepted by the others.
+app.secret_key = secret_key()
 
-limiter = Limiter(get_remote_address, app=app, default_limits=["60 per hour"])
+limiter = Limiter(get_remote_address, app=app, default_limits=["60 per hour"],
+                  storage_uri=limiter_storage_uri())
 
 
 @app.before_request
 def require_login():
-    allowed_paths = ["/login", "/health"]
+    allowed_paths = ["/login", "/health", "/metrics"]
     if request.path.startswith("/static"):
         return None
     if request.path in allowed_paths:
@@ -357,170 +108,353 @@ def health():
     return {"status": "ok"}
 
 
+@app.route("/metrics")
+@limiter.exempt
+def metrics():
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
+
+
+def send_report(kind: str, mimetype: str, download_name: str):
+    run_id = request.args.get("run_id") or session.get("run_id")
+    record = get_run(run_id) if run_id else None
+    if record is None or record["status"] != "done":
+        return redirect(url_for("home"))
+    path = get_report(run_id, kind, record["result"])
+    return send_file(path, as_attachment=True, download_name=download_name, mimetype=mimetype)
+
+
 @app.route("/download_pdf")
 def download_pdf():
-    report_data = {
-        "Hireability Score": str(session.get("hire_score", "")),
-        "Match Score": str(session.get("match_score", "")),
-    }
-    pdf = build_pdf_report(report_data)
-    return send_file(
-        pdf,
-        as_attachment=True,
-        download_name="AI_Job_Hunt_Executive_Report.pdf",
-        mimetype="application/pdf",
+    return send_report("pdf", "application/pdf", "AI_Job_Hunt_Executive_Report.pdf")
+
+
+@app.route("/download_docx")
+def download_docx():
+    return send_report(
+        "docx",
+        "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+        "AI_Job_Hunt_Intelligence_Report.docx",
     )
 
 
-@app.route("/run", methods=["POST"])
-@limiter.limit("30 per hour")
-def run():
+def render_index(form: dict, error: str, preview: Optional[dict] = None, status: int = 200):
+    return render_template("index.html", t=get_t(form["lang"]), error=error, preview=preview, **form), status
+
+
+def parse_run_form() -> Tuple[dict, Optional[Any]]:
+    """/run inputs from the posted form, plus the index page to show on error (or None).
+
+    In URL mode form["job"] is left for the caller to fill from the fetched posting.
+    """
     lang = request.form.get("lang", "en")
-    t = get_t(lang)
 
-    cv = request.form.get("cv", "").strip()
-    role = request.form.get("role", "").strip()
-    company = request.form.get("company", "").strip()
-    culture = request.form.get("culture", "").strip()
-    reviews = request.form.get("reviews", "").strip()
+    form = dict(
+        lang=lang,
+        cv=request.form.get("cv", "").strip(),
+        role=request.form.get("role", "").strip(),
+        company=request.form.get("company", "").strip(),
+        culture=request.form.get("culture", "").strip(),
+        reviews=request.form.get("reviews", "").strip(),
+        job_input_mode=request.form.get("job_input_mode", "url").strip(),
+        job_url=request.form.get("job_url", "").strip(),
+        job_text=request.form.get("job_text", "").strip(),
+    )
 
-    job_input_mode = request.form.get("job_input_mode", "url").strip()
-    job_url = request.form.get("job_url", "").strip()
-    job_text = request.form.get("job_text", "").strip()
+    def error_page(error):
+        return render_index(form, error)
 
     # Basic validation
-    if not cv:
-        return render_template("index.html", t=t, lang=lang, error="Please paste your CV.", preview=None,
-                               job_input_mode=job_input_mode, job_url=job_url, job_text=job_text,
-                               role=role, company=company, culture=culture, reviews=reviews)
-
-    if not role:
-        return render_template("index.html", t=t, lang=lang, error="Please enter the target job role/title.", preview=None,
-                               job_input_mode=job_input_mode, job_url=job_url, job_text=job_text,
-                               role=role, company=company, culture=culture, reviews=reviews)
-
-    preview = None
-    job = ""
-    if job_input_mode == "text":
-        if not job_text:
-            return render_template("index.html", t=t, lang=lang, error="Please paste the job description / requirements.", preview=None,
-                                   job_input_mode=job_input_mode, job_url=job_url, job_text=job_text,
-                                   role=role, company=company, culture=culture, reviews=reviews)
-        job = job_text
-    else:
-        if not job_url:
-            return render_template("index.html", t=t, lang=lang, error="Please provide a job posting URL.", preview=None,
-                                   job_input_mode=job_input_mode, job_url=job_url, job_text=job_text,
-                                   role=role, company=company, culture=culture, reviews=reviews)
+    if not form["cv"]:
+        return form, error_page("Please paste your CV.")
+
+    if not form["role"]:
+        return form, error_page("Please enter the target job role/title.")
+
+    if form["job_input_mode"] == "text":
+        if not form["job_text"]:
+            return form, error_page("Please paste the job description / requirements.")
+        form["job"] = form["job_text"]
+    elif not form["job_url"]:
+        return form, error_page("Please provide a job posting URL.")
+    return form, None
+
+
+def read_run_form() -> Tuple[dict, Optional[Any]]:
+    """Validated /run inputs from the posted form, plus the index page to show on error (or None)."""
+    form, error_page = parse_run_form()
+    if error_page is None and "job" not in form:
         try:
-            job = fetch_job_from_url(job_url)
+            preview = fetch_job_preview(form["job_url"])
         except Exception as e:
-            try:
-                preview = fetch_job_preview(job_url)
-            except Exception:
-                preview = None
-            return render_template("index.html", t=t, lang=lang, error=str(e), preview=preview,
-                                   job_input_mode=job_input_mode, job_url=job_url, job_text=job_text,
-                                   role=role, company=company, culture=culture, reviews=reviews)
+            return form, render_index(form, str(e))
+        error_page = use_job_preview(form, preview)
+    return form, error_page
+
+
+def use_job_preview(form: dict, preview: dict) -> Optional[Any]:
+    """Fill form["job"] from a fetched posting; the index page with the preview if its text is unusable, else None.
+
+    Fetch once: the same preview feeds both the pipeline and the error page.
+    """
+    try:
+        form["job"] = require_job_text(preview)
+    except ValueError as e:
+        return render_index(form, str(e), preview)
+    return None
+
+
+def analysis_args(form: dict) -> tuple:
+    return (form["cv"], form["job"], form["role"], form["lang"],
+            form["company"], form["culture"], form["reviews"])
+
+
+@app.route("/run", methods=["POST"])
+@limiter.limit("30 per hour")
+def run():
+    form, error_page = read_run_form()
+    if error_page is not None:
+        return error_page
+
+    if request.form.get("mode", RUN_MODE) == "queue":
+        return enqueue_run(form)
+
     # --------- Intelligence pipeline ---------
-    hard_gates_raw = hard_gate_extract(cv, job, role, lang)
-    hard_gates_data = parse_json_with_repair(hard_gates_raw)
-    hard_gate_status = compute_hard_gate_status(hard_gates_data or hard_gates_raw)
+    # A double-click or resubmission attaches to the identical analysis already running.
+    key = run_key(analysis_args(form))
+    run_id = uuid.uuid4().hex
+    existing = claim_run(key, run_id)
+    if existing:
+        return show_run(existing)
+    try:
+        create_run(run_id, "running")
+        try:
+            result = run_analysis(*analysis_args(form))
+        except Exception as e:
+            update_run(run_id, "failed", error=f"{type(e).__name__}: {e}")
+            raise
+        return finish_run(run_id, form, result)
+    finally:
+        release_run(key, run_id)
+
 
-    hard_gates_json = json.dumps(hard_gates_data or {}, ensure_ascii=False)
+def finish_run(run_id: str, form: dict, result: dict):
+    save_result(run_id, result, form["lang"])
+    schedule_reports(run_id, result)
+    return show_run(run_id)
 
-    # Recruiter match first (used for scoring + CV optimization)
-    match_raw = recruiter_match(cv, job, role, lang, hard_gates_json)
-    match_data = parse_json_with_repair(match_raw)
 
-    match_score = match_data.get("match_score")
-    if match_score is None:
-        match_score = extract_score_fallback(match_raw, kind="match")
+def show_run(run_id: str):
+    # Redirect so a refresh re-reads the stored result instead of re-running the agents;
+    # a run still in progress shows the pending page until it is done.
+    session["run_id"] = run_id
+    return redirect(url_for("run_result", run_id=run_id))
+
+
+# -----------------------------
+# Background queue mode
+# -----------------------------
+
+def wants_json() -> bool:
+    return request.accept_mimetypes.best == "application/json"
+
+
+def retry_later(form: dict, error: str, message: str):
+    """503 with Retry-After: JSON `error` for API clients, the index page with `message` otherwise."""
+    headers = {"Retry-After": str(QUEUE_RETRY_AFTER_SECONDS)}
+    if wants_json():
+        return {"error": error}, 503, headers
+    page, status = render_index(form, message, status=503)
+    return page, status, headers
+
+
+def enqueue_run(form: dict):
     try:
-        match_score = int(match_score)
-    except Exception:
-        match_score = extract_score_fallback(match_raw, kind="match")
-
-    # Cap match if hard gates are risky/failed
-    match_score = apply_hard_gate_caps(match_score, hard_gate_status)
-
-    # Hireability from match + gaps + hard gates
-    hire_score, hire_breakdown = compute_hireability_from_match(match_score, match_data, hard_gate_status)
-
-    # Other modules
-    deep = requirement_intelligence(cv, job, role, lang)
-    ats = ats_audit(cv, job, role, lang, hard_gates_json)
-    psyche = recruiter_psychology(cv, job, role, lang)
-    optimized = optimize_cv(cv, match_raw, lang)
-    ats_cv = ats_submission(cv, job, role, lang, hard_gates_json)
-    interview = interview_pack(cv, job, role, lang)
-    culture_report = culture_analysis(company, culture, reviews, lang)
-
-    # Layer 2 base explanation
-    base_text = build_hireability_sections(match_score, hire_score, match_data, hire_breakdown)
-
-    # Layer 3 optional polish
-    use_rewriter = (os.getenv("LLM_REWRITER_MODE", "false").strip().lower() == "true")
-    hire_text = base_text
-    if use_rewriter:
-        structured = {
-            "match_score": match_score,
-            "hireability_score": hire_score,
-            "hard_gate_status": hard_gate_status,
-            "critical_gaps_count": hire_breakdown.get("critical_gaps", 0),
-            "moderate_gaps_count": hire_breakdown.get("moderate_gaps", 0),
-            "minor_gaps_count": hire_breakdown.get("minor_gaps", 0),
-            "evidence_quality": hire_breakdown.get("evidence_quality", "medium"),
-            "timeline_risk": hire_breakdown.get("timeline_risk", "low"),
-            "total_penalty": hire_breakdown.get("total_penalty", 0),
-        }
-        allowed_numbers = {str(v) for v in [
-            structured["match_score"],
-            structured["hireability_score"],
-            structured["critical_gaps_count"],
-            structured["moderate_gaps_count"],
-            structured["minor_gaps_count"],
-            structured["total_penalty"],
-            hire_breakdown.get("critical_penalty", 0),
-            hire_breakdown.get("moderate_penalty", 0),
-            hire_breakdown.get("minor_penalty", 0),
-            hire_breakdown.get("evidence_penalty", 0),
-            hire_breakdown.get("timeline_penalty", 0),
-        ]}
-        polished = polish_narrative_with_llm(structured, base_text)
-        if polished and validate_rewriter_output(polished, allowed_numbers):
-            hire_text = polished
-
-    # Pretty JSON display for recruiter match
-    match_display = match_raw
+        run_id = submit_run(analysis_args(form))
+    except QueueFull:
+        return retry_later(form, "Analysis queue is full, retry later.",
+                           "The analysis queue is full right now. Please try again in a minute.")
+
+    if wants_json():
+        return {"run_id": run_id, "status_url": url_for("run_status", run_id=run_id),
+                "result_url": url_for("run_result", run_id=run_id)}, 202
+    return redirect(url_for("run_result", run_id=run_id))
+
+
+@app.route("/runs/<run_id>")
+def run_status(run_id):
+    record = get_run(run_id)
+    if record is None:
+        return {"error": "Unknown run"}, 404
+    return {
+        "run_id": record["id"],
+        "status": record["status"],
+        "created_at": record["created_at"],
+        "updated_at": record["updated_at"],
+        "error": record["error"],
+        "queue_depth": queue_depth(),
+    }
+
+
+@app.route("/runs/<run_id>/result")
+def run_result(run_id):
+    record = get_run(run_id)
+    if record is None:
+        return ({"error": "Unknown run"}, 404) if wants_json() else ("Unknown run", 404)
+
+    if wants_json():
+        return {"run_id": run_id, "status": record["status"], "result": record["result"], "error": record["error"]}
+
+    if record["status"] != "done":
+        return render_template("run_pending.html", t=get_t("en"), run_id=run_id, status=record["status"],
+                               error=record["error"])
+
+    result = dict(record["result"])
+    lang = result.pop("lang", "en")
+    session["run_id"] = run_id
+    return render_template(
+        "dashboard.html",
+        t=get_t(lang),
+        lang=lang,
+        run_id=run_id,
+        sections=dashboard_sections(result),
+        **result,
+    )
+
+
+# -----------------------------
+# Bulk scoring
+# -----------------------------
+
+@app.route("/batch", methods=["POST"])
+@limiter.limit("10 per hour")
+def batch():
+    """JSON body: {"cvs": [...], "jobs": [...], "role", "lang", "top_k", "format": "jsonl"|"csv"}."""
+    body = request.get_json(silent=True) or {}
+    cvs = body.get("cvs") or []
+    jobs = body.get("jobs") or []
+    role = (body.get("role") or "").strip()
+    if not cvs or not jobs or not role:
+        return {"error": "cvs, jobs and role are required"}, 400
     try:
-        match_display = json.dumps(match_data, indent=2, ensure_ascii=False)
-    except Exception:
-        pass
+        top_k = int(body.get("top_k") or 0)
+    except (TypeError, ValueError):
+        return {"error": "top_k must be an integer"}, 400
+
+    cv_items, job_items = normalize_items(cvs, "cv"), normalize_items(jobs, "job")
+    if len(cv_items) * len(job_items) > BATCH_MAX_PAIRS:
+        return {"error": f"Too many pairs, limit is {BATCH_MAX_PAIRS}"}, 400
+
+    events = run_batch(cv_items, job_items, role, body.get("lang") or "en", top_k)
+    if body.get("format") == "csv":
+        return Response(stream_with_context(as_csv(events)), mimetype="text/csv",
+                        headers={"Content-Disposition": "attachment; filename=batch_results.csv"})
+    return Response(stream_with_context(as_jsonl(events)), mimetype="application/x-ndjson")
+
+
+# -----------------------------
+# Company culture reports
+# -----------------------------
+
+@app.route("/culture", methods=["POST"])
+@limiter.limit("30 per hour")
+def culture():
+    """JSON body: {"company", "culture", "reviews", "lang", "refresh"}; caches the report for later runs."""
+    body = request.get_json(silent=True) or {}
+    fields = {k: (body.get(k) or "").strip() for k in ("company", "culture", "reviews")}
+    if not fields["company"] or not (fields["culture"] or fields["reviews"]):
+        return {"error": "company and culture or reviews are required"}, 400
+    lang = body.get("lang") if body.get("lang") in ("en", "sv") else "en"
+    return precompute_culture(lang=lang, refresh=bool(body.get("refresh")), **fields)
+
+
+# -----------------------------
+# Streaming mode (Server-Sent Events)
+# -----------------------------
 
-    # Scores + colors
-    hire_color = "green" if hire_score >= 70 else ("yellow" if hire_score >= 40 else "red")
-    match_color = "green" if match_score >= 70 else ("yellow" if match_score >= 40 else "red")
+STREAM_TTL_SECONDS = int(os.getenv("STREAM_TTL_SECONDS", "600"))
+SSE_KEEPALIVE_SECONDS = 15
 
-    session["hire_score"] = hire_score
-    session["match_score"] = match_score
+# Pending stream forms live in the shared state store, so the events request can land on
+# any worker; popping the entry makes each stream single-use.
+STREAM_KEY = "stream:{}"
+
+
+def sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.route("/run/stream", methods=["POST"])
+@limiter.limit("30 per hour")
+def run_stream():
+    """Validate the form and render an empty dashboard that subscribes to /run/stream/<id>/events."""
+    form, error_page = read_run_form()
+    if error_page is not None:
+        return error_page
+    return start_stream(form)
+
+
+def start_stream(form: dict):
+    """Store the form for the events request and render the empty dashboard that consumes it."""
+    lang = form["lang"]
+    stream_id = uuid.uuid4().hex
+    get_state().purge()
+    get_state().set(STREAM_KEY.format(stream_id), json.dumps(form), ttl=STREAM_TTL_SECONDS)
+    # The stream ID doubles as the run ID, so the finished run can be revisited and downloaded.
+    create_run(stream_id)
+    session["run_id"] = stream_id
 
     return render_template(
         "dashboard.html",
-        t=t,
+        t=get_t(lang),
         lang=lang,
-        hire_score=hire_score,
-        match_score=match_score,
-        hire_color=hire_color,
-        match_color=match_color,
-        deep=deep,
-        ats=ats,
-        psyche=psyche,
-        optimized=optimized,
-        ats_cv=ats_cv,
-        interview=interview,
-        culture_report=culture_report,
-        hard_gates=str(hard_gates_raw),
-        match=match_display,
-        hire=hire_text,
+        sections=dashboard_sections({}),
+        run_id=stream_id,
+        stream_id=stream_id,
+        hire_score=0,
+        match_score=0,
+        hire_color="",
+        match_color="",
+    )
+
+
+@app.route("/run/stream/<stream_id>/events")
+def run_stream_events(stream_id):
+    entry = get_state().pop(STREAM_KEY.format(stream_id))
+    if entry is None:
+        # Unknown, expired or already consumed (e.g. EventSource auto-reconnect).
+        return Response(sse("gone", {}), mimetype="text/event-stream")
+    form = json.loads(entry)
+
+    events: "queue.Queue" = queue.Queue()
+
+    def work():
+        update_run(stream_id, "running")
+        try:
+            result = run_analysis(*analysis_args(form),
+                                  on_result=lambda *r: [events.put(e) for e in progress_events(*r)],
+                                  on_partial=lambda *p: [events.put(e) for e in partial_events(*p)])
+            save_result(stream_id, result, form["lang"])
+            schedule_reports(stream_id, result)
+            events.put(("done", {"errors": result["errors"]}))
+        except Exception as e:
+            update_run(stream_id, "failed", error=f"{type(e).__name__}: {e}")
+            events.put(("done", {"errors": {"pipeline": f"{type(e).__name__}: {e}"}}))
+
+    threading.Thread(target=work, daemon=True).start()
+
+    def generate():
+        while True:
+            try:
+                event, data = events.get(timeout=SSE_KEEPALIVE_SECONDS)
+            except queue.Empty:
+                yield ": keep-alive\n\n"
+                continue
+            yield sse(event, data)
+            if event == "done":
+                return
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
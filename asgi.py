@@ -0,0 +1,327 @@
+"""ASGI entry point: the analysis routes run on the event loop, everything else is the Flask app.
+
+    uvicorn asgi:app --workers 2 --limit-concurrency 1000
+
+POST /run, POST /run/stream and the stream's events run the async agents
+(pipeline.arun_analysis) on the event loop, so an analysis waiting on the LLM holds
+no thread and one worker can keep hundreds in flight. At most ASYNC_MAX_IN_FLIGHT
+analyses run per worker; beyond that /run answers 503 with Retry-After. Every other
+route is the Flask app, mounted with a2wsgi in a pool of ASGI_WSGI_THREADS threads;
+its streamed responses (e.g. /batch) stop once the client disconnects.
+
+Login, sessions, rate limits and templates are Flask's on both paths: the async
+routes run inside a Flask request context built from the same WSGI environ.
+"""
+import io
+import os
+import json
+import uuid
+import asyncio
+import threading
+import contextlib
+
+from a2wsgi import WSGIMiddleware
+from a2wsgi.wsgi import build_environ
+from flask import Response, request
+from werkzeug.exceptions import HTTPException
+
+from app import (
+    app as flask_app, limiter, parse_run_form, use_job_preview, render_index, analysis_args, finish_run,
+    show_run, retry_later, enqueue_run, start_stream, sse, STREAM_KEY, SSE_KEEPALIVE_SECONDS, RUN_MODE,
+)
+from job_fetcher import afetch_job_preview
+from metrics import Counter, Gauge
+from pipeline import arun_analysis, progress_events, partial_events
+from reports import schedule_reports
+from run_store import create_run, update_run, save_result
+from shared_state import get_state
+from singleflight import run_key, claim_run, release_run
+
+ASYNC_MAX_IN_FLIGHT = int(os.getenv("ASYNC_MAX_IN_FLIGHT", "200"))
+ASGI_WSGI_THREADS = int(os.getenv("ASGI_WSGI_THREADS", "8"))
+# Chunks a Flask response may run ahead of a slow client.
+WSGI_BUFFER_CHUNKS = 16
+
+ASYNC_IN_FLIGHT = Gauge("async_analyses_in_flight", "Analyses running on the ASGI event loop.")
+ASYNC_REJECTED = Counter("async_analyses_rejected_total", "Analyses refused because ASYNC_MAX_IN_FLIGHT was reached.")
+
+# Stream analyses outlive their events request if the client goes away; keep a reference until they finish.
+_background = set()
+_in_flight = 0
+
+
+class Busy(Exception):
+    """ASYNC_MAX_IN_FLIGHT analyses are already running in this worker."""
+
+
+@contextlib.contextmanager
+def analysis_slot():
+    # The event loop is single-threaded, so a plain counter is enough.
+    global _in_flight
+    if _in_flight >= ASYNC_MAX_IN_FLIGHT:
+        ASYNC_REJECTED.inc()
+        raise Busy("Server busy, try again shortly")
+    _in_flight += 1
+    try:
+        with ASYNC_IN_FLIGHT.track():
+            yield
+    finally:
+        _in_flight -= 1
+
+
+class AsyncStreamResponse(Response):
+    """A Flask response whose body is an async iterator, sent by the ASGI layer."""
+
+    def __init__(self, body, **kwargs):
+        super().__init__(**kwargs)
+        self.async_body = body
+
+
+# -----------------------------
+# Async routes (run inside a Flask request context)
+# -----------------------------
+
+async def read_run_form():
+    """app.read_run_form() with the job posting fetched on the event loop."""
+    form, error_page = parse_run_form()
+    if error_page is None and "job" not in form:
+        try:
+            preview = await afetch_job_preview(form["job_url"])
+        except Exception as e:
+            return form, render_index(form, str(e))
+        error_page = use_job_preview(form, preview)
+    return form, error_page
+
+
+async def run():
+    form, error_page = await read_run_form()
+    if error_page is not None:
+        return error_page
+
+    if request.form.get("mode", RUN_MODE) == "queue":
+        return await asyncio.to_thread(enqueue_run, form)
+
+    key = run_key(analysis_args(form))
+    run_id = uuid.uuid4().hex
+    existing = await asyncio.to_thread(claim_run, key, run_id)
+    if existing:
+        return show_run(existing)
+    try:
+        with analysis_slot():
+            await asyncio.to_thread(create_run, run_id, "running")
+            try:
+                result = await arun_analysis(*analysis_args(form))
+            except Exception as e:
+                await asyncio.to_thread(update_run, run_id, "failed", error=f"{type(e).__name__}: {e}")
+                raise
+        return await asyncio.to_thread(finish_run, run_id, form, result)
+    except Busy:
+        return retry_later(form, "Server busy, retry later.",
+                           "The server is busy right now. Please try again in a minute.")
+    finally:
+        await asyncio.to_thread(release_run, key, run_id)
+
+
+async def run_stream():
+    form, error_page = await read_run_form()
+    if error_page is not None:
+        return error_page
+    return await asyncio.to_thread(start_stream, form)
+
+
+async def run_stream_events(stream_id):
+    entry = await asyncio.to_thread(get_state().pop, STREAM_KEY.format(stream_id))
+    if entry is None:
+        # Unknown, expired or already consumed (e.g. EventSource auto-reconnect).
+        return Response(sse("gone", {}), mimetype="text/event-stream")
+    form = json.loads(entry)
+
+    events: "asyncio.Queue" = asyncio.Queue()
+
+    async def work():
+        try:
+            with analysis_slot():
+                await asyncio.to_thread(update_run, stream_id, "running")
+                result = await arun_analysis(*analysis_args(form),
+                                             on_result=lambda *r: [events.put_nowait(e) for e in progress_events(*r)],
+                                             on_partial=lambda *p: [events.put_nowait(e) for e in partial_events(*p)])
+            await asyncio.to_thread(save_result, stream_id, result, form["lang"])
+            schedule_reports(stream_id, result)
+            events.put_nowait(("done", {"errors": result["errors"]}))
+        except Exception as e:
+            await asyncio.to_thread(update_run, stream_id, "failed", error=f"{type(e).__name__}: {e}")
+            events.put_nowait(("done", {"errors": {"pipeline": f"{type(e).__name__}: {e}"}}))
+
+    task = asyncio.ensure_future(work())
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+
+    async def generate():
+        while True:
+            try:
+                event, data = await asyncio.wait_for(events.get(), SSE_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            yield sse(event, data)
+            if event == "done":
+                return
+
+    return AsyncStreamResponse(
+        generate(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# Flask endpoint -> async view. The Flask views stay registered for the WSGI entry point.
+ASYNC_VIEWS = {
+    "run": run,
+    "run_stream": run_stream,
+    "run_stream_events": run_stream_events,
+}
+
+
+async def dispatch(environ: dict, view) -> Response:
+    """Flask's full_dispatch_request() around an async view: login gate, rate limits, session save.
+
+    The views' @limiter.limit decorators only fire when the Flask view is called, so
+    their limits are checked here explicitly. Hooks and checks touch the rate-limit
+    storage and run in a thread; asyncio.to_thread carries the request context along.
+    """
+    with flask_app.request_context(environ):
+        try:
+            try:
+                rv = await asyncio.to_thread(flask_app.preprocess_request)
+                if rv is None:
+                    await asyncio.to_thread(limiter.check)
+                    rv = await view(**(request.view_args or {}))
+            except Exception as e:
+                rv = flask_app.handle_user_exception(e)
+            return await asyncio.to_thread(flask_app.finalize_request, rv)
+        except Exception as e:
+            return flask_app.handle_exception(e)
+
+
+def async_view(environ: dict):
+    adapter = flask_app.url_map.bind_to_environ(environ)
+    try:
+        endpoint, _args = adapter.match()
+    except HTTPException:
+        return None
+    return ASYNC_VIEWS.get(endpoint)
+
+
+# -----------------------------
+# ASGI <-> WSGI
+# -----------------------------
+
+# Scope key for the threading.Event set once the client has disconnected.
+DISCONNECTED = "karriar.disconnected"
+
+
+def stop_on_disconnect(environ: dict, start_response):
+    """The Flask app, with its response iterator stopped once the client has gone.
+
+    Runs in an a2wsgi thread, which closes this generator (and so the Flask
+    response) in the thread that iterated it, as stream_with_context needs.
+    """
+    disconnected = environ["asgi.scope"][DISCONNECTED]
+    if "CONTENT_LENGTH" not in environ:
+        # The body was read up front (app() below), so the input ends where it ends.
+        environ["wsgi.input_terminated"] = True
+    result = flask_app(environ, start_response)
+    try:
+        for chunk in result:
+            if disconnected.is_set():
+                break
+            yield chunk
+    finally:
+        if hasattr(result, "close"):
+            result.close()
+
+
+wsgi_app = WSGIMiddleware(stop_on_disconnect, workers=ASGI_WSGI_THREADS, send_queue_size=WSGI_BUFFER_CHUNKS)
+
+
+def wsgi_environ(scope: dict, body: bytes) -> dict:
+    environ = build_environ(scope, io.BytesIO(body))
+    environ["CONTENT_LENGTH"] = str(len(body))
+    return environ
+
+
+async def read_body(receive) -> bytes:
+    """The request body, or None if the client disconnected first."""
+    parts = []
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return None
+        parts.append(message.get("body", b""))
+        if not message.get("more_body"):
+            return b"".join(parts)
+
+
+async def watch_disconnect(receive, disconnected: threading.Event) -> None:
+    while (await receive())["type"] != "http.disconnect":
+        pass
+    disconnected.set()
+
+
+def replay(body: bytes):
+    """receive() handing an already-read body to a2wsgi."""
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+    return receive
+
+
+async def send_response(response: Response, send, disconnected: threading.Event) -> None:
+    await send({
+        "type": "http.response.start",
+        "status": response.status_code,
+        "headers": [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in response.headers.to_wsgi_list()],
+    })
+    body = getattr(response, "async_body", None)
+    if body is None:
+        await send({"type": "http.response.body", "body": response.get_data()})
+        return
+    try:
+        async for chunk in body:
+            if disconnected.is_set():
+                break
+            await send({"type": "http.response.body", "body": chunk.encode("utf-8"), "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+    finally:
+        await body.aclose()
+
+
+async def lifespan(receive, send) -> None:
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            wsgi_app.executor.shutdown(wait=False, cancel_futures=True)
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await lifespan(receive, send)
+    if scope["type"] != "http":
+        return
+    body = await read_body(receive)
+    if body is None:
+        return
+    disconnected = threading.Event()
+    watcher = asyncio.ensure_future(watch_disconnect(receive, disconnected))
+    try:
+        environ = wsgi_environ(scope, body)
+        view = async_view(environ)
+        if view is None:
+            return await wsgi_app(dict(scope, **{DISCONNECTED: disconnected}), replay(body), send)
+        response = await dispatch(environ, view)
+        await send_response(response, send, disconnected)
+    finally:
+        watcher.cancel()
@@ -0,0 +1,179 @@
+"""Bulk CV x job scoring.
+
+Scores every (CV, job) pair with only the hard-gate and recruiter-match agents plus the
+deterministic hireability model, ranks the pairs, and runs the full agent suite for the
+top-K pairs only.
+
+    python batch.py --cv anna.txt --cv erik.txt --job https://... --jobs-file jobs.txt \\
+        --role "Data Analyst" --top-k 3 --format jsonl > results.jsonl
+"""
+import os
+import io
+import sys
+import csv
+import json
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Iterable, Iterator, List, Optional
+
+from agents import recruiter_match
+from gates import hard_gates
+from job_fetcher import fetch_job_from_url
+from pipeline import evaluate_gates, evaluate_match, run_analysis
+
+BATCH_MAX_WORKERS = int(os.getenv("BATCH_MAX_WORKERS", "8"))
+BATCH_MAX_PAIRS = int(os.getenv("BATCH_MAX_PAIRS", "2000"))
+
+CSV_FIELDS = ["rank", "cv_id", "job_id", "hire_score", "match_score", "hard_gate_status",
+              "critical_gaps", "moderate_gaps", "minor_gaps", "error"]
+
+
+def normalize_items(items: Iterable, prefix: str) -> List[dict]:
+    """Accept strings or {"id", "text"|"url", "role"} dicts; strings starting with http are URLs."""
+    out = []
+    for i, item in enumerate(items, 1):
+        if isinstance(item, str):
+            item = {"url": item} if item.strip().startswith(("http://", "https://")) else {"text": item}
+        item = dict(item)
+        item.setdefault("id", item.get("url") or f"{prefix}{i}")
+        out.append(item)
+    return out
+
+
+def load_jobs(jobs: List[dict], max_workers: int = BATCH_MAX_WORKERS) -> List[dict]:
+    """Fill in "text" for URL jobs concurrently; failures are kept with an "error"."""
+    def load(job):
+        if job.get("text"):
+            return job
+        try:
+            return dict(job, text=fetch_job_from_url(job["url"]))
+        except Exception as e:
+            return dict(job, error=str(e))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as ex:
+        return list(ex.map(load, jobs))
+
+
+def score_pair(cv: dict, job: dict, role: str, lang: str) -> dict:
+    row = {"cv_id": cv["id"], "job_id": job["id"]}
+    if job.get("error"):
+        return dict(row, error=job["error"])
+    role = job.get("role") or role
+    try:
+        gates = evaluate_gates(hard_gates(cv["text"], job["text"], role, lang))
+        match = evaluate_match(recruiter_match(cv["text"], job["text"], role, lang, gates["json"]), gates["status"])
+    except Exception as e:
+        return dict(row, error=f"{type(e).__name__}: {e}")
+    breakdown = match["breakdown"]
+    return dict(
+        row,
+        hire_score=match["hire_score"],
+        match_score=match["match_score"],
+        hard_gate_status=gates["status"],
+        critical_gaps=breakdown.get("critical_gaps", 0),
+        moderate_gaps=breakdown.get("moderate_gaps", 0),
+        minor_gaps=breakdown.get("minor_gaps", 0),
+    )
+
+
+def rank(rows: List[dict]) -> List[dict]:
+    scored = sorted((r for r in rows if not r.get("error")),
+                    key=lambda r: (r["hire_score"], r["match_score"]), reverse=True)
+    ranked = [dict(r, rank=i) for i, r in enumerate(scored, 1)]
+    return ranked + [dict(r, rank=None) for r in rows if r.get("error")]
+
+
+def run_batch(cvs: Iterable, jobs: Iterable, role: str, lang: str = "en", top_k: int = 0,
+              max_workers: int = BATCH_MAX_WORKERS) -> Iterator[dict]:
+    """Yield events: {"event": "pair"} as each pair is scored, then "ranked" rows, then "analysis" for the top K."""
+    cvs = normalize_items(cvs, "cv")
+    jobs = normalize_items(jobs, "job")
+    if len(cvs) * len(jobs) > BATCH_MAX_PAIRS:
+        raise ValueError(f"Too many pairs ({len(cvs) * len(jobs)}), limit is {BATCH_MAX_PAIRS}")
+
+    jobs = load_jobs(jobs, max_workers)
+    cv_by_id = {c["id"]: c for c in cvs}
+    job_by_id = {j["id"]: j for j in jobs}
+
+    rows = []
+    with ThreadPoolExecutor(max_workers=max_workers) as ex:
+        futures = [ex.submit(score_pair, cv, job, role, lang) for cv in cvs for job in jobs]
+        for fut in as_completed(futures):
+            row = fut.result()
+            rows.append(row)
+            yield dict(row, event="pair")
+
+    ranked = rank(rows)
+    for row in ranked:
+        yield dict(row, event="ranked")
+
+    for row in ranked[:top_k]:
+        if row.get("error"):
+            break
+        cv, job = cv_by_id[row["cv_id"]], job_by_id[row["job_id"]]
+        result = run_analysis(cv["text"], job["text"], job.get("role") or role, lang)
+        yield {"event": "analysis", "rank": row["rank"], "cv_id": cv["id"], "job_id": job["id"], "result": result}
+
+
+def as_jsonl(events: Iterable[dict]) -> Iterator[str]:
+    for event in events:
+        yield json.dumps(event, ensure_ascii=False) + "\n"
+
+
+def as_csv(events: Iterable[dict]) -> Iterator[str]:
+    """Ranked rows only; per-pair progress and full analyses are JSONL-only."""
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=CSV_FIELDS, extrasaction="ignore")
+    writer.writeheader()
+    for event in events:
+        if event["event"] != "ranked":
+            continue
+        writer.writerow(event)
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    if buf.getvalue():
+        yield buf.getvalue()
+
+
+def _read_lines(path: str) -> List[str]:
+    with open(path, encoding="utf-8") as f:
+        return [ln.strip() for ln in f if ln.strip()]
+
+
+def _read_cv(path: str) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return {"id": os.path.basename(path), "text": f.read()}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Rank CVs against job postings.")
+    ap.add_argument("--cv", action="append", default=[], help="CV text file (repeatable)")
+    ap.add_argument("--job", action="append", default=[], help="job URL (repeatable)")
+    ap.add_argument("--jobs-file", help="file with one job URL per line")
+    ap.add_argument("--job-text", action="append", default=[], help="job description text file (repeatable)")
+    ap.add_argument("--role", required=True)
+    ap.add_argument("--lang", default="en", choices=["en", "sv"])
+    ap.add_argument("--top-k", type=int, default=0, help="run the full agent suite for the best K pairs")
+    ap.add_argument("--format", default="jsonl", choices=["jsonl", "csv"])
+    ap.add_argument("--workers", type=int, default=BATCH_MAX_WORKERS)
+    args = ap.parse_args(argv)
+
+    cvs = [_read_cv(p) for p in args.cv]
+    jobs = list(args.job)
+    if args.jobs_file:
+        jobs += _read_lines(args.jobs_file)
+    for p in args.job_text:
+        jobs.append({"id": os.path.basename(p), "text": _read_cv(p)["text"]})
+    if not cvs or not jobs:
+        ap.error("need at least one --cv and one job")
+
+    events = run_batch(cvs, jobs, args.role, args.lang, args.top_k, args.workers)
+    for chunk in (as_csv if args.format == "csv" else as_jsonl)(events):
+        sys.stdout.write(chunk)
+        sys.stdout.flush()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
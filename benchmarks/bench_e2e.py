@@ -0,0 +1,312 @@
+"""End-to-end /run benchmark against the fake LLM backend.
+
+Drives the blocking /run endpoint through the Flask test client with N concurrent
+users, using the CVs, job pages and culture texts under benchmarks/corpus. Job pages
+are served to job_fetcher from the corpus by a requests adapter, so URL fetching and
+text extraction run for real. Prints one JSON report (stdout or --output) with
+latency percentiles, throughput, peak RSS, tokens per run and time spent in the
+extraction, JSON parsing and report-building hot spots.
+
+    python benchmarks/bench_e2e.py --users 4 --runs 40 --latency-ms 200 --output bench.json
+
+Caches are off by default so every run takes the cold path; --caches keeps the
+LLM, job-page and culture caches on. The two-phase job gates cache always applies.
+"""
+import os
+import io
+import sys
+import json
+import time
+import argparse
+import resource
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+CORPUS = os.path.join(ROOT, "benchmarks", "corpus")
+JOB_HOST = "jobs.bench.test"
+PASSWORD = "bench"
+
+# Job pages used for runs, with the /run "role" field for each. nurse_sv_small.html is left
+# out: its visible text is below the minimum /run accepts, so it would only measure the error page.
+ROLES = {
+    "backend_engineer_sv.html": "Backend Engineer",
+    "data_analyst_en.html": "Data Analyst",
+}
+
+
+def configure_env(args) -> None:
+    """Settings must be in the environment before the app modules are imported."""
+    tmp = tempfile.mkdtemp(prefix="bench-")
+    caches = "true" if args.caches else "false"
+    os.environ.update(
+        LLM_BACKEND="fake",
+        ACCESS_PASSWORD=PASSWORD,
+        RUN_MODE="sync",
+        DATA_DIR=os.path.join(tmp, "data"),
+        CACHE_DIR=os.path.join(tmp, "cache"),
+        LLM_CACHE=caches,
+        JOB_CACHE=caches,
+        CULTURE_CACHE=caches,
+        FAKE_LLM_LATENCY_MS=str(args.latency_ms),
+        FAKE_LLM_LATENCY_SIGMA=str(args.latency_sigma),
+        FAKE_LLM_MS_PER_TOKEN=str(args.ms_per_token),
+        FAKE_LLM_ERROR_RATE=str(args.error_rate),
+        FAKE_LLM_429_RATE=str(args.rate_429),
+        FAKE_LLM_SEED=str(args.seed),
+    )
+
+
+# -----------------------------
+# Corpus
+# -----------------------------
+
+def load_corpus() -> dict:
+    def read_dir(name, ext):
+        folder = os.path.join(CORPUS, name)
+        out = {}
+        for fname in sorted(os.listdir(folder)):
+            if fname.endswith(ext):
+                with open(os.path.join(folder, fname), encoding="utf-8") as f:
+                    out[fname] = f.read()
+        return out
+
+    return {
+        "cvs": list(read_dir("cvs", ".txt").values()),
+        "jobs": read_dir("jobs", ".html"),
+        "culture": [json.loads(v) for v in read_dir("culture", ".json").values()],
+    }
+
+
+def scenarios(corpus: dict, runs: int) -> list:
+    """Form payloads cycling through every CV x job pairing, with a culture text each."""
+    jobs = sorted(name for name in corpus["jobs"] if name in ROLES)
+    out = []
+    for i in range(runs):
+        cv = corpus["cvs"][i % len(corpus["cvs"])]
+        job = jobs[(i // len(corpus["cvs"])) % len(jobs)]
+        culture = corpus["culture"][i % len(corpus["culture"])]
+        out.append({
+            "cv": cv,
+            "role": ROLES[job],
+            "lang": "sv" if "_sv" in job else "en",
+            "job_input_mode": "url",
+            # A per-run query string keeps the job page cache honest when --caches is off.
+            "job_url": f"https://{JOB_HOST}/{job}?run={i}",
+            "company": culture["company"],
+            "culture": culture["culture"],
+            "reviews": culture["reviews"],
+        })
+    return out
+
+
+def mount_corpus(pages: dict) -> None:
+    """Serve corpus pages for https://jobs.bench.test/<file> through job_fetcher's session."""
+    import requests
+    from urllib3.response import HTTPResponse
+    from job_fetcher import get_session
+
+    class CorpusAdapter(requests.adapters.BaseAdapter):
+        def send(self, request, **kwargs):
+            name = request.path_url.split("?")[0].lstrip("/")
+            body = pages.get(name)
+            resp = requests.Response()
+            resp.request = request
+            resp.url = request.url
+            resp.status_code = 200 if body is not None else 404
+            data = (body or "not found").encode("utf-8")
+            resp.headers = requests.structures.CaseInsensitiveDict(
+                {"Content-Type": "text/html; charset=utf-8", "Content-Length": str(len(data))})
+            resp.encoding = "utf-8"
+            resp.raw = HTTPResponse(body=io.BytesIO(data), headers=dict(resp.headers), status=resp.status_code,
+                                    preload_content=False, decode_content=False)
+            return resp
+
+        def close(self):
+            pass
+
+    get_session().mount(f"https://{JOB_HOST}/", CorpusAdapter())
+
+
+# -----------------------------
+# Hot-spot timing
+# -----------------------------
+
+class HotSpots:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.totals = {}
+
+    def wrap(self, name: str, fn):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                with self._lock:
+                    calls, total = self.totals.get(name, (0, 0.0))
+                    self.totals[name] = (calls + 1, total + elapsed)
+        return timed
+
+    def instrument(self, name: str, fn) -> None:
+        """Replace every module-level reference to fn in the app's modules with a timed wrapper."""
+        timed = self.wrap(name, fn)
+        for module in list(sys.modules.values()):
+            path = getattr(module, "__file__", "") or ""
+            if not path.startswith(ROOT):
+                continue
+            for attr, value in list(vars(module).items()):
+                if value is fn:
+                    setattr(module, attr, timed)
+
+    def report(self, runs: int) -> dict:
+        return {
+            name: {"calls": calls, "total_ms": round(total * 1000, 1),
+                   "mean_ms": round(total * 1000 / calls, 3), "ms_per_run": round(total * 1000 / runs, 2)}
+            for name, (calls, total) in sorted(self.totals.items())
+        }
+
+
+def instrument_hot_spots(spots: HotSpots) -> None:
+    import job_fetcher
+    import reports
+    import scoring
+
+    spots.instrument("job_fetcher._extract_text", job_fetcher._extract_text)
+    spots.instrument("job_fetcher.extract_text_stream", job_fetcher.extract_text_stream)
+    spots.instrument("scoring.parse_json_with_repair", scoring.parse_json_with_repair)
+    for kind, builder in list(reports.BUILDERS.items()):
+        reports.BUILDERS[kind] = spots.wrap(f"reports.{kind}", builder)
+
+
+# -----------------------------
+# Driver
+# -----------------------------
+
+def percentile(sorted_values: list, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    pos = (len(sorted_values) - 1) * q
+    lo = int(pos)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (pos - lo)
+
+
+def counter_total(counter) -> float:
+    return sum(counter._values.values())
+
+
+def run_benchmark(args) -> dict:
+    import app as app_module
+    import metrics
+    import reports
+
+    app_module.limiter.enabled = False
+    corpus = load_corpus()
+    mount_corpus(corpus["jobs"])
+    spots = HotSpots()
+    instrument_hot_spots(spots)
+
+    local = threading.local()
+
+    def client():
+        if getattr(local, "client", None) is None:
+            local.client = app_module.app.test_client()
+            local.client.post("/login", data={"password": PASSWORD})
+        return local.client
+
+    def one(form):
+        start = time.perf_counter()
+        try:
+            resp = client().post("/run", data=form, follow_redirects=True)
+            ok = resp.status_code == 200 and b"hireFill" in resp.data
+            error = None if ok else f"HTTP {resp.status_code}"
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        return time.perf_counter() - start, error
+
+    if args.warmup:
+        one(scenarios(corpus, 1)[0])
+    calls_before = sum(c[-2] for c in metrics.LLM_LATENCY._values.values())
+    prompt_before = counter_total(metrics.LLM_PROMPT_TOKENS)
+    completion_before = counter_total(metrics.LLM_COMPLETION_TOKENS)
+    spots.totals.clear()
+
+    forms = scenarios(corpus, args.runs)
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.users) as pool:
+        results = list(pool.map(one, forms))
+    wall = time.perf_counter() - wall_start
+    # Reports build in the background after each run; let them finish before reading the timings.
+    reports._executor.submit(lambda: None).result()
+    time.sleep(0.2)
+
+    latencies = sorted(t for t, err in results if err is None)
+    errors = [err for _, err in results if err is not None]
+    runs = len(results)
+    llm_calls = sum(c[-2] for c in metrics.LLM_LATENCY._values.values()) - calls_before
+    return {
+        "config": {
+            "users": args.users, "runs": runs, "caches": args.caches, "latency_ms": args.latency_ms,
+            "latency_sigma": args.latency_sigma, "ms_per_token": args.ms_per_token,
+            "error_rate": args.error_rate, "rate_429": args.rate_429, "seed": args.seed,
+            "pipeline": {k: os.getenv(k, "") for k in ("AGENT_INPUT_MODE", "AGENT_CALL_MODE",
+                                                       "HARD_GATE_MODE", "HARD_GATE_POLICY",
+                                                       "HARD_GATE_STATUS_FROM_EVIDENCE", "LLM_ROUTES_FILE",
+                                                       "RUN_TOKEN_BUDGET", "RUN_DEADLINE_SECONDS")},
+        },
+        "ok": len(latencies),
+        "errors": len(errors),
+        "error_samples": errors[:5],
+        "latency_ms": {
+            "p50": round(percentile(latencies, 0.50) * 1000, 1),
+            "p95": round(percentile(latencies, 0.95) * 1000, 1),
+            "p99": round(percentile(latencies, 0.99) * 1000, 1),
+            "mean": round(sum(latencies) / len(latencies) * 1000, 1) if latencies else 0.0,
+            "max": round(latencies[-1] * 1000, 1) if latencies else 0.0,
+        },
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(runs / wall, 3) if wall else 0.0,
+        # ru_maxrss is KiB on Linux.
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "llm_calls_per_run": round(llm_calls / runs, 2) if runs else 0.0,
+        "tokens_per_run": {
+            "prompt": round((counter_total(metrics.LLM_PROMPT_TOKENS) - prompt_before) / runs, 1),
+            "completion": round((counter_total(metrics.LLM_COMPLETION_TOKENS) - completion_before) / runs, 1),
+        },
+        "hot_spots": spots.report(runs),
+    }
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--users", type=int, default=4, help="concurrent simulated users")
+    ap.add_argument("--runs", type=int, default=24, help="total /run requests")
+    ap.add_argument("--latency-ms", type=float, default=200, help="fake LLM median time to first token")
+    ap.add_argument("--latency-sigma", type=float, default=0.3)
+    ap.add_argument("--ms-per-token", type=float, default=0)
+    ap.add_argument("--error-rate", type=float, default=0)
+    ap.add_argument("--rate-429", type=float, default=0)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--caches", action="store_true", help="keep LLM, job page and culture caches on")
+    ap.add_argument("--no-warmup", dest="warmup", action="store_false")
+    ap.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = ap.parse_args(argv)
+
+    configure_env(args)
+    report = run_benchmark(args)
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""Compare job_fetcher's full-parse and streaming text extraction on saved job pages.
+
+    python benchmarks/bench_extract.py [--corpus DIR] [--repeat N] [--inflate KB] [--json]
+
+--inflate appends KB of inline JSON/markup to every page to mimic bloated job boards.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from job_fetcher import _extract_text, extract_text_stream, CHUNK_BYTES, MAX_CHARS  # noqa: E402
+
+DEFAULT_CORPUS = os.path.join(ROOT, "benchmarks", "corpus", "jobs")
+
+
+def load_corpus(path: str, inflate_kb: int) -> dict:
+    pages = {}
+    for name in sorted(os.listdir(path)):
+        if not name.endswith(".html"):
+            continue
+        with open(os.path.join(path, name), encoding="utf-8") as f:
+            html = f.read()
+        if inflate_kb:
+            blob = json.dumps({"items": ["x" * 1000] * inflate_kb})
+            html = html.replace("</body>", f"<script>window.__BLOAT__={blob};</script><div hidden>{'<span>y</span>' * inflate_kb * 50}</div></body>")
+        pages[name] = html
+    return pages
+
+
+def chunked(html: str):
+    # Roughly what iter_content(CHUNK_BYTES) yields after decoding.
+    return (html[i:i + CHUNK_BYTES] for i in range(0, len(html), CHUNK_BYTES))
+
+
+def measure(fn, html: str, repeat: int) -> dict:
+    timings = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(html)
+        timings.append(time.perf_counter() - t0)
+    tracemalloc.start()
+    text = fn(html)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    timings.sort()
+    return {"median_ms": round(timings[len(timings) // 2] * 1000, 2), "peak_kb": peak // 1024, "chars": len(text)}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--corpus", default=DEFAULT_CORPUS)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--inflate", type=int, default=0, metavar="KB")
+    ap.add_argument("--json", action="store_true", help="print one JSON object per page")
+    args = ap.parse_args()
+
+    modes = {
+        "soup": lambda html: _extract_text(html)[:MAX_CHARS],
+        "stream": lambda html: extract_text_stream(chunked(html))[0],
+    }
+    for name, html in load_corpus(args.corpus, args.inflate).items():
+        row = {"page": name, "size_kb": len(html.encode("utf-8")) // 1024}
+        for mode, fn in modes.items():
+            row[mode] = measure(fn, html, args.repeat)
+        if args.json:
+            print(json.dumps(row))
+        else:
+            soup, stream = row["soup"], row["stream"]
+            speedup = soup["median_ms"] / stream["median_ms"] if stream["median_ms"] else float("inf")
+            print(f"{name:32} {row['size_kb']:>6} KB  soup {soup['median_ms']:>8} ms {soup['peak_kb']:>7} KB  "
+                  f"stream {stream['median_ms']:>8} ms {stream['peak_kb']:>7} KB  x{speedup:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+CACHE_DIR = os.getenv("CACHE_DIR", ".cache")
+
+
+def content_key(*parts) -> str:
+    """Stable sha256 over JSON-encoded parts."""
+    blob = json.dumps(parts, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+_WS = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Unicode-normalized, case-folded text with whitespace collapsed, for cache keys."""
+    text = unicodedata.normalize("NFKC", text or "")
+    return _WS.sub(" ", text).strip().casefold()
+
+
+class TieredCache:
+    """Bounded in-memory LRU in front of a SQLite table, both with a TTL.
+
+    Values are text. The memory tier holds at most `memory_items` entries and
+    `memory_max_bytes` of values; the disk tier is pruned oldest-access-first once it
+    grows past `max_bytes`. Safe to share between threads and between processes on one host.
+    """
+
+    def __init__(self, name: str, ttl: float, memory_items: int = 256,
+                 max_bytes: int = 100 * 1024 * 1024, path: Optional[str] = None,
+                 memory_max_bytes: int = 64 * 1024 * 1024):
+        self.name = name
+        self.ttl = ttl
+        self.memory_items = memory_items
+        self.memory_max_bytes = memory_max_bytes
+        self.max_bytes = max_bytes
+        self.path = path or os.path.join(CACHE_DIR, "cache.sqlite3")
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        self._memory = OrderedDict()  # key -> (value, created_at, size)
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._db = None
+
+    # -- disk tier --
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            db = sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.name} ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            db.execute(f"CREATE INDEX IF NOT EXISTS {self.name}_accessed ON {self.name}(accessed_at)")
+            db.commit()
+            self._db = db
+        return self._db
+
+    def _disk_get(self, key: str, now: float) -> Optional[Tuple[str, float]]:
+        """(value, created_at) of a live disk entry, or None."""
+        db = self._conn()
+        row = db.execute(f"SELECT value, created_at FROM {self.name} WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        if now - row[1] > self.ttl:
+            db.execute(f"DELETE FROM {self.name} WHERE key = ?", (key,))
+            db.commit()
+            return None
+        db.execute(f"UPDATE {self.name} SET accessed_at = ? WHERE key = ?", (now, key))
+        db.commit()
+        return row[0], row[1]
+
+    def _disk_set(self, key: str, value: str, now: float) -> None:
+        db = self._conn()
+        db.execute(
+            f"INSERT OR REPLACE INTO {self.name} (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+            (key, value, len(value.encode("utf-8")), now, now),
+        )
+        db.execute(f"DELETE FROM {self.name} WHERE created_at < ?", (now - self.ttl,))
+        total = db.execute(f"SELECT COALESCE(SUM(size), 0) FROM {self.name}").fetchone()[0]
+        while total > self.max_bytes:
+            row = db.execute(f"SELECT key, size FROM {self.name} ORDER BY accessed_at LIMIT 1").fetchone()
+            if row is None:
+                break
+            db.execute(f"DELETE FROM {self.name} WHERE key = ?", (row[0],))
+            total -= row[1]
+            self.stats["evictions"] += 1
+        db.commit()
+
+    # -- public API --
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            hit = self._memory.get(key)
+            if hit is not None:
+                value, created_at, _size = hit
+                if now - created_at <= self.ttl:
+                    self._memory.move_to_end(key)
+                    self.stats["memory_hits"] += 1
+                    return value
+                self._forget(key)
+            try:
+                row = self._disk_get(key, now)
+            except sqlite3.Error:
+                row = None
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            self.stats["disk_hits"] += 1
+            value, created_at = row
+            # Keep the original creation time, so reloading doesn't extend the TTL.
+            self._remember(key, value, created_at)
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+            self.stats["stores"] += 1
+            try:
+                self._disk_set(key, value, now)
+            except sqlite3.Error:
+                pass  # the memory tier still works
+
+    def _remember(self, key: str, value: str, created_at: float) -> None:
+        self._forget(key)
+        size = len(value.encode("utf-8"))
+        if size > self.memory_max_bytes:
+            return  # served from disk only
+        self._memory[key] = (value, created_at, size)
+        self._memory_bytes += size
+        while len(self._memory) > self.memory_items or self._memory_bytes > self.memory_max_bytes:
+            _key, (_value, _created, evicted) = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted
+
+    def _forget(self, key: str) -> None:
+        hit = self._memory.pop(key, None)
+        if hit is not None:
+            self._memory_bytes -= hit[2]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            self._conn().execute(f"DELETE FROM {self.name}")
+            self._db.commit()
+
+    def hit_ratio(self) -> float:
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        total = hits + self.stats["misses"]
+        return hits / total if total else 0.0
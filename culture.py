@@ -0,0 +1,68 @@
+"""Company culture reports, cached per employer.
+
+The culture analysis reads only the company name, the pasted culture text and the
+reviews, so its report is shared by every run that targets the same employer with
+the same inputs. Reports are keyed by a normalized hash of those inputs plus the
+language, and can be produced ahead of time with precompute() or POST /culture.
+"""
+import os
+import asyncio
+from typing import Tuple
+
+from agents import culture_analysis
+from cache import TieredCache, content_key, normalize_text
+from metrics import register_cache
+
+CULTURE_CACHE_ENABLED = os.getenv("CULTURE_CACHE", "true").strip().lower() == "true"
+culture_cache = TieredCache(
+    "culture_reports",
+    ttl=float(os.getenv("CULTURE_CACHE_TTL_SECONDS", str(14 * 24 * 3600))),
+    memory_items=int(os.getenv("CULTURE_CACHE_MEMORY_ITEMS", "128")),
+    max_bytes=int(os.getenv("CULTURE_CACHE_MAX_BYTES", str(50 * 1024 * 1024))),
+)
+register_cache(culture_cache)
+
+
+def culture_key(company: str, culture: str, reviews: str, lang: str) -> str:
+    return content_key("culture", normalize_text(company), normalize_text(culture), normalize_text(reviews), lang)
+
+
+def get_culture_report(company: str, culture: str, reviews: str, lang: str,
+                       refresh: bool = False) -> Tuple[str, bool]:
+    """Return (report, cached). `refresh` recomputes and replaces a cached report."""
+    key = culture_key(company, culture, reviews, lang)
+    if CULTURE_CACHE_ENABLED and not refresh:
+        report = culture_cache.get(key)
+        if report is not None:
+            return report, True
+    # refresh also bypasses the exact-prompt LLM cache, or it would hand back the same text.
+    report = culture_analysis(company, culture, reviews, lang, cache=not refresh)
+    if CULTURE_CACHE_ENABLED and report:
+        culture_cache.set(key, report)
+    return report, False
+
+
+def culture_report(company: str, culture: str, reviews: str, lang: str) -> str:
+    return get_culture_report(company, culture, reviews, lang)[0]
+
+
+async def aculture_report(company: str, culture: str, reviews: str, lang: str) -> str:
+    """culture_report() for the event loop."""
+    key = culture_key(company, culture, reviews, lang)
+    if CULTURE_CACHE_ENABLED:
+        report = await asyncio.to_thread(culture_cache.get, key)
+        if report is not None:
+            return report
+    report = await culture_analysis.arun(company, culture, reviews, lang)
+    if CULTURE_CACHE_ENABLED and report:
+        await asyncio.to_thread(culture_cache.set, key, report)
+    return report
+
+
+culture_report.arun = aculture_report
+
+
+def precompute(company: str, culture: str, reviews: str, lang: str, refresh: bool = False) -> dict:
+    """Produce (or look up) a report ahead of the runs that will need it."""
+    report, cached = get_culture_report(company, culture, reviews, lang, refresh=refresh)
+    return {"key": culture_key(company, culture, reviews, lang), "cached": cached, "report": report}
@@ -0,0 +1,376 @@
+"""Local stand-in for the OpenAI chat-completions API, for load and latency testing.
+
+LLM_BACKEND=fake routes openai_client through this module in-process (an httpx mock
+transport, so the real SDK, retry, streaming and cache paths all run). It can also
+serve over HTTP for other processes or tools:
+
+    python fake_llm.py --port 8089
+    OPENAI_BASE_URL=http://127.0.0.1:8089/v1 OPENAI_API_KEY=x gunicorn ...
+
+Each agent prompt in agents.py gets a canned answer; JSON agents get schema-valid
+JSON derived deterministically from the prompt. Behaviour is tuned with:
+
+    FAKE_LLM_LATENCY_MS      median time to first token (default 300)
+    FAKE_LLM_LATENCY_SIGMA   lognormal spread of that latency (default 0.5; 0 = fixed)
+    FAKE_LLM_MS_PER_TOKEN    generation time per completion token (default 0)
+    FAKE_LLM_ERROR_RATE      share of requests answered with a 500 (default 0)
+    FAKE_LLM_429_RATE        chance that a request starts a 429 burst (default 0)
+    FAKE_LLM_429_BURST       requests rejected per burst (default 5)
+    FAKE_LLM_RETRY_AFTER     Retry-After seconds sent with 429s (unset = none)
+    FAKE_LLM_SEED            seed for latency and error draws (unset = random)
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import hashlib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator, Optional, Tuple
+
+import httpx
+
+
+class FakeConfig:
+    def __init__(self, **overrides):
+        env = os.getenv
+        self.latency_ms = float(env("FAKE_LLM_LATENCY_MS", "300"))
+        self.latency_sigma = float(env("FAKE_LLM_LATENCY_SIGMA", "0.5"))
+        self.ms_per_token = float(env("FAKE_LLM_MS_PER_TOKEN", "0"))
+        self.error_rate = float(env("FAKE_LLM_ERROR_RATE", "0"))
+        self.rate_429 = float(env("FAKE_LLM_429_RATE", "0"))
+        self.burst_429 = int(env("FAKE_LLM_429_BURST", "5"))
+        self.retry_after = env("FAKE_LLM_RETRY_AFTER")
+        seed = env("FAKE_LLM_SEED")
+        self.seed = int(seed) if seed is not None else None
+        for key, value in overrides.items():
+            setattr(self, key, value)
+
+
+# -----------------------------
+# Canned answers per agent
+# -----------------------------
+
+# (marker in the system prompt, agent); first match wins, so more specific markers go first.
+AGENT_MARKERS = [
+    ("extraction agent", "extract_maps"),
+    ("hiring panel", "consolidated_sections"),
+    ("recruiter and ATS screener", "recruiter_match"),
+    ("CV strategist", "optimize_cv"),
+    ("ATS system similar", "ats_audit"),
+    ("generate an ATS submission CV", "ats_submission"),
+    ("hiring manager", "interview_pack"),
+    ("analyze job deeply", "requirement_intelligence"),
+    ("calculate hireability", "hireability_score"),
+    ("simulate recruiter psychology", "recruiter_psychology"),
+    ("company culture", "culture_analysis"),
+    ("scoring explanation rewriter", "hireability_rewriter"),
+]
+
+
+def detect_agent(system: str, user: str) -> str:
+    if "eligibility and knockout gates" in system:
+        if "Check whether the CV" in user:
+            return "cv_gate_check"
+        if "then check whether the CV" in user:
+            return "hard_gate_extract"
+        return "job_gate_extract"
+    for marker, agent in AGENT_MARKERS:
+        if marker in system:
+            return agent
+    return "other"
+
+
+def _section(user: str, name: str) -> str:
+    """Text after a 'NAME:' line in an agents.py prompt, up to the next such header."""
+    marker = f"\n{name}:\n"
+    start = user.find(marker)
+    if start < 0:
+        return ""
+    rest = user[start + len(marker):]
+    for other in ("\nCV:\n", "\nJOB:\n", "\nROLE:", "\nHARD GATES (JSON):\n"):
+        cut = rest.find(other)
+        if cut >= 0:
+            rest = rest[:cut]
+    return rest.strip()
+
+
+def _words(text: str, rnd: random.Random, n: int) -> list:
+    words = [w.strip(".,:;()") for w in text.split() if len(w) > 3]
+    return [" ".join(rnd.sample(words, min(3, len(words)))) for _ in range(n)] if words else []
+
+
+def _gates(rnd: random.Random, with_cv: bool) -> list:
+    gates = []
+    for kind, requirement in rnd.sample([("language", "Fluent Swedish"), ("security_clearance", "Security clearance"),
+                                         ("right_to_work", "EU work permit"), ("degree", "MSc degree")],
+                                        rnd.choice([0, 0, 1, 2])):
+        gate = {"type": kind, "requirement": requirement,
+                "severity": rnd.choice(["hard_gate", "strong_preference"]),
+                "evidence_quote": f"{requirement} is required"}
+        if with_cv:
+            gate.update(cv_evidence_status=rnd.choice(["satisfied", "satisfied", "unclear", "missing"]),
+                        recommended_action="State this explicitly in the CV.")
+        gates.append(gate)
+    return gates
+
+
+def canned_answer(agent: str, system: str, user: str) -> str:
+    """Deterministic answer for an agent: the same prompt always gets the same text."""
+    rnd = random.Random(hashlib.sha256((system + user).encode("utf-8")).digest())
+    cv, job = _section(user, "CV"), _section(user, "JOB")
+    if agent == "extract_maps":
+        return json.dumps({
+            "job_map": {"title": "Role", "seniority": "mid", "must_have": _words(job, rnd, 4),
+                        "nice_to_have": _words(job, rnd, 2), "responsibilities": _words(job, rnd, 3),
+                        "tools": _words(job, rnd, 3), "languages": ["English"], "eligibility": [],
+                        "culture_signals": _words(job, rnd, 2)},
+            "candidate_map": {"headline": "Experienced professional", "years_experience": str(rnd.randint(1, 15)),
+                              "roles": [{"title": "Engineer", "employer": "Acme", "period": "2019-2024",
+                                         "highlights": _words(cv, rnd, 2)}],
+                              "skills": _words(cv, rnd, 5), "tools": _words(cv, rnd, 3), "education": ["BSc"],
+                              "certifications": [], "languages": ["English"], "eligibility_statements": []},
+        })
+    if agent in ("hard_gate_extract", "job_gate_extract"):
+        return json.dumps({"hard_gates": _gates(rnd, with_cv=agent == "hard_gate_extract")})
+    if agent == "cv_gate_check":
+        try:
+            gates = json.loads(_section(user, "HARD GATES (JSON)")).get("hard_gates") or []
+        except ValueError:
+            gates = []
+        return json.dumps({"hard_gates": [
+            dict(g, cv_evidence_status=rnd.choice(["satisfied", "satisfied", "unclear", "missing"]),
+                 recommended_action="State this explicitly in the CV.") for g in gates]})
+    if agent == "recruiter_match":
+        return json.dumps({
+            "match_score": rnd.randint(30, 95),
+            "blockers": [],
+            "critical_gaps": _words(job, rnd, rnd.randint(0, 2)),
+            "moderate_gaps": _words(job, rnd, rnd.randint(0, 3)),
+            "minor_gaps": _words(cv, rnd, rnd.randint(0, 3)),
+            "evidence_quality": rnd.choice(["strong", "medium", "weak"]),
+            "timeline_risk": rnd.choice(["low", "medium", "high"]),
+            "short_rationale": "The CV covers most core requirements with some gaps in depth.",
+        })
+    if agent == "consolidated_sections":
+        return json.dumps({
+            "requirement_intelligence": "Core skills:\n- " + "\n- ".join(_words(job, rnd, 4)),
+            "recruiter_psychology": "First impression is positive; the recruiter looks for clearer impact.",
+            "interview_pack": "1. Walk me through a recent project.\n2. How do you handle conflicting priorities?",
+        })
+    if agent == "hireability_rewriter":
+        return user.split("Draft explanation:\n", 1)[-1].strip()
+    paragraphs = [f"{agent.replace('_', ' ').title()}"] + [f"- {p}" for p in _words(cv + " " + job, rnd, 8)]
+    return "\n".join(paragraphs)
+
+
+def count_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+# -----------------------------
+# Backend
+# -----------------------------
+
+class FakeBackend:
+    """Chat-completions behaviour shared by the in-process transport and the HTTP server."""
+
+    def __init__(self, config: Optional[FakeConfig] = None):
+        self.config = config or FakeConfig()
+        self._rnd = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        self._burst_left = 0
+        self.requests = 0
+
+    def _draw(self) -> Tuple[Optional[int], float]:
+        """(error status or None, first-token latency in seconds) for the next request."""
+        cfg = self.config
+        with self._lock:
+            self.requests += 1
+            if self._burst_left == 0 and cfg.rate_429 and self._rnd.random() < cfg.rate_429:
+                self._burst_left = cfg.burst_429
+            if self._burst_left:
+                self._burst_left -= 1
+                return 429, 0.0
+            if cfg.error_rate and self._rnd.random() < cfg.error_rate:
+                return 500, cfg.latency_ms / 1000
+            latency = cfg.latency_ms / 1000
+            if cfg.latency_sigma:
+                latency *= self._rnd.lognormvariate(0, cfg.latency_sigma)
+            return None, latency
+
+    def plan(self, body: dict) -> dict:
+        """Everything needed to answer one request, without sleeping."""
+        messages = body.get("messages") or []
+        system = next((m["content"] for m in messages if m.get("role") == "system"), "")
+        user = "\n".join(m["content"] for m in messages if m.get("role") == "user")
+        status, latency = self._draw()
+        if status is not None:
+            return {"status": status, "latency": latency}
+        content = canned_answer(detect_agent(system, user), system, user)
+        usage = {"prompt_tokens": count_tokens(system + user), "completion_tokens": count_tokens(content)}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        return {"status": 200, "latency": latency, "content": content, "usage": usage,
+                "model": body.get("model", "fake"), "stream": bool(body.get("stream")),
+                "per_token": self.config.ms_per_token / 1000}
+
+    def error_headers(self, plan: dict) -> dict:
+        if plan["status"] == 429 and self.config.retry_after is not None:
+            return {"retry-after": str(self.config.retry_after)}
+        return {}
+
+    @staticmethod
+    def error_body(plan: dict) -> dict:
+        kind = "rate_limit_exceeded" if plan["status"] == 429 else "server_error"
+        return {"error": {"message": f"fake {kind}", "type": kind, "code": kind}}
+
+    @staticmethod
+    def completion(plan: dict) -> dict:
+        return {
+            "id": "chatcmpl-fake", "object": "chat.completion", "created": int(time.time()),
+            "model": plan["model"],
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": plan["content"]},
+                         "finish_reason": "stop"}],
+            "usage": plan["usage"],
+        }
+
+    @staticmethod
+    def stream_chunks(plan: dict, chunk_chars: int = 16) -> Iterator[Tuple[bytes, float]]:
+        """(SSE bytes, seconds to wait before sending them) for a streamed answer."""
+        base = {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()),
+                "model": plan["model"]}
+        content = plan["content"]
+        pause = plan["per_token"] * chunk_chars / 4
+        for i in range(0, len(content), chunk_chars):
+            delta = {"content": content[i:i + chunk_chars]}
+            chunk = dict(base, choices=[{"index": 0, "delta": delta, "finish_reason": None}])
+            yield f"data: {json.dumps(chunk)}\n\n".encode("utf-8"), pause
+        yield f"data: {json.dumps(dict(base, choices=[], usage=plan['usage']))}\n\n".encode("utf-8"), 0.0
+        yield b"data: [DONE]\n\n", 0.0
+
+    # -- httpx transports --
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        plan = self.plan(json.loads(request.content or b"{}"))
+        time.sleep(plan["latency"])
+        if plan["status"] != 200:
+            return httpx.Response(plan["status"], json=self.error_body(plan), headers=self.error_headers(plan))
+        if plan["stream"]:
+            def body():
+                for data, pause in self.stream_chunks(plan):
+                    time.sleep(pause)
+                    yield data
+            return httpx.Response(200, content=body(), headers={"content-type": "text/event-stream"})
+        time.sleep(plan["per_token"] * plan["usage"]["completion_tokens"])
+        return httpx.Response(200, json=self.completion(plan))
+
+    async def ahandle(self, request: httpx.Request) -> httpx.Response:
+        plan = self.plan(json.loads(request.content or b"{}"))
+        await asyncio.sleep(plan["latency"])
+        if plan["status"] != 200:
+            return httpx.Response(plan["status"], json=self.error_body(plan), headers=self.error_headers(plan))
+        if plan["stream"]:
+            async def body():
+                for data, pause in self.stream_chunks(plan):
+                    await asyncio.sleep(pause)
+                    yield data
+            return httpx.Response(200, content=body(), headers={"content-type": "text/event-stream"})
+        await asyncio.sleep(plan["per_token"] * plan["usage"]["completion_tokens"])
+        return httpx.Response(200, json=self.completion(plan))
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend() -> FakeBackend:
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = FakeBackend()
+    return _backend
+
+
+def transport() -> httpx.MockTransport:
+    return httpx.MockTransport(get_backend().handle)
+
+
+def async_transport() -> httpx.MockTransport:
+    return httpx.MockTransport(get_backend().ahandle)
+
+
+# -----------------------------
+# HTTP server
+# -----------------------------
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    backend: FakeBackend = None
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _send_json(self, status: int, payload: dict, headers: Optional[dict] = None) -> None:
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        plan = self.backend.plan(json.loads(self.rfile.read(length) or b"{}"))
+        time.sleep(plan["latency"])
+        if plan["status"] != 200:
+            self._send_json(plan["status"], self.backend.error_body(plan), self.backend.error_headers(plan))
+            return
+        if not plan["stream"]:
+            time.sleep(plan["per_token"] * plan["usage"]["completion_tokens"])
+            self._send_json(200, self.backend.completion(plan))
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for data, pause in self.backend.stream_chunks(plan):
+            time.sleep(pause)
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+
+def serve(host: str = "127.0.0.1", port: int = 8089, backend: Optional[FakeBackend] = None) -> ThreadingHTTPServer:
+    """Start the fake API in a background thread and return the server."""
+    handler = type("Handler", (_Handler,), {"backend": backend or get_backend()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Serve a fake OpenAI chat-completions API.")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8089)
+    args = ap.parse_args(argv)
+    server = serve(args.host, args.port)
+    print(f"Fake OpenAI API on http://{args.host}:{server.server_address[1]}/v1", file=sys.stderr)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+"""Hard-gate extraction, optionally split into a cached job phase and a per-CV check.
+
+In two_phase mode the job's eligibility constraints are extracted once per job
+content and cached; each candidate then costs one smaller call that checks the CV
+against those gates (none when the job states no gates). single mode extracts and
+checks in one call per CV, as hard_gate_extract always did.
+"""
+import os
+import json
+import asyncio
+
+from agents import hard_gate_extract, job_gate_extract, cv_gate_check
+from cache import TieredCache, content_key, normalize_text
+from metrics import register_cache
+from scoring import parse_json_with_repair
+from singleflight import SingleFlight
+
+# "single" (default): one hard_gate_extract call per CV. "two_phase": job gates once per job,
+# then a per-CV check; opt-in until it has been compared against the single-call extractor.
+HARD_GATE_MODE = os.getenv("HARD_GATE_MODE", "single").strip().lower()
+
+job_gates_cache = TieredCache(
+    "job_gates",
+    ttl=float(os.getenv("JOB_GATES_CACHE_TTL_SECONDS", str(7 * 24 * 3600))),
+    memory_items=int(os.getenv("JOB_GATES_CACHE_MEMORY_ITEMS", "256")),
+    max_bytes=int(os.getenv("JOB_GATES_CACHE_MAX_BYTES", str(20 * 1024 * 1024))),
+)
+register_cache(job_gates_cache)
+
+job_gates_flight = SingleFlight("job_gates")
+
+
+def _job_gates_key(job: str, lang: str) -> str:
+    return content_key("job_gates", normalize_text(job), lang)
+
+
+def job_gates(job: str, lang: str) -> str:
+    """Job-side gates JSON, extracted once per job content and language.
+
+    Concurrent callers for the same job (e.g. a batch screening many CVs against
+    one posting) wait for the first extraction instead of repeating it.
+    """
+    key = _job_gates_key(job, lang)
+    cached = job_gates_cache.get(key)
+    if cached is not None:
+        return cached
+
+    def extract():
+        # An extraction for this job may have finished since the lookup above.
+        cached = job_gates_cache.get(key)
+        if cached is not None:
+            return cached
+        raw = job_gate_extract(job, lang)
+        job_gates_cache.set(key, raw)
+        return raw
+
+    return job_gates_flight.do(key, extract)[0]
+
+
+def _no_gates(gates: str) -> bool:
+    return not (parse_json_with_repair(gates).get("hard_gates") or [])
+
+
+def hard_gates(cv: str, job: str, role: str, lang: str) -> str:
+    """Hard-gate JSON in the hard_gate_extract format, produced according to HARD_GATE_MODE."""
+    if HARD_GATE_MODE != "two_phase":
+        return hard_gate_extract(cv, job, role, lang)
+    gates = job_gates(job, lang)
+    if _no_gates(gates):
+        return json.dumps({"hard_gates": []})
+    return cv_gate_check(cv, gates, role, lang)
+
+
+async def ajob_gates(job: str, lang: str) -> str:
+    """job_gates() for the event loop."""
+    key = _job_gates_key(job, lang)
+    cached = await asyncio.to_thread(job_gates_cache.get, key)
+    if cached is not None:
+        return cached
+
+    async def extract():
+        cached = await asyncio.to_thread(job_gates_cache.get, key)
+        if cached is not None:
+            return cached
+        raw = await job_gate_extract.arun(job, lang)
+        await asyncio.to_thread(job_gates_cache.set, key, raw)
+        return raw
+
+    return (await job_gates_flight.ado(key, extract))[0]
+
+
+async def ahard_gates(cv: str, job: str, role: str, lang: str) -> str:
+    """hard_gates() for the event loop."""
+    if HARD_GATE_MODE != "two_phase":
+        return await hard_gate_extract.arun(cv, job, role, lang)
+    gates = await ajob_gates(job, lang)
+    if _no_gates(gates):
+        return json.dumps({"hard_gates": []})
+    return await cv_gate_check.arun(cv, gates, role, lang)
+
+
+hard_gates.arun = ahard_gates
@@ -0,0 +1,308 @@
+"""Fit the CV and job text of a run into each agent's input token budget.
+
+Texts over budget are split into sections (heading-led blocks, cut into chunks of
+at most SECTION_MAX_TOKENS), ranked by relevance to the role and the job's
+requirements, and the best sections are kept in their original order. The first
+section (name, title, contact) is placed first and repeated sections are dropped first.
+
+The budget covers the CV and job text together (the CV alone for an agent that
+is not sent the job, see fit_cv). It is INPUT_TOKEN_BUDGET unless
+the agent's route (routing.py) sets "input_tokens"; 0 (the default) turns trimming
+off. The gate and map extractors and the CV rewrites are never trimmed by default. Token counts use tiktoken
+(one cached encoding per model), else about four characters per token.
+"""
+import os
+import re
+import math
+import logging
+import functools
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from routing import route, model_name
+from metrics import Counter
+
+log = logging.getLogger(__name__)
+
+INPUT_TOKEN_BUDGET = int(os.getenv("INPUT_TOKEN_BUDGET", "0"))
+SECTION_MAX_TOKENS = int(os.getenv("SECTION_MAX_TOKENS", "400"))
+
+INPUT_SECTIONS_DROPPED = Counter("input_sections_dropped_total", "CV and job sections left out to fit an agent's input budget.")
+
+# Lower-case headings (without a trailing colon) that start a section even when not in capitals.
+HEADINGS = {
+    "summary", "profile", "experience", "work experience", "employment", "education", "skills",
+    "technical skills", "languages", "certifications", "projects", "references", "interests",
+    "about us", "about the role", "the role", "responsibilities", "what you will do", "what you'll do",
+    "requirements", "qualifications", "who you are", "what we offer", "we offer", "benefits", "apply",
+    "profil", "sammanfattning", "erfarenhet", "arbetslivserfarenhet", "utbildning", "kompetenser",
+    "språk", "certifieringar", "projekt", "referenser", "om oss", "om tjänsten", "om rollen",
+    "arbetsuppgifter", "krav", "kvalifikationer", "meriterande", "din profil", "vi söker dig som",
+    "vi erbjuder", "ansökan",
+}
+# Sections about what the candidate must have (or has); ranked higher, and the job's are used to rank the CV.
+REQUIREMENT_HEADINGS = {
+    "requirements", "qualifications", "who you are", "skills", "technical skills",
+    "krav", "kvalifikationer", "meriterande", "din profil", "vi söker dig som",
+}
+STOPWORDS = {
+    "the", "and", "for", "with", "you", "our", "are", "will", "have", "has", "from", "this", "that",
+    "your", "who", "all", "can", "into", "per", "was", "were", "not", "but", "its", "their",
+    "och", "att", "det", "som", "för", "med", "har", "vid", "till", "av", "på", "är", "en", "ett",
+    "du", "vi", "oss", "dig", "din", "ditt", "den", "de", "om", "inom", "samt", "eller", "hos",
+}
+
+_WORD = re.compile(r"[^\W_][\w+#.-]*")
+
+
+@functools.lru_cache(maxsize=None)
+def _encoding(model: str):
+    """tiktoken encoding for a model, loaded once; None without tiktoken or if it can't be loaded.
+
+    The first load may download the BPE file; trimming must not fail a run over it.
+    """
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        log.warning("tiktoken encoding for %s unavailable (%s); estimating tokens from length", model, e)
+        return None
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    enc = _encoding(model or model_name("default"))
+    if enc is not None:
+        try:
+            return len(enc.encode(text, disallowed_special=()))
+        except Exception:
+            pass
+    return (len(text) + 3) // 4
+
+
+def terms(text: str) -> set:
+    words = (w.strip(".-").lower() for w in _WORD.findall(text))
+    return {w for w in words if len(w) > 1 and w not in STOPWORDS}
+
+
+def _heading(line: str) -> Optional[str]:
+    """The heading a line introduces, or None."""
+    s = line.strip()
+    name = s.rstrip(":").strip()
+    if not name or len(name) > 60 or name.endswith((".", ",", ";")):
+        return None
+    if s.endswith(":") or name.lower() in HEADINGS or (name.isupper() and any(c.isalpha() for c in name)):
+        return name
+    return None
+
+
+class Section:
+    def __init__(self, label: str, lines: List[str], tokens: int, index: int):
+        self.label = label
+        self.lines = lines
+        self.tokens = tokens
+        self.index = index
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.lines)
+
+    def describe(self) -> str:
+        first = next((l.strip() for l in self.lines if l.strip() != self.label), "")
+        if not first:
+            return self.label
+        first = first if len(first) <= 60 else first[:57] + "..."
+        return f"{self.label}: {first}" if self.label else first
+
+
+def split_sections(text: str, max_tokens: int = SECTION_MAX_TOKENS, model: Optional[str] = None) -> List[Section]:
+    """Heading-led, blank-line-separated blocks of text, cut into chunks of at most max_tokens."""
+    sections: List[Section] = []
+    label = ""
+    block: List[str] = []
+
+    def flush():
+        chunk, size = [], 0
+        for line in block:
+            n = count_tokens(line, model) + 1
+            if chunk and size + n > max_tokens:
+                sections.append(Section(label, chunk, size, len(sections)))
+                chunk, size = [], 0
+            chunk.append(line)
+            size += n
+        if chunk:
+            sections.append(Section(label, chunk, size, len(sections)))
+        block.clear()
+
+    for line in text.splitlines():
+        if not line.strip():
+            flush()
+            continue
+        heading = _heading(line)
+        if heading:
+            flush()
+            label = heading
+        block.append(line)
+    flush()
+    return sections
+
+
+def rank_sections(sections: List[Section], query: Dict[str, float]) -> List[float]:
+    """Relevance of each section: weighted query terms it contains, per sqrt(token).
+
+    Every section starts from a small base score, and each further block under the
+    same heading counts less, so a long tail of similar entries goes before short
+    sections such as education or languages.
+    """
+    scores = []
+    seen = set()
+    blocks: Dict[str, int] = {}
+    for s in sections:
+        key = " ".join(s.text.split()).lower()
+        earlier = blocks.get(s.label, 0)
+        blocks[s.label] = earlier + 1
+        if s.index == 0:
+            scores.append(math.inf)
+        elif key in seen:
+            scores.append(-1.0)
+        else:
+            hits = 1 + sum(query.get(t, 0.0) for t in terms(s.text))
+            if s.label.lower() in REQUIREMENT_HEADINGS:
+                hits *= 2
+            scores.append(hits / math.sqrt(max(1, s.tokens)) / (1 + earlier))
+        seen.add(key)
+    return scores
+
+
+def _describe_dropped(sections: List[Section]) -> List[str]:
+    """One entry per dropped section, with runs under the same heading merged."""
+    out = []
+    i = 0
+    while i < len(sections):
+        j = i
+        while j + 1 < len(sections) and sections[j + 1].label == sections[i].label \
+                and sections[j + 1].index == sections[j].index + 1:
+            j += 1
+        if j > i and sections[i].label:
+            out.append(f"{sections[i].label} ({j - i + 1} parts)")
+        else:
+            out.extend(s.describe() for s in sections[i:j + 1])
+        i = j + 1
+    return out
+
+
+def fit_text(text: str, budget: int, query: Dict[str, float],
+             model: Optional[str] = None) -> Tuple[str, dict]:
+    """(text, report): the text cut to about `budget` tokens by dropping the least relevant sections.
+
+    The report has the original "tokens" and, when anything was cut, "kept_tokens" and "dropped".
+    """
+    tokens = count_tokens(text, model)
+    if budget <= 0 or tokens <= budget:
+        return text, {"tokens": tokens}
+    sections = split_sections(text, model=model)
+    scores = rank_sections(sections, query)
+    keep, used = set(), 0
+    for i in sorted(range(len(sections)), key=lambda i: (-scores[i], i)):
+        if used + sections[i].tokens <= budget:
+            keep.add(i)
+            used += sections[i].tokens
+
+    lines: List[str] = []
+    label = None
+    for s in sections:
+        if s.index not in keep:
+            continue
+        # Repeat the heading over a kept block whose heading block was dropped.
+        if s.label and s.label != label and _heading(s.lines[0]) is None:
+            lines.append(s.label)
+        lines.extend(s.lines)
+        lines.append("")
+        label = s.label
+    fitted = "\n".join(lines).strip() or text[:budget * 4]
+    dropped = _describe_dropped([s for s in sections if s.index not in keep])
+    return fitted, {"tokens": tokens, "kept_tokens": used, "dropped": dropped}
+
+
+def split_budget(budget: int, cv_tokens: int, job_tokens: int) -> Tuple[int, int]:
+    """Share a budget between CV and job: half each, with what one doesn't need going to the other."""
+    half = budget // 2
+    if cv_tokens <= half:
+        return cv_tokens, budget - cv_tokens
+    if job_tokens <= half:
+        return budget - job_tokens, job_tokens
+    return half, budget - half
+
+
+class InputFitter:
+    """The CV and job of one run, fitted to each agent's budget; `report` lists what was dropped."""
+
+    def __init__(self, cv: str, job: str, role: str):
+        self.cv = cv
+        self.job = job
+        self._role = role
+        self._fitted: Dict[Tuple[int, bool], Tuple[str, str, dict]] = {}
+        self._lock = threading.Lock()
+        self.report: Dict[str, dict] = {}
+
+    # Counted on first use, so runs with trimming off never touch the tokenizer.
+    @functools.cached_property
+    def cv_tokens(self) -> int:
+        return count_tokens(self.cv)
+
+    @functools.cached_property
+    def job_tokens(self) -> int:
+        return count_tokens(self.job)
+
+    @functools.cached_property
+    def _queries(self) -> Tuple[Dict[str, float], Dict[str, float]]:
+        """(query for CV sections, query for job sections)."""
+        role = dict.fromkeys(terms(self._role), 3.0)
+        job_sections = split_sections(self.job)
+        requirements = set().union(*[terms(s.text) for s in job_sections
+                                     if s.label.lower() in REQUIREMENT_HEADINGS])
+        cv_query = dict.fromkeys(terms(self.job), 1.0)
+        cv_query.update(dict.fromkeys(requirements, 2.0))
+        cv_query.update(role)
+        job_query = dict.fromkeys(terms(self.cv), 1.0)
+        job_query.update(role)
+        return cv_query, job_query
+
+    def budget(self, agent: str) -> int:
+        budget = route(agent).get("input_tokens")
+        return INPUT_TOKEN_BUDGET if budget is None else budget
+
+    def fit(self, agent: str) -> Tuple[str, str]:
+        """(cv, job) for an agent, within its input budget."""
+        return self._fit(agent, with_job=True)
+
+    def fit_cv(self, agent: str) -> str:
+        """The CV alone for an agent that is not sent the job, with the whole budget going to the CV."""
+        return self._fit(agent, with_job=False)[0]
+
+    def _fit(self, agent: str, with_job: bool) -> Tuple[str, str]:
+        budget = self.budget(agent)
+        if budget <= 0 or self.cv_tokens + (self.job_tokens if with_job else 0) <= budget:
+            return self.cv, self.job
+        with self._lock:
+            if (budget, with_job) not in self._fitted:
+                if with_job:
+                    cv_budget, job_budget = split_budget(budget, self.cv_tokens, self.job_tokens)
+                else:
+                    cv_budget, job_budget = budget, self.job_tokens
+                cv_query, job_query = self._queries
+                cv, cv_report = fit_text(self.cv, cv_budget, cv_query)
+                job, job_report = fit_text(self.job, job_budget, job_query)
+                report = {k: v for k, v in (("cv", cv_report), ("job", job_report)) if v.get("dropped")}
+                self._fitted[budget, with_job] = (cv, job, report)
+            cv, job, report = self._fitted[budget, with_job]
+            if report:
+                self.report[agent] = dict(report, budget=budget)
+            for part in report.values():
+                INPUT_SECTIONS_DROPPED.inc(len(part["dropped"]), agent=agent)
+        return cv, job
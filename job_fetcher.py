@@ -1,10 +1,68 @@
+import os
+import json
+import time
+import codecs
+import asyncio
+import weakref
+import threading
+from typing import Iterable, Iterator, List, Optional, Tuple
+import httpx
 import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
-from urllib.parse import urlparse
+from lxml import etree
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
+
+from cache import TieredCache
+from metrics import JOB_FETCH_LATENCY, JOB_FETCH_ERRORS, JOB_FETCH_IN_FLIGHT, register_cache
 
 HEADERS = {"User-Agent": "Mozilla/5.0 (compatible; KarriarSverigeAI/1.0)"}
 MAX_CHARS = 20000
 MIN_CHARS_DEFAULT = 300
+FETCH_TIMEOUT = 12
+SKIP_TAGS = {"script", "style", "noscript", "header", "footer", "svg"}
+
+# "stream" extracts text while downloading and stops at MAX_CHARS; "soup" parses the full page.
+EXTRACT_MODE = os.getenv("JOB_EXTRACT_MODE", "stream").strip().lower()
+MAX_DOWNLOAD_BYTES = int(os.getenv("JOB_MAX_DOWNLOAD_BYTES", str(5 * 1024 * 1024)))
+CHUNK_BYTES = 64 * 1024
+
+# Postings younger than JOB_CACHE_TTL_SECONDS are served without touching the network;
+# older ones are revalidated with ETag/Last-Modified until JOB_CACHE_MAX_AGE_SECONDS.
+JOB_CACHE_TTL_SECONDS = float(os.getenv("JOB_CACHE_TTL_SECONDS", "900"))
+JOB_CACHE_MAX_AGE_SECONDS = float(os.getenv("JOB_CACHE_MAX_AGE_SECONDS", str(7 * 24 * 3600)))
+JOB_CACHE_ENABLED = os.getenv("JOB_CACHE", "true").strip().lower() == "true"
+HTTP_POOL_SIZE = int(os.getenv("JOB_FETCH_POOL_SIZE", "10"))
+
+TRACKING_PARAMS = {"fbclid", "gclid", "msclkid", "mc_cid", "mc_eid"}
+
+job_cache = TieredCache(
+    "job_pages",
+    ttl=JOB_CACHE_MAX_AGE_SECONDS,
+    memory_items=int(os.getenv("JOB_CACHE_MEMORY_ITEMS", "128")),
+    memory_max_bytes=int(os.getenv("JOB_CACHE_MEMORY_BYTES", str(16 * 1024 * 1024))),
+    max_bytes=int(os.getenv("JOB_CACHE_MAX_BYTES", str(100 * 1024 * 1024))),
+)
+register_cache(job_cache)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """Shared session so repeat hosts reuse pooled keep-alive connections."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                s = requests.Session()
+                s.headers.update(HEADERS)
+                adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+                s.mount("http://", adapter)
+                s.mount("https://", adapter)
+                _session = s
+    return _session
+
 
 def _validate_url(url: str) -> None:
     if not url or not url.startswith(("http://", "https://")):
@@ -15,9 +73,25 @@ def _validate_url(url: str) -> None:
     if host in {"localhost"} or host.startswith("127.") or host.startswith("0."):
         raise ValueError("Local URLs are not allowed")
 
+
+def normalize_url(url: str) -> str:
+    """Cache key for a posting URL: lowercase host, no fragment, no tracking params, sorted query."""
+    parsed = urlparse(url.strip())
+    host = (parsed.hostname or "").lower()
+    port = parsed.port
+    if port and not ((parsed.scheme == "http" and port == 80) or (parsed.scheme == "https" and port == 443)):
+        host = f"{host}:{port}"
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parsed.query, keep_blank_values=True)
+        if not (k.lower().startswith("utm_") or k.lower() in TRACKING_PARAMS)
+    )
+    path = parsed.path or "/"
+    return urlunparse((parsed.scheme.lower(), host, path, "", urlencode(query), ""))
+
+
 def _extract_text(html: str) -> str:
     soup = BeautifulSoup(html, "lxml")
-    for tag in soup(["script","style","noscript","header","footer","svg"]):
+    for tag in soup(list(SKIP_TAGS)):
         tag.decompose()
 
     text = soup.get_text(separator="\n")
@@ -25,23 +99,293 @@ def _extract_text(html: str) -> str:
     clean = "\n".join([ln for ln in lines if ln])
     return clean
 
-def fetch_job_preview(url: str) -> dict:
-    """Fetch a URL and return best-effort extracted text + meta (no minimum length enforcement)."""
-    _validate_url(url)
-    resp = requests.get(url, headers=HEADERS, timeout=12, allow_redirects=True)
-    resp.raise_for_status()
-    clean = _extract_text(resp.text)
+
+class _TextCollector:
+    """lxml parser target keeping visible text lines, skipping SKIP_TAGS subtrees."""
+
+    def __init__(self, max_chars: int):
+        self.max_chars = max_chars
+        self.lines: List[str] = []
+        self.length = 0
+        self._skip = 0
+        self._buf: List[str] = []
+
+    @property
+    def full(self) -> bool:
+        return self.length >= self.max_chars
+
+    def start(self, tag, attrib):
+        if self._skip or tag in SKIP_TAGS:
+            self._skip += 1
+        self._flush()
+
+    def end(self, tag):
+        if self._skip:
+            self._skip -= 1
+        self._flush()
+
+    def data(self, data):
+        if not self._skip and not self.full:
+            self._buf.append(data)
+
+    def _flush(self):
+        if not self._buf:
+            return
+        text = "".join(self._buf)
+        self._buf = []
+        for ln in text.splitlines():
+            ln = ln.strip()
+            if ln and not self.full:
+                self.lines.append(ln)
+                self.length += len(ln) + 1
+
+    def close(self):
+        self._flush()
+        return "\n".join(self.lines)
+
+
+class TextStream:
+    """Push-style text extraction: feed() decoded chunks as they arrive, then close()."""
+
+    def __init__(self, max_chars: int = MAX_CHARS):
+        self.collector = _TextCollector(max_chars)
+        self.parser = etree.HTMLParser(target=self.collector)
+        self._carry = ""
+
+    @property
+    def full(self) -> bool:
+        """max_chars of text collected; the rest of the page is not parsed, so the text is truncated."""
+        return self.collector.full
+
+    def feed(self, chunk: str) -> None:
+        # Cut each chunk right before a '<': libxml2's push parser loses the end of a
+        # <script>/<style> element when a closing tag is split across two feed() calls.
+        chunk = self._carry + chunk
+        cut = chunk.rfind("<")
+        if cut <= 0:
+            self._carry = chunk
+            return
+        self._carry = chunk[cut:]
+        if not self.full:
+            self.parser.feed(chunk[:cut])
+
+    def close(self) -> str:
+        if self._carry and not self.full:
+            self.parser.feed(self._carry)
+        try:
+            return self.parser.close()
+        except etree.LxmlError:
+            return self.collector.close()
+
+
+def extract_text_stream(chunks: Iterable[str], max_chars: int = MAX_CHARS) -> Tuple[str, bool]:
+    """Incremental equivalent of _extract_text: no tree is built and parsing stops at max_chars.
+
+    Returns (text, truncated); the chunks are not read past the point where the text was cut.
+    """
+    stream = TextStream(max_chars)
+    for chunk in chunks:
+        stream.feed(chunk)
+        if stream.full:
+            break
+    return stream.close(), stream.full
+
+
+def _decoder(encoding: str):
+    try:
+        return codecs.getincrementaldecoder(encoding or "utf-8")(errors="replace")
+    except LookupError:
+        return codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+
+def _iter_body(resp) -> Iterator[str]:
+    """Decoded response body in chunks, capped at MAX_DOWNLOAD_BYTES."""
+    decoder = _decoder(resp.encoding)
+    remaining = MAX_DOWNLOAD_BYTES
+    for chunk in resp.iter_content(CHUNK_BYTES):
+        chunk = chunk[:remaining]
+        remaining -= len(chunk)
+        yield decoder.decode(chunk)
+        if remaining <= 0:
+            break
+    yield decoder.decode(b"", final=True)
+
+
+def _preview(entry: dict) -> dict:
+    return {
+        "status_code": entry["status_code"],
+        "final_url": entry["final_url"],
+        "text": entry["text"][:MAX_CHARS],
+        "text_length": entry["text_length"],
+        # The page has more text than was extracted (stream mode) or shown (soup mode).
+        "truncated": entry.get("truncated", False),
+    }
+
+
+def _revalidation_headers(cached: dict = None) -> dict:
+    headers = {}
+    if cached:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+    return headers
+
+
+def _entry(resp, clean: str, truncated: bool) -> dict:
+    # Only the extracted text is kept: the raw HTML is not needed once parsed, and would
+    # make every cache entry as large as the page.
     return {
         "status_code": resp.status_code,
         "final_url": str(resp.url),
-        "text": clean[:MAX_CHARS],
+        "text": clean,
         "text_length": len(clean),
+        "truncated": truncated or len(clean) > MAX_CHARS,
+        "etag": resp.headers.get("ETag"),
+        "last_modified": resp.headers.get("Last-Modified"),
+        "fetched_at": time.time(),
     }
 
-def fetch_job_from_url(url: str, min_chars: int = MIN_CHARS_DEFAULT) -> str:
-    """Fetch and extract job text. Raises ValueError if content looks blocked/too short."""
-    meta = fetch_job_preview(url)
-    clean = meta["text"]
+
+def _download(url: str, cached: dict = None) -> dict:
+    resp = get_session().get(url, headers=_revalidation_headers(cached), timeout=FETCH_TIMEOUT,
+                             allow_redirects=True, stream=True)
+    try:
+        if cached and resp.status_code == 304:
+            return dict(cached, fetched_at=time.time())
+        resp.raise_for_status()
+
+        if EXTRACT_MODE == "stream":
+            # Stops reading the body once MAX_CHARS of text is collected.
+            clean, truncated = extract_text_stream(_iter_body(resp))
+        else:
+            clean, truncated = _extract_text("".join(_iter_body(resp))), False
+    finally:
+        resp.close()
+
+    return _entry(resp, clean, truncated)
+
+
+def _cached_entry(raw: Optional[str]) -> Optional[dict]:
+    if not raw:
+        return None
+    entry = json.loads(raw)
+    entry.pop("html", None)  # stored by older versions; dropped when the entry is rewritten
+    return entry
+
+
+def fetch_job_page(url: str) -> dict:
+    """Fetch a posting's extracted text and metadata, served from the local cache when fresh."""
+    _validate_url(url)
+    with JOB_FETCH_IN_FLIGHT.track(), JOB_FETCH_LATENCY.time():
+        try:
+            return _fetch_job_page(url)
+        except Exception as e:
+            JOB_FETCH_ERRORS.inc(error=type(e).__name__)
+            raise
+
+
+def _fetch_job_page(url: str) -> dict:
+    if not JOB_CACHE_ENABLED:
+        return _download(url)
+
+    key = normalize_url(url)
+    cached = _cached_entry(job_cache.get(key))
+    if cached and time.time() - cached["fetched_at"] < JOB_CACHE_TTL_SECONDS:
+        return cached
+
+    entry = _download(url, cached)
+    job_cache.set(key, json.dumps(entry, ensure_ascii=False))
+    return entry
+
+
+def fetch_job_preview(url: str) -> dict:
+    """Fetch a URL and return best-effort extracted text + meta (no minimum length enforcement)."""
+    return _preview(fetch_job_page(url))
+
+
+def require_job_text(meta: dict, min_chars: int = MIN_CHARS_DEFAULT) -> str:
+    """Return the preview text, or raise ValueError if content looks blocked/too short."""
     if meta["text_length"] < min_chars:
         raise ValueError("Job content too short or blocked (may require JavaScript rendering).")
-    return clean
+    return meta["text"]
+
+
+# -----------------------------
+# Async fetching (ASGI serving path)
+# -----------------------------
+
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """Async counterpart of get_session(), one per event loop (httpx pools are bound to their loop)."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = httpx.AsyncClient(
+            headers=HEADERS,
+            timeout=FETCH_TIMEOUT,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=HTTP_POOL_SIZE, max_keepalive_connections=HTTP_POOL_SIZE),
+        )
+        _async_clients[loop] = client
+    return client
+
+
+async def _adownload(url: str, cached: dict = None) -> dict:
+    async with get_async_client().stream("GET", url, headers=_revalidation_headers(cached)) as resp:
+        if cached and resp.status_code == 304:
+            return dict(cached, fetched_at=time.time())
+        resp.raise_for_status()
+
+        decoder = _decoder(resp.encoding)
+        stream = TextStream() if EXTRACT_MODE == "stream" else None
+        raw_parts: list = []  # soup mode only
+        remaining = MAX_DOWNLOAD_BYTES
+        async for chunk in resp.aiter_bytes(CHUNK_BYTES):
+            chunk = chunk[:remaining]
+            remaining -= len(chunk)
+            text = decoder.decode(chunk)
+            if stream:
+                stream.feed(text)
+            else:
+                raw_parts.append(text)
+            if remaining <= 0 or (stream and stream.full):
+                break
+        tail = decoder.decode(b"", final=True)
+
+    if stream:
+        if not stream.full:
+            stream.feed(tail)
+        return _entry(resp, stream.close(), stream.full)
+    clean = await asyncio.to_thread(_extract_text, "".join(raw_parts) + tail)
+    return _entry(resp, clean, False)
+
+
+async def afetch_job_page(url: str) -> dict:
+    """fetch_job_page() without blocking the event loop; cache reads and writes run in a thread."""
+    _validate_url(url)
+    with JOB_FETCH_IN_FLIGHT.track(), JOB_FETCH_LATENCY.time():
+        try:
+            if not JOB_CACHE_ENABLED:
+                return await _adownload(url)
+            key = normalize_url(url)
+            cached = _cached_entry(await asyncio.to_thread(job_cache.get, key))
+            if cached and time.time() - cached["fetched_at"] < JOB_CACHE_TTL_SECONDS:
+                return cached
+            entry = await _adownload(url, cached)
+            await asyncio.to_thread(job_cache.set, key, json.dumps(entry, ensure_ascii=False))
+            return entry
+        except Exception as e:
+            JOB_FETCH_ERRORS.inc(error=type(e).__name__)
+            raise
+
+
+async def afetch_job_preview(url: str) -> dict:
+    return _preview(await afetch_job_page(url))
+
+
+def fetch_job_from_url(url: str, min_chars: int = MIN_CHARS_DEFAULT) -> str:
+    """Fetch and extract job text. Raises ValueError if content looks blocked/too short."""
+    return require_job_text(fetch_job_preview(url), min_chars)
@@ -0,0 +1,74 @@
+import os
+import uuid
+import queue
+import logging
+import threading
+
+from pipeline import run_analysis
+from run_store import create_run, update_run, save_result
+from reports import schedule_reports
+from singleflight import run_key, claim_run, release_run
+
+log = logging.getLogger(__name__)
+
+# Worker concurrency is sized separately from gunicorn's request threads.
+RUN_WORKERS = int(os.getenv("RUN_WORKERS", "2"))
+RUN_QUEUE_SIZE = int(os.getenv("RUN_QUEUE_SIZE", "20"))
+
+
+class QueueFull(Exception):
+    """Raised when the analysis queue is at capacity; callers should ask the client to retry."""
+
+
+_queue: "queue.Queue" = queue.Queue(maxsize=RUN_QUEUE_SIZE)
+_workers = []
+_workers_lock = threading.Lock()
+
+
+def _ensure_workers() -> None:
+    with _workers_lock:
+        while len(_workers) < RUN_WORKERS:
+            t = threading.Thread(target=_worker, name=f"run-worker-{len(_workers)}", daemon=True)
+            t.start()
+            _workers.append(t)
+
+
+def _worker() -> None:
+    while True:
+        run_id, args, key = _queue.get()
+        try:
+            update_run(run_id, "running")
+            result = run_analysis(*args)
+            save_result(run_id, result, lang=args[3])
+            schedule_reports(run_id, result)
+        except Exception as e:
+            log.exception("Run %s failed", run_id)
+            update_run(run_id, "failed", error=f"{type(e).__name__}: {e}")
+        finally:
+            release_run(key, run_id)
+            _queue.task_done()
+
+
+def submit(args: tuple) -> str:
+    """Queue run_analysis(*args) and return its run ID. Raises QueueFull when at capacity.
+
+    Identical args already queued or running return that run's ID instead.
+    """
+    _ensure_workers()
+    key = run_key(args)
+    run_id = uuid.uuid4().hex
+    existing = claim_run(key, run_id)
+    if existing:
+        return existing
+    create_run(run_id)
+    try:
+        _queue.put_nowait((run_id, args, key))
+    except queue.Full:
+        update_run(run_id, "rejected", error="Queue full")
+        release_run(key, run_id)
+        raise QueueFull()
+    return run_id
+
+
+def queue_depth() -> int:
+    return _queue.qsize()
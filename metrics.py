@@ -0,0 +1,177 @@
+"""Minimal in-process Prometheus metrics (text exposition format 0.0.4).
+
+Metrics are per process; with several gunicorn workers each one reports its own.
+"""
+import time
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Tuple
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+
+_lock = threading.Lock()
+_metrics: List["_Metric"] = []
+_collectors: List[Callable[[], List[str]]] = []
+_caches: list = []
+
+
+def _labels_key(labels: dict) -> Tuple:
+    return tuple(sorted(labels.items()))
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _fmt_labels(key: Tuple) -> str:
+    parts = [f'{k}="{_escape(v)}"' for k, v in key]
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _fmt_value(v: float) -> str:
+    return str(int(v)) if float(v).is_integer() else repr(float(v))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._values: Dict[Tuple, float] = {}
+        with _lock:
+            _metrics.append(self)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with _lock:
+            items = list(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_fmt_labels(key)} {_fmt_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = _labels_key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = _labels_key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track(self, **labels):
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels) -> None:
+        key = _labels_key(labels)
+        with _lock:
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [0] * len(self.buckets) + [0, 0.0]  # buckets..., count, sum
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            counts[-2] += 1
+            counts[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield labels
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with _lock:
+            items = [(k, list(v)) for k, v in self._values.items()]
+        for key, counts in items:
+            for bound, n in zip(self.buckets, counts):
+                lines.append(f"{self.name}_bucket{_fmt_labels(key + (('le', bound),))} {n}")
+            lines.append(f"{self.name}_bucket{_fmt_labels(key + (('le', '+Inf'),))} {counts[-2]}")
+            lines.append(f"{self.name}_count{_fmt_labels(key)} {counts[-2]}")
+            lines.append(f"{self.name}_sum{_fmt_labels(key)} {_fmt_value(counts[-1])}")
+        return lines
+
+
+def register_collector(fn: Callable[[], List[str]]) -> None:
+    """fn returns ready-made exposition lines, evaluated at scrape time."""
+    with _lock:
+        _collectors.append(fn)
+
+
+def render() -> str:
+    lines: List[str] = []
+    for metric in list(_metrics):
+        lines.extend(metric.render())
+    for fn in list(_collectors):
+        lines.extend(fn())
+    return "\n".join(lines) + "\n"
+
+
+# -----------------------------
+# Application metrics
+# -----------------------------
+
+LLM_LATENCY = Histogram("llm_request_duration_seconds", "Upstream LLM call latency, including retries.")
+LLM_PROMPT_TOKENS = Counter("llm_prompt_tokens_total", "Prompt tokens reported by the LLM API.")
+LLM_COMPLETION_TOKENS = Counter("llm_completion_tokens_total", "Completion tokens reported by the LLM API.")
+LLM_ERRORS = Counter("llm_errors_total", "LLM calls that failed after retries.")
+LLM_RETRIES = Counter("llm_retries_total", "LLM call retries after 429/5xx/connection errors.")
+LLM_CACHE = Counter("llm_cache_requests_total", "LLM response cache lookups by result.")
+LLM_IN_FLIGHT = Gauge("llm_in_flight", "LLM calls currently waiting on the API.")
+
+JOB_FETCH_LATENCY = Histogram("job_fetch_duration_seconds", "Job posting fetch latency (cache hits included).")
+JOB_FETCH_ERRORS = Counter("job_fetch_errors_total", "Job posting fetches that raised.")
+JOB_FETCH_IN_FLIGHT = Gauge("job_fetch_in_flight", "Job posting fetches in progress.")
+
+
+def register_cache(cache) -> None:
+    """Expose a TieredCache's lookup counters and hit ratio."""
+    with _lock:
+        _caches.append(cache)
+
+
+def _collect_caches() -> List[str]:
+    lines = [
+        "# HELP cache_lookups_total Cache lookups by cache and result.",
+        "# TYPE cache_lookups_total counter",
+    ]
+    ratios = [
+        "# HELP cache_hit_ratio Share of lookups served from memory or disk.",
+        "# TYPE cache_hit_ratio gauge",
+    ]
+    for cache in list(_caches):
+        for result in ("memory_hits", "disk_hits", "misses"):
+            lines.append(f'cache_lookups_total{{cache="{cache.name}",result="{result}"}} {cache.stats[result]}')
+        ratios.append(f'cache_hit_ratio{{cache="{cache.name}"}} {_fmt_value(cache.hit_ratio())}')
+    return lines + ratios
+
+
+register_collector(_collect_caches)
@@ -1,14 +1,334 @@
 import os
-from openai import OpenAI
+import time
+import random
+import asyncio
+import threading
+import weakref
 
-def llm(system, user):
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-    resp = client.chat.completions.create(
-        model=os.getenv("OPENAI_MODEL","gpt-4.1-mini"),
+import httpx
+from openai import OpenAI, AsyncOpenAI, APIStatusError, APIConnectionError, APITimeoutError
+
+from cache import TieredCache, content_key
+from singleflight import SingleFlight
+from routing import plan_call, current_budget
+from metrics import (
+    LLM_LATENCY, LLM_PROMPT_TOKENS, LLM_COMPLETION_TOKENS, LLM_ERRORS, LLM_RETRIES,
+    LLM_CACHE, LLM_IN_FLIGHT, register_cache,
+)
+
+# Connection pool + retry tuning (all optional).
+POOL_MAX_CONNECTIONS = int(os.getenv("OPENAI_POOL_MAX_CONNECTIONS", "20"))
+POOL_MAX_KEEPALIVE = int(os.getenv("OPENAI_POOL_MAX_KEEPALIVE", "10"))
+KEEPALIVE_EXPIRY = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "60"))
+CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT", "10"))
+READ_TIMEOUT = float(os.getenv("OPENAI_READ_TIMEOUT", "120"))
+MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "3"))
+BACKOFF_BASE = float(os.getenv("OPENAI_BACKOFF_BASE", "0.5"))
+BACKOFF_MAX = float(os.getenv("OPENAI_BACKOFF_MAX", "20"))
+
+RETRY_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+# "fake" answers every call in-process from fake_llm (no network, no API key needed).
+LLM_BACKEND = os.getenv("LLM_BACKEND", "openai").strip().lower()
+
+# Response cache keyed on (model, system, user, temperature, max_tokens).
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE", "true").strip().lower() == "true"
+llm_cache = TieredCache(
+    "llm_responses",
+    ttl=float(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600))),
+    memory_items=int(os.getenv("LLM_CACHE_MEMORY_ITEMS", "512")),
+    max_bytes=int(os.getenv("LLM_CACHE_MAX_BYTES", str(200 * 1024 * 1024))),
+)
+register_cache(llm_cache)
+
+# Identical calls in flight at the same time share one upstream request.
+LLM_COALESCING = os.getenv("LLM_COALESCING", "true").strip().lower() == "true"
+llm_flight = SingleFlight("llm")
+
+_lock = threading.Lock()
+_client = None
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=POOL_MAX_CONNECTIONS,
+        max_keepalive_connections=POOL_MAX_KEEPALIVE,
+        keepalive_expiry=KEEPALIVE_EXPIRY,
+    )
+
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT)
+
+
+def _api_key():
+    key = os.getenv("OPENAI_API_KEY")
+    return key or ("fake" if LLM_BACKEND == "fake" else None)
+
+
+def _transport(asynchronous: bool = False):
+    if LLM_BACKEND != "fake":
+        return None
+    import fake_llm
+    return fake_llm.async_transport() if asynchronous else fake_llm.transport()
+
+
+def get_client() -> OpenAI:
+    """Process-wide client sharing one keep-alive connection pool."""
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = OpenAI(
+                    api_key=_api_key(),
+                    http_client=httpx.Client(limits=_limits(), timeout=_timeout(), transport=_transport()),
+                    timeout=_timeout(),
+                    max_retries=0,  # retries are handled below with jittered backoff
+                )
+    return _client
+
+
+def get_async_client() -> AsyncOpenAI:
+    """Async client, one per event loop (httpx async pools are bound to their loop)."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = AsyncOpenAI(
+            api_key=_api_key(),
+            http_client=httpx.AsyncClient(limits=_limits(), timeout=_timeout(), transport=_transport(asynchronous=True)),
+            timeout=_timeout(),
+            max_retries=0,
+        )
+        _async_clients[loop] = client
+    return client
+
+
+def _should_retry(exc: Exception) -> bool:
+    if isinstance(exc, (APIConnectionError, APITimeoutError)):
+        return True
+    if isinstance(exc, APIStatusError):
+        return exc.status_code in RETRY_STATUS
+    return False
+
+
+def _backoff(attempt: int, exc: Exception) -> float:
+    """Full-jitter exponential backoff, honouring Retry-After when the server sends one."""
+    if isinstance(exc, APIStatusError):
+        retry_after = exc.response.headers.get("retry-after")
+        try:
+            if retry_after is not None:
+                return min(BACKOFF_MAX, float(retry_after))
+        except ValueError:
+            pass
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+
+def _request(model, system, user, temperature, max_tokens=None, response_format=None):
+    req = dict(
+        model=model,
         messages=[
-            {"role":"system","content":system},
-            {"role":"user","content":user}
+            {"role": "system", "content": system},
+            {"role": "user", "content": user}
         ],
-        temperature=0.3
+        temperature=temperature,
     )
-    return resp.choices[0].message.content
+    if max_tokens:
+        req["max_tokens"] = max_tokens
+    if response_format is not None:
+        req["response_format"] = response_format
+    budget = current_budget()
+    remaining = budget.remaining() if budget else None
+    if remaining is not None and remaining < READ_TIMEOUT:
+        # Don't let one call outlive the run's deadline.
+        req["timeout"] = httpx.Timeout(max(1.0, remaining), connect=CONNECT_TIMEOUT)
+    return req
+
+
+def _call_key(model, system, user, temperature, max_tokens=None, response_format=None):
+    parts = [model, system, user, temperature]
+    if max_tokens:
+        parts.append(max_tokens)
+    if response_format is not None:
+        parts.append(response_format)
+    return content_key(*parts)
+
+
+def _cache_key(*args):
+    return _call_key(*args) if LLM_CACHE_ENABLED else None
+
+
+def _stream_content(client, req, on_delta):
+    """Stream a completion, passing each content delta to on_delta; returns (content, usage)."""
+    parts = []
+    usage = None
+    stream = client.chat.completions.create(**req, stream=True, stream_options={"include_usage": True})
+    for chunk in stream:
+        if chunk.usage is not None:
+            usage = chunk
+        if chunk.choices and chunk.choices[0].delta.content:
+            delta = chunk.choices[0].delta.content
+            parts.append(delta)
+            on_delta(delta)
+    return "".join(parts), usage
+
+
+async def _astream_content(client, req, on_delta):
+    """Async _stream_content."""
+    parts = []
+    usage = None
+    stream = await client.chat.completions.create(**req, stream=True, stream_options={"include_usage": True})
+    async for chunk in stream:
+        if chunk.usage is not None:
+            usage = chunk
+        if chunk.choices and chunk.choices[0].delta.content:
+            delta = chunk.choices[0].delta.content
+            parts.append(delta)
+            on_delta(delta)
+    return "".join(parts), usage
+
+
+def _cache_lookup(key, agent):
+    hit = llm_cache.get(key)
+    LLM_CACHE.inc(agent=agent, result="hit" if hit is not None else "miss")
+    return hit
+
+
+def _record_usage(resp, agent, model):
+    usage = getattr(resp, "usage", None)
+    if usage is None:
+        return
+    LLM_PROMPT_TOKENS.inc(usage.prompt_tokens or 0, agent=agent, model=model)
+    LLM_COMPLETION_TOKENS.inc(usage.completion_tokens or 0, agent=agent, model=model)
+    budget = current_budget()
+    if budget is not None:
+        budget.spend((usage.prompt_tokens or 0) + (usage.completion_tokens or 0))
+
+
+def llm(system, user, temperature=None, cache=True, agent="other",
+        response_format=None, validate=None, on_delta=None, model=None, max_tokens=None):
+    """Chat completion text. Pass cache=False to force a fresh answer; `agent` labels metrics.
+
+    `model`, `max_tokens` and `temperature` default to the agent's route (routing.py),
+    and a run budget may downgrade the model or raise BudgetExceeded instead of calling.
+
+    `response_format` is passed through to the API. `validate(content)` may raise
+    ValueError to keep a malformed answer out of the cache (the error propagates).
+    `on_delta(text)` streams the answer as it arrives; cache hits are delivered as
+    a single delta. Identical calls already waiting on the API share its answer
+    (LLM_COALESCING), which is likewise delivered as a single delta.
+    """
+    model, max_tokens, temperature = plan_call(agent, system, user, model, max_tokens, temperature)
+    key = _cache_key(model, system, user, temperature, max_tokens, response_format)
+    if key and cache:
+        hit = _cache_lookup(key, agent)
+        if hit is not None:
+            if on_delta:
+                on_delta(hit)
+            return hit
+
+    def complete():
+        return _complete(model, system, user, temperature, max_tokens, agent, response_format, validate,
+                         on_delta, key)
+
+    if not LLM_COALESCING:
+        return complete()
+    content, shared = llm_flight.do(_call_key(model, system, user, temperature, max_tokens, response_format),
+                                    complete, agent=agent)
+    if shared:
+        if on_delta and content:
+            on_delta(content)
+        if validate and content:
+            validate(content)
+    return content
+
+
+def _complete(model, system, user, temperature, max_tokens, agent, response_format, validate,
+              on_delta, key):
+    client = get_client()
+    req = _request(model, system, user, temperature, max_tokens, response_format)
+    attempt = 0
+    streamed = []
+    with LLM_IN_FLIGHT.track(agent=agent), LLM_LATENCY.time(agent=agent, model=model):
+        while True:
+            try:
+                if on_delta:
+                    content, resp = _stream_content(client, req, lambda d: (streamed.append(d), on_delta(d)))
+                else:
+                    resp = client.chat.completions.create(**req)
+                    content = resp.choices[0].message.content
+                break
+            except Exception as e:
+                # A stream that already delivered text can't be replayed to the caller.
+                if attempt >= MAX_RETRIES or not _should_retry(e) or streamed:
+                    LLM_ERRORS.inc(agent=agent, model=model, error=type(e).__name__)
+                    raise
+                LLM_RETRIES.inc(agent=agent, model=model)
+                time.sleep(_backoff(attempt, e))
+                attempt += 1
+    _record_usage(resp, agent, model)
+
+    if validate and content:
+        validate(content)
+    if key and content:
+        llm_cache.set(key, content)
+    return content
+
+
+async def allm(system, user, temperature=None, cache=True, agent="other",
+               response_format=None, validate=None, on_delta=None, model=None, max_tokens=None):
+    """llm() for the event loop; cache reads and writes run in a worker thread."""
+    model, max_tokens, temperature = plan_call(agent, system, user, model, max_tokens, temperature)
+    key = _cache_key(model, system, user, temperature, max_tokens, response_format)
+    if key and cache:
+        hit = await asyncio.to_thread(_cache_lookup, key, agent)
+        if hit is not None:
+            if on_delta:
+                on_delta(hit)
+            return hit
+
+    def complete():
+        return _acomplete(model, system, user, temperature, max_tokens, agent, response_format, validate,
+                          on_delta, key)
+
+    if not LLM_COALESCING:
+        return await complete()
+    content, shared = await llm_flight.ado(_call_key(model, system, user, temperature, max_tokens, response_format),
+                                           complete, agent=agent)
+    if shared:
+        if on_delta and content:
+            on_delta(content)
+        if validate and content:
+            validate(content)
+    return content
+
+
+async def _acomplete(model, system, user, temperature, max_tokens, agent, response_format, validate,
+                     on_delta, key):
+    client = get_async_client()
+    req = _request(model, system, user, temperature, max_tokens, response_format)
+    attempt = 0
+    streamed = []
+    with LLM_IN_FLIGHT.track(agent=agent), LLM_LATENCY.time(agent=agent, model=model):
+        while True:
+            try:
+                if on_delta:
+                    content, resp = await _astream_content(client, req, lambda d: (streamed.append(d), on_delta(d)))
+                else:
+                    resp = await client.chat.completions.create(**req)
+                    content = resp.choices[0].message.content
+                break
+            except Exception as e:
+                if attempt >= MAX_RETRIES or not _should_retry(e) or streamed:
+                    LLM_ERRORS.inc(agent=agent, model=model, error=type(e).__name__)
+                    raise
+                LLM_RETRIES.inc(agent=agent, model=model)
+                await asyncio.sleep(_backoff(attempt, e))
+                attempt += 1
+    _record_usage(resp, agent, model)
+
+    if validate and content:
+        validate(content)
+    if key and content:
+        await asyncio.to_thread(llm_cache.set, key, content)
+    return content
@@ -6,6 +6,7 @@ from reportlab.lib.units import inch
 from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.pdfbase import pdfmetrics
 from io import BytesIO
+from xml.sax.saxutils import escape
 from datetime import datetime
 
 def build_pdf_report(data):
@@ -25,7 +26,7 @@ def build_pdf_report(data):
     for key, value in data.items():
         elements.append(Paragraph(f"<b>{key}</b>", styles["Heading2"]))
         elements.append(Spacer(1, 0.2 * inch))
-        elements.append(Paragraph(value.replace("\n", "<br/>"), normal_style))
+        elements.append(Paragraph(escape(str(value)).replace("\n", "<br/>"), normal_style))
         elements.append(Spacer(1, 0.4 * inch))
 
     doc.build(elements)
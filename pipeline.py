@@ -0,0 +1,644 @@
+import os
+import json
+import time
+import asyncio
+import inspect
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from agents import (
+    requirement_intelligence,
+    ats_audit,
+    recruiter_match,
+    recruiter_psychology,
+    optimize_cv,
+    ats_submission,
+    interview_pack,
+    extract_maps,
+    consolidated_sections,
+)
+from culture import culture_report
+from gates import hard_gates
+from routing import BudgetExceeded, run_budget
+from input_budget import InputFitter
+from scoring import (
+    parse_json_with_repair,
+    apply_hard_gate_caps,
+    compute_hard_gate_status,
+    extract_score_fallback,
+    compute_hireability_from_match,
+    build_hireability_sections,
+    validate_rewriter_output,
+    polish_narrative_with_llm,
+)
+
+
+AGENT_TIMEOUT_SECONDS = float(os.getenv("AGENT_TIMEOUT_SECONDS", "180"))
+PIPELINE_MAX_WORKERS = int(os.getenv("PIPELINE_MAX_WORKERS", "8"))
+# "maps" extracts a Job Map + Candidate Map once and feeds them to agents that don't need raw text.
+AGENT_INPUT_MODE = os.getenv("AGENT_INPUT_MODE", "maps").strip().lower()
+# "consolidated" asks for the requirement, psychology and interview sections in one JSON call.
+AGENT_CALL_MODE = os.getenv("AGENT_CALL_MODE", "separate").strip().lower()
+# Which agents still run once the hard gates come back failed (or risky, see below): full | lite | stop.
+HARD_GATE_POLICY = os.getenv("HARD_GATE_POLICY", "full").strip().lower()
+# "fail" applies the policy to failed gates only; "risk" to risky ones as well.
+HARD_GATE_POLICY_ON = os.getenv("HARD_GATE_POLICY_ON", "fail").strip().lower()
+
+# Steps kept per policy; everything else is skipped. maps and gates always run.
+POLICY_STEPS = {
+    "lite": {"maps", "gates", "match", "hire", "ats"},
+    "stop": {"maps", "gates"},
+}
+
+
+# -----------------------------
+# Dependency-aware executor
+# -----------------------------
+
+class StepSkipped(Exception):
+    """Raised by a step that decides not to run; settles as "Skipped: <reason>"."""
+
+
+class Step:
+    """One node in the agent graph.
+
+    `fn` is called with the results of `deps` as positional arguments, in order.
+    Dependencies listed in `optional` are passed as None when they failed instead
+    of failing this step too.
+    """
+
+    def __init__(self, name: str, fn: Callable[..., Any], deps: Iterable[str] = (),
+                 optional: Iterable[str] = (), timeout: Optional[float] = None):
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+        self.optional = set(optional)
+        self.timeout = timeout if timeout is not None else AGENT_TIMEOUT_SECONDS
+
+
+def _ready(pending: Dict[str, Step], results: dict, errors: dict, settle) -> list:
+    """Take the steps whose dependencies have settled out of `pending`, as (step, args).
+
+    Steps behind a failed required dependency are settled as skipped instead.
+    """
+    ready = []
+    for name, step in list(pending.items()):
+        failed = [d for d in step.deps if d in errors and d not in step.optional]
+        if failed:
+            del pending[name]
+            settle(name, error=f"Skipped: dependency '{failed[0]}' failed")
+            continue
+        if all(d in results or d in errors for d in step.deps):
+            del pending[name]
+            ready.append((step, [results.get(d) for d in step.deps]))
+    return ready
+
+
+def _unresolved(pending: Dict[str, Step], settle) -> None:
+    # Remaining steps reference unknown dependencies.
+    for name in list(pending):
+        del pending[name]
+        settle(name, error="Skipped: unresolved dependency")
+
+
+def _limit(step: Step, started: float, deadline: Optional[float]) -> float:
+    """When a step started at `started` must have settled (time.monotonic())."""
+    end = started + step.timeout
+    return end if deadline is None else min(end, deadline)
+
+
+def _timeout_error(step: Step, started: float, deadline: Optional[float]) -> str:
+    if deadline is not None and deadline < started + step.timeout:
+        return "Timed out: run deadline reached"
+    return f"Timed out after {step.timeout:g}s"
+
+
+def run_dag(steps: Iterable[Step],
+            on_result: Optional[Callable[[str, Any, Optional[str]], None]] = None,
+            max_workers: Optional[int] = None,
+            deadline: Optional[float] = None) -> Tuple[Dict[str, Any], Dict[str, str]]:
+    """Run steps concurrently as soon as their dependencies are done.
+
+    Returns (results, errors). A step that raises or exceeds its timeout lands in
+    `errors`; steps depending on it are skipped unless the dependency is optional.
+    `on_result(name, value, error)` is called as each step settles. `deadline`
+    (time.monotonic()) caps every step's timeout. Steps run in a copy of the
+    caller's context, so they see its run budget.
+    """
+    pending = {s.name: s for s in steps}
+    results: Dict[str, Any] = {}
+    errors: Dict[str, str] = {}
+    running: Dict[Any, Tuple[Step, float]] = {}
+
+    def settle(name, value=None, error=None):
+        if error is None:
+            results[name] = value
+        else:
+            errors[name] = error
+        if on_result:
+            on_result(name, value, error)
+
+    executor = ThreadPoolExecutor(max_workers=max_workers or PIPELINE_MAX_WORKERS)
+    try:
+        while pending or running:
+            for step, args in _ready(pending, results, errors, settle):
+                fut = executor.submit(contextvars.copy_context().run, step.fn, *args)
+                running[fut] = (step, time.monotonic())
+
+            if not running:
+                _unresolved(pending, settle)
+                break
+
+            now = time.monotonic()
+            next_deadline = min(_limit(step, started, deadline) for step, started in running.values())
+            done, _ = wait(list(running), timeout=max(0.0, next_deadline - now), return_when=FIRST_COMPLETED)
+
+            for fut in done:
+                step, _started = running.pop(fut)
+                try:
+                    settle(step.name, value=fut.result())
+                except (StepSkipped, BudgetExceeded) as e:
+                    settle(step.name, error=f"Skipped: {e}")
+                except Exception as e:
+                    settle(step.name, error=f"{type(e).__name__}: {e}")
+
+            now = time.monotonic()
+            for fut, (step, started) in list(running.items()):
+                if now >= _limit(step, started, deadline):
+                    running.pop(fut)
+                    fut.cancel()
+                    settle(step.name, error=_timeout_error(step, started, deadline))
+    finally:
+        # Timed-out calls keep their thread until the HTTP client gives up; don't wait for them.
+        executor.shutdown(wait=False, cancel_futures=True)
+    return results, errors
+
+
+async def _call_step(step: Step, args: list) -> Any:
+    value = step.fn(*args)
+    if inspect.isawaitable(value):
+        value = await value
+    return value
+
+
+async def arun_dag(steps: Iterable[Step],
+                   on_result: Optional[Callable[[str, Any, Optional[str]], None]] = None,
+                   deadline: Optional[float] = None) -> Tuple[Dict[str, Any], Dict[str, str]]:
+    """run_dag() on the event loop: each step is a task instead of a thread.
+
+    Step functions may return an awaitable (see analysis_steps(asynchronous=True));
+    anything they do before returning it runs on the loop, so it must not block.
+    """
+    pending = {s.name: s for s in steps}
+    results: Dict[str, Any] = {}
+    errors: Dict[str, str] = {}
+    running: Dict[asyncio.Task, Tuple[Step, float]] = {}
+
+    def settle(name, value=None, error=None):
+        if error is None:
+            results[name] = value
+        else:
+            errors[name] = error
+        if on_result:
+            on_result(name, value, error)
+
+    try:
+        while pending or running:
+            for step, args in _ready(pending, results, errors, settle):
+                started = time.monotonic()
+                timeout = max(0.0, _limit(step, started, deadline) - started)
+                task = asyncio.ensure_future(asyncio.wait_for(_call_step(step, args), timeout))
+                running[task] = (step, started)
+
+            if not running:
+                _unresolved(pending, settle)
+                break
+
+            done, _ = await asyncio.wait(list(running), return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                step, started = running.pop(task)
+                try:
+                    settle(step.name, value=task.result())
+                except (StepSkipped, BudgetExceeded) as e:
+                    settle(step.name, error=f"Skipped: {e}")
+                except asyncio.TimeoutError:
+                    settle(step.name, error=_timeout_error(step, started, deadline))
+                except asyncio.CancelledError:
+                    # The step's own task was cancelled (not this run): fail the step, not the run.
+                    settle(step.name, error="Cancelled")
+                except Exception as e:
+                    settle(step.name, error=f"{type(e).__name__}: {e}")
+    finally:
+        for task in running:
+            task.cancel()
+    return results, errors
+
+
+# -----------------------------
+# Analysis graph
+# -----------------------------
+
+# Dashboard section key -> title, in display order.
+SECTION_TITLES = [
+    ("match", "Module 1 – Recruiter Match (Rekryterarmatchning)"),
+    ("optimized", "Module 2 – Optimized CV (Optimerat CV)"),
+    ("hard_gates", "Module 3 – Hard Gates & Eligibility (Behörighetskrav)"),
+    ("ats", "Module 4 – ATS Audit (ATS-granskning)"),
+    ("ats_cv", "Module 4 – ATS Submission CV (ATS-anpassat CV för ansökan)"),
+    ("interview", "Module 5 – Interview Pack (Intervjupaket)"),
+    ("culture_report", "Module 6 – Culture Analysis (Kulturanalys)"),
+    ("deep", "Requirement Intelligence (Kravanalys)"),
+    ("psyche", "Recruiter Psychology (Rekryterarpsykologi)"),
+    ("hire", "Hireability Explanation (Förklaring av anställningsbarhet)"),
+]
+
+
+# Steps that feed other agents but have no dashboard section of their own.
+INTERNAL_STEPS = {"maps", "combined"}
+
+
+def dashboard_sections(result: dict) -> list:
+    return [(key, title, result.get(key, "")) for key, title in SECTION_TITLES]
+
+
+def report_sections(result: dict) -> dict:
+    """Title -> text for the PDF/DOCX reports: scores first, then every dashboard section."""
+    data = {
+        "Hireability Score": f"{result.get('hire_score', 0)}/100",
+        "Recruiter Match Score": f"{result.get('match_score', 0)}/100",
+        "Hard Gate Status": str(result.get("hard_gate_status", "clear")).upper(),
+    }
+    for _key, title, content in dashboard_sections(result):
+        data[title] = content or ""
+    return data
+
+
+def score_color(score: int) -> str:
+    return "green" if score >= 70 else ("yellow" if score >= 40 else "red")
+
+
+def evaluate_gates(hard_gates_raw: Any) -> dict:
+    hard_gates_data = parse_json_with_repair(hard_gates_raw)
+    return {
+        "raw": hard_gates_raw,
+        "data": hard_gates_data,
+        "status": compute_hard_gate_status(hard_gates_data or hard_gates_raw),
+        "json": json.dumps(hard_gates_data or {}, ensure_ascii=False),
+    }
+
+
+def evaluate_match(match_raw: Any, hard_gate_status: str) -> dict:
+    match_data = parse_json_with_repair(match_raw)
+
+    match_score = match_data.get("match_score")
+    if match_score is None:
+        match_score = extract_score_fallback(match_raw, kind="match")
+    try:
+        match_score = int(match_score)
+    except Exception:
+        match_score = extract_score_fallback(match_raw, kind="match")
+
+    # Cap match if hard gates are risky/failed
+    raw_match_score = match_score
+    match_score = apply_hard_gate_caps(match_score, hard_gate_status)
+
+    # Hireability from match + gaps + hard gates
+    hire_score, hire_breakdown = compute_hireability_from_match(match_score, match_data, hard_gate_status)
+    # Kept so stored runs can be re-scored under different caps (rescore.py).
+    hire_breakdown["raw_match_score"] = raw_match_score
+
+    # Pretty JSON display for recruiter match
+    match_display = match_raw
+    try:
+        match_display = json.dumps(match_data, indent=2, ensure_ascii=False)
+    except Exception:
+        pass
+
+    return {
+        "raw": match_raw,
+        "data": match_data,
+        "match_score": match_score,
+        "hire_score": hire_score,
+        "breakdown": hire_breakdown,
+        "display": match_display,
+    }
+
+
+def evaluate_maps(maps_raw: Any) -> dict:
+    data = parse_json_with_repair(maps_raw)
+    job_map = data.get("job_map")
+    candidate_map = data.get("candidate_map")
+    if not job_map or not candidate_map:
+        raise ValueError("Extractor returned no usable Job Map / Candidate Map")
+    return {
+        "job_map": job_map,
+        "candidate_map": candidate_map,
+        "cv": "Candidate Map (structured extract of the CV):\n" + json.dumps(candidate_map, ensure_ascii=False, indent=1),
+        "job": "Job Map (structured extract of the job posting):\n" + json.dumps(job_map, ensure_ascii=False, indent=1),
+    }
+
+
+def evaluate_consolidated(raw: Any) -> dict:
+    """Non-empty text sections from a consolidated response; missing ones are left out."""
+    data = parse_json_with_repair(raw)
+    sections = {}
+    for key, value in (data or {}).items():
+        if isinstance(value, (list, dict)):
+            value = json.dumps(value, ensure_ascii=False, indent=2)
+        if isinstance(value, str) and value.strip():
+            sections[key] = value.strip()
+    return sections
+
+
+def explain_hireability(gates: dict, match: dict) -> str:
+    match_score = match["match_score"]
+    hire_score = match["hire_score"]
+    hire_breakdown = match["breakdown"]
+
+    # Layer 2 base explanation
+    base_text = build_hireability_sections(match_score, hire_score, match["data"], hire_breakdown)
+
+    # Layer 3 optional polish
+    use_rewriter = (os.getenv("LLM_REWRITER_MODE", "false").strip().lower() == "true")
+    if not use_rewriter:
+        return base_text
+
+    structured = {
+        "match_score": match_score,
+        "hireability_score": hire_score,
+        "hard_gate_status": gates["status"],
+        "critical_gaps_count": hire_breakdown.get("critical_gaps", 0),
+        "moderate_gaps_count": hire_breakdown.get("moderate_gaps", 0),
+        "minor_gaps_count": hire_breakdown.get("minor_gaps", 0),
+        "evidence_quality": hire_breakdown.get("evidence_quality", "medium"),
+        "timeline_risk": hire_breakdown.get("timeline_risk", "low"),
+        "total_penalty": hire_breakdown.get("total_penalty", 0),
+    }
+    allowed_numbers = {str(v) for v in [
+        structured["match_score"],
+        structured["hireability_score"],
+        structured["critical_gaps_count"],
+        structured["moderate_gaps_count"],
+        structured["minor_gaps_count"],
+        structured["total_penalty"],
+        hire_breakdown.get("critical_penalty", 0),
+        hire_breakdown.get("moderate_penalty", 0),
+        hire_breakdown.get("minor_penalty", 0),
+        hire_breakdown.get("evidence_penalty", 0),
+        hire_breakdown.get("timeline_penalty", 0),
+    ]}
+    polished = polish_narrative_with_llm(structured, base_text)
+    if polished and validate_rewriter_output(polished, allowed_numbers):
+        return polished
+    return base_text
+
+
+def _invoke(asynchronous: bool, fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """fn(*args, **kwargs), or for arun_dag an awaitable of it: fn.arun when the
+    function has an async variant, otherwise fn in a worker thread."""
+    if not asynchronous:
+        return fn(*args, **kwargs)
+    arun = getattr(fn, "arun", None)
+    return arun(*args, **kwargs) if arun else asyncio.to_thread(fn, *args, **kwargs)
+
+
+def _then(value: Any, fn: Callable[[Any], Any]) -> Any:
+    """fn(value), deferred until `value` is awaited when it is an awaitable."""
+    if not inspect.isawaitable(value):
+        return fn(value)
+
+    async def chain():
+        return fn(await value)
+    return chain()
+
+
+def analysis_steps(cv: str, job: str, role: str, lang: str,
+                   company: str = "", culture: str = "", reviews: str = "",
+                   on_partial: Optional[Callable[[str, dict], None]] = None,
+                   asynchronous: bool = False, inputs: Optional[InputFitter] = None) -> list:
+    """The /run agent graph.
+
+    Only the match, ATS audit and ATS submission need the hard gates, and only the
+    CV optimizer needs the match, so the critical path is gates -> match -> optimize.
+    In maps mode the match, requirement, psychology and interview agents read the
+    compact Job/Candidate Maps instead of the raw texts (falling back to the raw
+    texts if extraction fails); the hard gates need verbatim job quotes, and the
+    ATS agents and CV optimizer need the original CV layout, so they keep raw text.
+    With `on_partial`, the match answer is streamed and its score reported early.
+    With `asynchronous`, steps return awaitables for arun_dag instead of blocking.
+    Agents get the CV and job text fitted to their input budget by `inputs`
+    (input_budget.py), which records what was dropped.
+    """
+    inputs = inputs or InputFitter(cv, job, role)
+
+    def call(fn, *args, **kwargs):
+        return _invoke(asynchronous, fn, *args, **kwargs)
+
+    def gates_json(gates):
+        return gates["json"] if gates else ""
+
+    def gate_status(gates):
+        return gates["status"] if gates else "clear"
+
+    def compact(maps, agent):
+        return (maps["cv"], maps["job"]) if maps else inputs.fit(agent.__name__)
+
+    def match_step(gates, maps=None):
+        m_cv, m_job = compact(maps, recruiter_match)
+        on_field = None
+        if on_partial:
+            def on_field(key, value):
+                if key == "match_score" and isinstance(value, int) and 0 <= value <= 100:
+                    on_partial("match", {"match_score": apply_hard_gate_caps(value, gate_status(gates))})
+        raw = call(recruiter_match, m_cv, m_job, role, lang, gates_json(gates), on_field=on_field)
+        return _then(raw, lambda r: evaluate_match(r, gate_status(gates)))
+
+    def compact_step(agent, evaluate=None):
+        def run(maps=None):
+            raw = call(agent, *compact(maps, agent), role, lang)
+            return _then(raw, evaluate) if evaluate else raw
+        return run
+
+    def section_step(agent):
+        # Take the section from the consolidated response; call the agent alone if it is missing.
+        def run(combined=None, maps=None):
+            section = (combined or {}).get(agent.__name__)
+            return section if section else call(agent, *compact(maps, agent), role, lang)
+        return run
+
+    use_maps = AGENT_INPUT_MODE == "maps"
+    map_deps = ["maps"] if use_maps else []
+    combined = AGENT_CALL_MODE == "consolidated"
+    section_deps = (["combined"] if combined else []) + map_deps
+
+    steps = [
+        Step("gates", lambda: _then(call(hard_gates, *inputs.fit("hard_gate_extract"), role, lang),
+                                    evaluate_gates)),
+        Step("match", match_step, deps=["gates"] + map_deps, optional=["gates", "maps"]),
+        Step("ats", lambda gates: call(ats_audit, *inputs.fit("ats_audit"), role, lang, gates_json(gates)),
+             deps=["gates"], optional=["gates"]),
+        Step("ats_cv", lambda gates: call(ats_submission, *inputs.fit("ats_submission"), role, lang,
+                                          gates_json(gates)),
+             deps=["gates"], optional=["gates"]),
+        Step("optimized", lambda match: call(optimize_cv, inputs.fit_cv("optimize_cv"), match["raw"], lang),
+             deps=["match"]),
+        Step("hire", lambda gates, match: call(explain_hireability, gates or evaluate_gates(None), match),
+             deps=["gates", "match"], optional=["gates"]),
+        Step("culture_report", lambda: call(culture_report, company, culture, reviews, lang)),
+    ]
+    if combined:
+        steps += [
+            Step("combined", compact_step(consolidated_sections, evaluate_consolidated),
+                 deps=map_deps, optional=map_deps),
+            Step("deep", section_step(requirement_intelligence), deps=section_deps, optional=section_deps),
+            Step("psyche", section_step(recruiter_psychology), deps=section_deps, optional=section_deps),
+            Step("interview", section_step(interview_pack), deps=section_deps, optional=section_deps),
+        ]
+    else:
+        steps += [
+            Step("deep", compact_step(requirement_intelligence), deps=map_deps, optional=map_deps),
+            Step("psyche", compact_step(recruiter_psychology), deps=map_deps, optional=map_deps),
+            Step("interview", compact_step(interview_pack), deps=map_deps, optional=map_deps),
+        ]
+    if use_maps:
+        steps.insert(0, Step("maps", lambda: _then(call(extract_maps, *inputs.fit("extract_maps"), role, lang),
+                                                   evaluate_maps)))
+    return apply_gate_policy(steps)
+
+
+def policy_triggered(status: str) -> bool:
+    return status == "fail" or (status == "risk" and HARD_GATE_POLICY_ON == "risk")
+
+
+def apply_gate_policy(steps: list, policy: Optional[str] = None) -> list:
+    """Make steps outside the policy's keep-set wait for the gates and skip when they trigger.
+
+    With the default "full" policy the graph is unchanged, so nothing waits on the gates
+    that didn't before. If the gates step itself fails, everything runs as usual.
+    """
+    policy = policy or HARD_GATE_POLICY
+    keep = POLICY_STEPS.get(policy)
+    if keep is None:
+        return steps
+
+    def guarded(step):
+        def run(gates, *args):
+            if gates and policy_triggered(gates["status"]):
+                raise StepSkipped(f"hard gate status {gates['status'].upper()} (HARD_GATE_POLICY={policy})")
+            return step.fn(*args)
+        return Step(step.name, run, deps=("gates",) + step.deps,
+                    optional=step.optional | {"gates"}, timeout=step.timeout)
+
+    return [s if s.name in keep else guarded(s) for s in steps]
+
+
+def section_text(name: str, value: Any) -> str:
+    if name == "gates":
+        return str(value["raw"])
+    if name == "match":
+        return value["display"]
+    return value
+
+
+def is_skipped(error: Optional[str]) -> bool:
+    return bool(error) and error.startswith("Skipped:")
+
+
+def unavailable_text(error: str) -> str:
+    if is_skipped(error):
+        return f"Section skipped: {error[len('Skipped:'):].strip()}"
+    return f"Section unavailable: {error}"
+
+
+def progress_events(name: str, value: Any, error: Optional[str]) -> list:
+    """Translate one settled step into (event, payload) pairs for the streaming dashboard."""
+    if name in INTERNAL_STEPS:
+        return []
+    key = "hard_gates" if name == "gates" else name
+    if error is not None:
+        return [("section", {"key": key, "content": unavailable_text(error), "error": True,
+                             "skipped": is_skipped(error)})]
+
+    events = [("section", {"key": key, "content": section_text(name, value)})]
+    if name == "gates":
+        events.append(("gates", {"status": value["status"]}))
+    elif name == "match":
+        events.append(("scores", {
+            "hire_score": value["hire_score"],
+            "match_score": value["match_score"],
+            "hire_color": score_color(value["hire_score"]),
+            "match_color": score_color(value["match_score"]),
+        }))
+    return events
+
+
+def partial_events(name: str, fields: dict) -> list:
+    """(event, payload) pairs for fields reported before a step settles."""
+    if name == "match" and "match_score" in fields:
+        score = fields["match_score"]
+        return [("match_score", {"match_score": score, "match_color": score_color(score)})]
+    return []
+
+
+def analysis_result(steps: list, results: Dict[str, Any], errors: Dict[str, str],
+                    input_trimming: Optional[dict] = None) -> dict:
+    """The dashboard context (sections + scores) for a finished graph.
+
+    `input_trimming` is InputFitter.report: per agent, the CV and job sections left out.
+    """
+    sections = {}
+    for name in [s.name for s in steps if s.name not in INTERNAL_STEPS]:
+        key = "hard_gates" if name == "gates" else name
+        if name in results:
+            sections[key] = section_text(name, results[name])
+        else:
+            sections[key] = unavailable_text(errors.get(name, "unknown error"))
+
+    match = results.get("match") or {}
+    gates = results.get("gates") or {}
+    hire_score = match.get("hire_score", 0)
+    match_score = match.get("match_score", 0)
+
+    return dict(
+        sections,
+        hire_score=hire_score,
+        match_score=match_score,
+        hire_color=score_color(hire_score),
+        match_color=score_color(match_score),
+        hard_gate_status=gates.get("status", "clear"),
+        hard_gates_data=gates.get("data") or {},
+        hire_breakdown=match.get("breakdown") or {},
+        errors=errors,
+        skipped=[("hard_gates" if n == "gates" else n) for n, e in errors.items()
+                 if is_skipped(e) and n not in INTERNAL_STEPS],
+        input_trimming=input_trimming or {},
+    )
+
+
+def run_analysis(cv: str, job: str, role: str, lang: str,
+                 company: str = "", culture: str = "", reviews: str = "",
+                 on_result: Optional[Callable[[str, Any, Optional[str]], None]] = None,
+                 on_partial: Optional[Callable[[str, dict], None]] = None) -> dict:
+    """Run the full agent graph and return the dashboard context (sections + scores).
+
+    The run is held to RUN_TOKEN_BUDGET / RUN_DEADLINE_SECONDS when those are set (routing.py).
+    """
+    inputs = InputFitter(cv, job, role)
+    steps = analysis_steps(cv, job, role, lang, company, culture, reviews, on_partial, inputs=inputs)
+    with run_budget() as budget:
+        results, errors = run_dag(steps, on_result=on_result, deadline=budget.deadline)
+    return analysis_result(steps, results, errors, inputs.report)
+
+
+async def arun_analysis(cv: str, job: str, role: str, lang: str,
+                        company: str = "", culture: str = "", reviews: str = "",
+                        on_result: Optional[Callable[[str, Any, Optional[str]], None]] = None,
+                        on_partial: Optional[Callable[[str, dict], None]] = None) -> dict:
+    """run_analysis() on the event loop, with the agents' async variants."""
+    inputs = InputFitter(cv, job, role)
+    steps = analysis_steps(cv, job, role, lang, company, culture, reviews, on_partial,
+                           asynchronous=True, inputs=inputs)
+    with run_budget() as budget:
+        results, errors = await arun_dag(steps, on_result=on_result, deadline=budget.deadline)
+    return analysis_result(steps, results, errors, inputs.report)
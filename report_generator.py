@@ -1,14 +1,18 @@
+import re
 from docx import Document
 from io import BytesIO
 from datetime import datetime
 
+# Characters python-docx refuses (XML 1.0 disallows most control characters).
+_INVALID_XML = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
 def build_report(sections):
     doc = Document()
     doc.add_heading("AI Job Hunt v5.2 Intelligence Report", level=1)
     doc.add_paragraph(datetime.utcnow().strftime("%Y-%m-%d %H:%M UTC"))
     for title, content in sections.items():
         doc.add_heading(title, level=2)
-        doc.add_paragraph(content)
+        doc.add_paragraph(_INVALID_XML.sub("", str(content)))
     buffer = BytesIO()
     doc.save(buffer)
     buffer.seek(0)
@@ -0,0 +1,118 @@
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from cache import content_key
+from pipeline import report_sections
+from pdf_report import build_pdf_report
+from report_generator import build_report
+from run_store import DATA_DIR, RUNS_RETENTION_DAYS
+
+log = logging.getLogger(__name__)
+
+REPORTS_DIR = os.getenv("REPORTS_DIR", os.path.join(DATA_DIR, "reports"))
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", "1"))
+# Oldest report files are removed once the directory exceeds this (pruned files are rebuilt on demand).
+REPORTS_MAX_BYTES = int(os.getenv("REPORTS_MAX_BYTES", str(500 * 1024 * 1024)))
+
+BUILDERS = {
+    "pdf": build_pdf_report,
+    "docx": build_report,
+}
+
+_executor = ThreadPoolExecutor(max_workers=REPORT_WORKERS, thread_name_prefix="report")
+_building = {}
+_building_lock = threading.Lock()
+
+
+def artifact_path(run_id: str, kind: str, sections: dict) -> str:
+    """Artifacts are named by run ID and content hash, so changed content never serves a stale file."""
+    digest = content_key(kind, sections)[:16]
+    return os.path.join(REPORTS_DIR, f"{run_id}-{digest}.{kind}")
+
+
+def _build(path: str, kind: str, sections: dict) -> str:
+    if os.path.exists(path):
+        return path
+    os.makedirs(REPORTS_DIR, exist_ok=True)
+    buffer = BUILDERS[kind](sections)
+    tmp = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(buffer.getbuffer())
+    os.replace(tmp, path)
+    return path
+
+
+def _build_once(path: str, kind: str, sections: dict) -> str:
+    """Build unless another thread already is; in that case wait for its result."""
+    with _building_lock:
+        future = _building.get(path)
+        owner = future is None
+        if owner:
+            future = _building[path] = _executor.submit(_build, path, kind, sections)
+    try:
+        return future.result()
+    finally:
+        if owner:
+            with _building_lock:
+                _building.pop(path, None)
+
+
+def schedule_reports(run_id: str, result: dict) -> None:
+    """Pre-build every report format for a finished run, off the request thread."""
+    sections = report_sections(result)
+
+    def build_all():
+        for kind in BUILDERS:
+            try:
+                _build_once(artifact_path(run_id, kind, sections), kind, sections)
+            except Exception:
+                log.exception("Building %s report for run %s failed", kind, run_id)
+        prune_reports()
+
+    threading.Thread(target=build_all, daemon=True).start()
+
+
+def get_report(run_id: str, kind: str, result: dict) -> str:
+    """Path of the report file, building it now if the background build hasn't finished."""
+    sections = report_sections(result)
+    path = artifact_path(run_id, kind, sections)
+    if os.path.exists(path):
+        return path
+    path = _build_once(path, kind, sections)
+    prune_reports(keep=path)
+    return path
+
+
+def prune_reports(keep: str = None) -> None:
+    """Remove report files past retention, then the oldest until the rest fit in REPORTS_MAX_BYTES.
+
+    `keep` (a file about to be served) is never removed for size; in-progress .tmp files are left alone.
+    """
+    if not os.path.isdir(REPORTS_DIR):
+        return
+    cutoff = time.time() - RUNS_RETENTION_DAYS * 86400
+    files = []
+    for name in os.listdir(REPORTS_DIR):
+        path = os.path.join(REPORTS_DIR, name)
+        try:
+            st = os.stat(path)
+            if st.st_mtime < cutoff:
+                os.remove(path)
+            elif not name.endswith(".tmp"):
+                files.append((st.st_mtime, st.st_size, path))
+        except OSError:
+            pass
+    total = sum(size for _, size, _ in files)
+    for _, size, path in sorted(files):
+        if total <= REPORTS_MAX_BYTES:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
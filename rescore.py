@@ -0,0 +1,224 @@
+"""Re-score stored match results under new penalty weights.
+
+Stored runs keep the inputs of the deterministic hireability model (raw match score, gap
+counts, evidence quality, timeline risk, hard-gate status) in their breakdown. This tool
+loads those inputs once into flat columns and recomputes every score in a single pass,
+so a weights change can be evaluated over thousands of runs without calling the LLM.
+
+    python rescore.py --weights new_weights.json              # stored runs vs current weights
+    python rescore.py --weights new.json --baseline old.json --source matches.jsonl --json
+
+A JSONL source holds one object per line with either a stored result (with
+"hire_breakdown") or raw match data ("match_score", "critical_gaps", ...,
+"hard_gate_status").
+"""
+import sys
+import json
+import argparse
+from array import array
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from run_store import iter_results
+from scoring import load_weights
+
+GATE_CODES = {"clear": 0, "risk": 1, "fail": 2}
+
+
+class Columns:
+    """Model inputs for many runs, one compact array per field."""
+
+    def __init__(self):
+        self.ids: List[str] = []
+        self.match = array("h")
+        self.critical = array("h")
+        self.moderate = array("h")
+        self.minor = array("h")
+        self.evidence = array("b")
+        self.timeline = array("b")
+        self.gate = array("b")
+        self.evidence_levels: List[str] = []
+        self.timeline_levels: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @staticmethod
+    def _code(levels: List[str], value: str) -> int:
+        try:
+            return levels.index(value)
+        except ValueError:
+            levels.append(value)
+            return len(levels) - 1
+
+    def append(self, run_id: str, row: dict) -> None:
+        """Add one row; raises (TypeError, ValueError, OverflowError) before touching any column."""
+        counts = array("h", [int(row["match_score"]), int(row["critical_gaps"]),
+                             int(row["moderate_gaps"]), int(row["minor_gaps"])])
+        self.ids.append(run_id)
+        self.match.append(counts[0])
+        self.critical.append(counts[1])
+        self.moderate.append(counts[2])
+        self.minor.append(counts[3])
+        self.evidence.append(self._code(self.evidence_levels, row["evidence_quality"]))
+        self.timeline.append(self._code(self.timeline_levels, row["timeline_risk"]))
+        self.gate.append(GATE_CODES.get(row["hard_gate_status"], 0))
+
+
+def model_inputs(record: dict) -> Optional[dict]:
+    """Pull the model inputs out of a stored result or a raw match record."""
+    bd = record.get("hire_breakdown")
+    if bd:
+        if "critical_gaps" not in bd:
+            return None
+        match_score = bd.get("raw_match_score", record.get("match_score", 0))
+        return {
+            "match_score": match_score,
+            "critical_gaps": bd.get("critical_gaps", 0),
+            "moderate_gaps": bd.get("moderate_gaps", 0),
+            "minor_gaps": bd.get("minor_gaps", 0),
+            "evidence_quality": bd.get("evidence_quality", "medium"),
+            "timeline_risk": bd.get("timeline_risk", "low"),
+            "hard_gate_status": bd.get("hard_gate_status") or record.get("hard_gate_status", "clear"),
+        }
+    if "match_score" not in record:
+        return None
+    return {
+        "match_score": record.get("match_score") or 0,
+        "critical_gaps": len(record.get("critical_gaps") or []),
+        "moderate_gaps": len(record.get("moderate_gaps") or []),
+        "minor_gaps": len(record.get("minor_gaps") or []),
+        "evidence_quality": (record.get("evidence_quality") or "medium").lower(),
+        "timeline_risk": (record.get("timeline_risk") or "low").lower(),
+        "hard_gate_status": record.get("hard_gate_status", "clear"),
+    }
+
+
+def load_columns(records: Iterable[Tuple[str, dict]]) -> Columns:
+    cols = Columns()
+    for run_id, record in records:
+        try:
+            row = model_inputs(record or {})
+            if row is not None:
+                cols.append(run_id, row)
+        except (TypeError, ValueError, OverflowError):
+            # Malformed or out-of-range stored scores: skip the row rather than the whole rescore.
+            continue
+    return cols
+
+
+def iter_jsonl(path: str) -> Iterator[Tuple[str, dict]]:
+    with open(path, encoding="utf-8") as f:
+        for n, line in enumerate(f, 1):
+            line = line.strip()
+            if line:
+                record = json.loads(line)
+                yield str(record.get("id", n)), record
+
+
+def _level_table(levels: List[str], penalties: dict) -> List[int]:
+    other = penalties.get("other", 0)
+    return [penalties.get(level, other) for level in levels]
+
+
+def rescore(cols: Columns, weights: dict) -> array:
+    """Hireability score for every row, same model as scoring.compute_hireability_from_match."""
+    wc, wm, wn = weights["critical_gap"], weights["moderate_gap"], weights["minor_gap"]
+    ev = _level_table(cols.evidence_levels, weights["evidence_penalty"])
+    tl = _level_table(cols.timeline_levels, weights["timeline_penalty"])
+    max_pen = weights["max_penalty"]
+    caps = (100, weights["cap_risk"], weights["cap_fail"])
+    # The match score itself is capped before penalties, as in pipeline.evaluate_match.
+    match_caps = (1000, weights["cap_risk"], weights["cap_fail"])
+
+    out = array("h")
+    out.extend(
+        min(max(0, min(100, min(m, match_caps[g])
+                       - max(0, min(max_pen, c * wc + d * wm + n * wn + ev[e] + tl[t])))), caps[g])
+        for m, c, d, n, e, t, g in zip(cols.match, cols.critical, cols.moderate, cols.minor,
+                                       cols.evidence, cols.timeline, cols.gate)
+    )
+    return out
+
+
+# -----------------------------
+# Distribution comparison
+# -----------------------------
+
+def _percentile(sorted_values: List[int], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    pos = (len(sorted_values) - 1) * q
+    lo = int(pos)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (pos - lo)
+
+
+def summarize(scores: array) -> dict:
+    values = sorted(scores)
+    histogram = [0] * 10
+    for v in values:
+        histogram[min(v // 10, 9)] += 1
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), 2) if values else 0.0,
+        "p10": _percentile(values, 0.10),
+        "median": _percentile(values, 0.50),
+        "p90": _percentile(values, 0.90),
+        "histogram": histogram,
+    }
+
+
+def compare(cols: Columns, before: array, after: array, top: int = 10) -> dict:
+    deltas = [a - b for a, b in zip(after, before)]
+    changed = sum(1 for d in deltas if d)
+    movers = sorted(range(len(deltas)), key=lambda i: -abs(deltas[i]))[:top]
+    return {
+        "before": summarize(before),
+        "after": summarize(after),
+        "changed": changed,
+        "mean_delta": round(sum(deltas) / len(deltas), 2) if deltas else 0.0,
+        "top_movers": [
+            {"id": cols.ids[i], "before": before[i], "after": after[i], "delta": deltas[i]}
+            for i in movers if deltas[i]
+        ],
+    }
+
+
+def _format_text(report: dict) -> str:
+    lines = [f"runs: {report['before']['count']}  changed: {report['changed']}  mean delta: {report['mean_delta']:+}"]
+    for label in ("before", "after"):
+        s = report[label]
+        lines.append(f"{label:>6}: mean {s['mean']}  p10 {s['p10']}  median {s['median']}  p90 {s['p90']}")
+    lines.append("bucket   before  after")
+    for i, (b, a) in enumerate(zip(report["before"]["histogram"], report["after"]["histogram"])):
+        lines.append(f"{i * 10:>3}-{i * 10 + 9 if i < 9 else 100:<3} {b:>7} {a:>6}")
+    if report["top_movers"]:
+        lines.append("top movers:")
+        for m in report["top_movers"]:
+            lines.append(f"  {m['id']}: {m['before']} -> {m['after']} ({m['delta']:+})")
+    return "\n".join(lines) + "\n"
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Re-score stored match results under new penalty weights.")
+    ap.add_argument("--weights", required=True, help="JSON file with the candidate weights")
+    ap.add_argument("--baseline", help="JSON file with the baseline weights (default: current weights)")
+    ap.add_argument("--source", default="runs", help="'runs' for the run store, or a JSONL file")
+    ap.add_argument("--top", type=int, default=10, help="number of biggest movers to list")
+    ap.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = ap.parse_args(argv)
+
+    records = iter_results() if args.source == "runs" else iter_jsonl(args.source)
+    cols = load_columns(records)
+    if not len(cols):
+        ap.error("no scorable runs found")
+
+    before = rescore(cols, load_weights(args.baseline))
+    after = rescore(cols, load_weights(args.weights))
+    report = compare(cols, before, after, args.top)
+    sys.stdout.write(json.dumps(report, indent=2) + "\n" if args.json else _format_text(report))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
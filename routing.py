@@ -0,0 +1,172 @@
+"""Per-agent model routing and per-run token/latency budgets.
+
+ROUTES gives each agent (the `agent` label of every llm() call) a model, max_tokens,
+temperature and priority, plus the "input_tokens" budget for its CV and job text
+(input_budget.py; None means INPUT_TOKEN_BUDGET). "model" is "default" (OPENAI_MODEL), "fast"
+(OPENAI_FAST_MODEL) or a literal model name. Override entries with a JSON file in
+LLM_ROUTES_FILE; each agent's entry is merged key by key.
+
+A run can carry a budget: RUN_TOKEN_BUDGET total tokens and a RUN_DEADLINE_SECONDS
+wall-clock ceiling. Once the budget is at risk (the next call's estimated tokens
+would overrun it, or RUN_BUDGET_RISK of the deadline has passed) "low" priority
+agents are skipped and "medium" ones move to the fast model; "high" ones always run.
+"""
+import os
+import json
+import time
+import threading
+import contextlib
+import contextvars
+from typing import Optional, Tuple
+
+from metrics import Counter
+
+DEFAULT_ROUTE = {"model": "default", "max_tokens": None, "temperature": 0.3, "priority": "high",
+                 "input_tokens": None}
+
+# Every agent stays on OPENAI_MODEL with no answer cap; cheaper routes are opt-in
+# through LLM_ROUTES_FILE. Priorities only matter under a run budget.
+DEFAULT_ROUTES = {
+    # Inputs to everything else. They quote eligibility lines from the full texts,
+    # so their input is never trimmed.
+    "extract_maps": {"input_tokens": 0},
+    "hard_gate_extract": {"input_tokens": 0},
+    "job_gate_extract": {"input_tokens": 0},
+    "cv_gate_check": {"input_tokens": 0},
+    # Long rewrites and audits: downgraded to the fast model when the budget is at risk.
+    # The CV rewrites reproduce the whole CV, so their input is never trimmed either.
+    "optimize_cv": {"priority": "medium", "input_tokens": 0},
+    "ats_audit": {"priority": "medium"},
+    "ats_submission": {"priority": "medium", "input_tokens": 0},
+    "consolidated_sections": {"priority": "medium"},
+    # Narrative sections: skipped when the budget is at risk.
+    "requirement_intelligence": {"priority": "low"},
+    "interview_pack": {"priority": "low"},
+    "recruiter_psychology": {"priority": "low"},
+    "hireability_score": {"priority": "low"},
+    "culture_analysis": {"priority": "low"},
+    "hireability_rewriter": {"priority": "low"},
+}
+
+RUN_TOKEN_BUDGET = int(os.getenv("RUN_TOKEN_BUDGET", "0"))
+RUN_DEADLINE_SECONDS = float(os.getenv("RUN_DEADLINE_SECONDS", "0"))
+# Share of the deadline after which low-priority agents are skipped and medium ones downgraded.
+RUN_BUDGET_RISK = float(os.getenv("RUN_BUDGET_RISK", "0.7"))
+
+LLM_BUDGET_ACTIONS = Counter("llm_budget_actions_total", "Agent calls downgraded or skipped by the run budget.")
+
+
+def load_routes(path: Optional[str] = None) -> dict:
+    """DEFAULT_ROUTES overlaid with a JSON file (path or LLM_ROUTES_FILE)."""
+    routes = {agent: dict(DEFAULT_ROUTE, **entry) for agent, entry in DEFAULT_ROUTES.items()}
+    path = path or os.getenv("LLM_ROUTES_FILE")
+    if path:
+        with open(path, encoding="utf-8") as f:
+            overrides = json.load(f)
+        for agent, entry in overrides.items():
+            routes[agent] = dict(routes.get(agent, DEFAULT_ROUTE), **entry)
+    return routes
+
+
+ROUTES = load_routes()
+
+
+def model_name(alias: str) -> str:
+    if alias == "default":
+        return os.getenv("OPENAI_MODEL", "gpt-4.1-mini")
+    if alias == "fast":
+        return os.getenv("OPENAI_FAST_MODEL", "gpt-4.1-nano")
+    return alias
+
+
+def route(agent: str) -> dict:
+    return ROUTES.get(agent, DEFAULT_ROUTE)
+
+
+# -----------------------------
+# Per-run budget
+# -----------------------------
+
+class BudgetExceeded(Exception):
+    """Raised instead of calling the model for a low-priority agent once the run budget is at risk."""
+
+
+class RunBudget:
+    """Tokens spent and time left for one run; shared by every step of the run."""
+
+    def __init__(self, max_tokens: int = 0, deadline_seconds: float = 0):
+        self.max_tokens = max_tokens
+        self.deadline_seconds = deadline_seconds
+        self.started = time.monotonic()
+        self.deadline = self.started + deadline_seconds if deadline_seconds else None
+        self.tokens = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.max_tokens or self.deadline)
+
+    def spend(self, tokens: int) -> None:
+        with self._lock:
+            self.tokens += tokens
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left before the deadline, or None without one."""
+        return None if self.deadline is None else max(0.0, self.deadline - time.monotonic())
+
+    def at_risk(self, estimate: int) -> Optional[str]:
+        """Why the next call (about `estimate` tokens) puts the budget at risk, or None."""
+        if self.max_tokens and self.tokens + estimate > self.max_tokens:
+            return f"{self.tokens} of {self.max_tokens} tokens used"
+        if self.deadline is not None:
+            elapsed = time.monotonic() - self.started
+            if elapsed >= RUN_BUDGET_RISK * self.deadline_seconds:
+                return f"{elapsed:.1f}s of the {self.deadline_seconds:g}s deadline used"
+        return None
+
+
+_budget: contextvars.ContextVar = contextvars.ContextVar("run_budget", default=None)
+
+
+@contextlib.contextmanager
+def run_budget(max_tokens: Optional[int] = None, deadline_seconds: Optional[float] = None):
+    """Apply a budget (default RUN_TOKEN_BUDGET / RUN_DEADLINE_SECONDS) to llm() calls made in this context.
+
+    Worker threads only see it if they run in a copy of this context (run_dag does that).
+    """
+    budget = RunBudget(RUN_TOKEN_BUDGET if max_tokens is None else max_tokens,
+                       RUN_DEADLINE_SECONDS if deadline_seconds is None else deadline_seconds)
+    token = _budget.set(budget if budget.enabled else None)
+    try:
+        yield budget
+    finally:
+        _budget.reset(token)
+
+
+def current_budget() -> Optional[RunBudget]:
+    return _budget.get()
+
+
+def estimate_tokens(*texts: str) -> int:
+    return sum(len(t) for t in texts) // 4
+
+
+def plan_call(agent: str, system: str, user: str, model: Optional[str] = None,
+              max_tokens: Optional[int] = None,
+              temperature: Optional[float] = None) -> Tuple[str, Optional[int], float]:
+    """(model, max_tokens, temperature) for a call: explicit arguments, else the agent's route,
+    adjusted for the current run budget. Raises BudgetExceeded to skip the call."""
+    r = route(agent)
+    max_tokens = r["max_tokens"] if max_tokens is None else max_tokens
+    temperature = r["temperature"] if temperature is None else temperature
+    budget = current_budget()
+    if model is None:
+        model = model_name(r["model"])
+        reason = budget.at_risk(estimate_tokens(system, user) + (max_tokens or 0)) if budget else None
+        if reason and r["priority"] == "low":
+            LLM_BUDGET_ACTIONS.inc(agent=agent, action="skipped")
+            raise BudgetExceeded(f"run budget at risk ({reason})")
+        if reason and r["priority"] == "medium" and model != model_name("fast"):
+            LLM_BUDGET_ACTIONS.inc(agent=agent, action="downgraded")
+            model = model_name("fast")
+    return model, max_tokens, temperature
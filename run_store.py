@@ -0,0 +1,135 @@
+import os
+import json
+import time
+import zlib
+import sqlite3
+import threading
+from typing import Iterator, Optional, Tuple
+
+DATA_DIR = os.getenv("DATA_DIR", ".data")
+RUNS_DB_PATH = os.getenv("RUNS_DB_PATH", os.path.join(DATA_DIR, "runs.sqlite3"))
+RUNS_RETENTION_DAYS = float(os.getenv("RUNS_RETENTION_DAYS", "30"))
+RUNS_MAX_BYTES = int(os.getenv("RUNS_MAX_BYTES", str(500 * 1024 * 1024)))
+
+_lock = threading.Lock()
+_db = None
+
+
+def _conn() -> sqlite3.Connection:
+    global _db
+    if _db is None:
+        os.makedirs(os.path.dirname(RUNS_DB_PATH) or ".", exist_ok=True)
+        db = sqlite3.connect(RUNS_DB_PATH, check_same_thread=False, timeout=10)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS runs ("
+            "id TEXT PRIMARY KEY, status TEXT NOT NULL, "
+            "created_at REAL NOT NULL, updated_at REAL NOT NULL, "
+            "result BLOB, size INTEGER NOT NULL DEFAULT 0, error TEXT)"
+        )
+        db.execute("CREATE INDEX IF NOT EXISTS runs_created ON runs(created_at)")
+        db.commit()
+        _db = db
+    return _db
+
+
+def _pack(result: dict) -> bytes:
+    return zlib.compress(json.dumps(result, ensure_ascii=False).encode("utf-8"), 6)
+
+
+def _unpack(blob) -> Optional[dict]:
+    if not blob:
+        return None
+    if isinstance(blob, str):
+        return json.loads(blob)
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+
+def create_run(run_id: str, status: str = "queued") -> None:
+    now = time.time()
+    with _lock:
+        db = _conn()
+        db.execute(
+            "INSERT INTO runs (id, status, created_at, updated_at) VALUES (?, ?, ?, ?)",
+            (run_id, status, now, now),
+        )
+        db.commit()
+
+
+def update_run(run_id: str, status: str, result: Optional[dict] = None, error: Optional[str] = None) -> None:
+    """Set the run status; a result is stored as a compressed JSON blob and triggers pruning."""
+    blob = _pack(result) if result is not None else None
+    with _lock:
+        db = _conn()
+        db.execute(
+            "UPDATE runs SET status = ?, updated_at = ?, "
+            "result = COALESCE(?, result), size = COALESCE(?, size), error = COALESCE(?, error) WHERE id = ?",
+            (status, time.time(), blob, len(blob) if blob is not None else None, error, run_id),
+        )
+        db.commit()
+        if blob is not None:
+            _prune(db, keep=run_id)
+
+
+def save_result(run_id: str, result: dict, lang: str) -> None:
+    update_run(run_id, "done", result=dict(result, lang=lang))
+
+
+# Runs still waiting for their result; the size-based prune leaves them alone.
+UNFINISHED = ("queued", "running")
+
+
+def _prune(db: sqlite3.Connection, keep: Optional[str] = None) -> None:
+    """Drop runs past retention, then the oldest finished runs until the stored results fit in RUNS_MAX_BYTES.
+
+    Unfinished runs hold no result yet, so deleting them frees nothing and would lose
+    the result when the run completes (update_run would match no row). `keep` (the
+    run just saved) is never dropped for size either.
+    """
+    db.execute("DELETE FROM runs WHERE created_at < ?", (time.time() - RUNS_RETENTION_DAYS * 86400,))
+    total = db.execute("SELECT COALESCE(SUM(size), 0) FROM runs").fetchone()[0]
+    if total > RUNS_MAX_BYTES:
+        for run_id, size in db.execute(
+                "SELECT id, size FROM runs WHERE status NOT IN (?, ?) AND id IS NOT ? ORDER BY created_at",
+                UNFINISHED + (keep,)).fetchall():
+            if total <= RUNS_MAX_BYTES:
+                break
+            db.execute("DELETE FROM runs WHERE id = ?", (run_id,))
+            total -= size or 0
+    db.commit()
+
+
+def iter_results(batch_size: int = 200) -> Iterator[Tuple[str, dict]]:
+    """Yield (run_id, result) for every finished run, paging through the table by ID."""
+    last = ""
+    while True:
+        with _lock:
+            rows = _conn().execute(
+                "SELECT id, result FROM runs WHERE status = 'done' AND result IS NOT NULL AND id > ? "
+                "ORDER BY id LIMIT ?",
+                (last, batch_size),
+            ).fetchall()
+        if not rows:
+            return
+        for run_id, blob in rows:
+            yield run_id, _unpack(blob)
+        last = rows[-1][0]
+
+
+def get_run(run_id: str) -> Optional[dict]:
+    """Return {id, status, created_at, updated_at, result, error} or None."""
+    with _lock:
+        row = _conn().execute(
+            "SELECT id, status, created_at, updated_at, result, error FROM runs WHERE id = ?",
+            (run_id,),
+        ).fetchone()
+    if row is None:
+        return None
+    return {
+        "id": row[0],
+        "status": row[1],
+        "created_at": row[2],
+        "updated_at": row[3],
+        "result": _unpack(row[4]),
+        "error": row[5],
+    }
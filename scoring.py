@@ -0,0 +1,317 @@
+import os
+import re
+import json
+from typing import Any, Tuple, Optional
+
+from openai_client import llm
+
+
+# -----------------------------
+# Scoring model configuration
+# -----------------------------
+
+DEFAULT_WEIGHTS = {
+    "critical_gap": 15,
+    "moderate_gap": 7,
+    "minor_gap": 3,
+    # Unlisted evidence/timeline levels get the "other" penalty.
+    "evidence_penalty": {"strong": 0, "medium": 5, "other": 10},
+    "timeline_penalty": {"low": 0, "medium": 5, "other": 10},
+    "max_penalty": 90,
+    "cap_fail": 25,
+    "cap_risk": 45,
+}
+
+
+def load_weights(path: Optional[str] = None) -> dict:
+    """DEFAULT_WEIGHTS overlaid with a JSON file (path or SCORING_WEIGHTS_FILE)."""
+    weights = json.loads(json.dumps(DEFAULT_WEIGHTS))
+    path = path or os.getenv("SCORING_WEIGHTS_FILE")
+    if path:
+        with open(path, encoding="utf-8") as f:
+            overrides = json.load(f)
+        for key, value in overrides.items():
+            if isinstance(value, dict) and isinstance(weights.get(key), dict):
+                weights[key].update(value)
+            else:
+                weights[key] = value
+    return weights
+
+
+SCORING_WEIGHTS = load_weights()
+
+# Derive the hard-gate status from severity/cv_evidence_status as well as an explicit "status".
+# Off by default: it caps match and hireability for every run whose CV doesn't mention a gate.
+HARD_GATE_STATUS_FROM_EVIDENCE = os.getenv("HARD_GATE_STATUS_FROM_EVIDENCE", "false").strip().lower() == "true"
+
+
+def level_penalty(table: dict, level: str) -> int:
+    return table.get(level, table.get("other", 0))
+
+
+# -----------------------------
+# Parsing helpers
+# -----------------------------
+
+def parse_json_with_repair(raw: Any) -> dict:
+    """Parse JSON from LLM. Lightweight repair: decode the first complete {...} object in the text."""
+    if raw is None:
+        return {}
+    if isinstance(raw, dict):
+        return raw
+    s = str(raw).strip()
+    try:
+        return json.loads(s)
+    except Exception:
+        pass
+    # raw_decode stops at the end of the first object, so trailing prose or a second
+    # block can't swallow it the way a greedy {.*} match does.
+    decoder = json.JSONDecoder()
+    start = s.find("{")
+    while start >= 0:
+        try:
+            value, _ = decoder.raw_decode(s, start)
+            if isinstance(value, dict):
+                return value
+        except ValueError:
+            pass
+        start = s.find("{", start + 1)
+    return {}
+
+
+def apply_hard_gate_caps(score: int, hard_gate_status: str, weights: Optional[dict] = None) -> int:
+    w = weights or SCORING_WEIGHTS
+    try:
+        score = int(score)
+    except Exception:
+        return score
+    if hard_gate_status == "fail":
+        return min(score, w["cap_fail"])
+    if hard_gate_status == "risk":
+        return min(score, w["cap_risk"])
+    return score
+
+
+def compute_hard_gate_status(hard_gates_output: Any) -> str:
+    """Return 'clear' | 'risk' | 'fail' from hard-gates output."""
+    if hard_gates_output is None:
+        return "clear"
+
+    gates = []
+    if isinstance(hard_gates_output, list):
+        gates = hard_gates_output
+    elif isinstance(hard_gates_output, dict):
+        gates = hard_gates_output.get("hard_gates") or []
+    else:
+        data = parse_json_with_repair(hard_gates_output)
+        if isinstance(data, dict):
+            gates = data.get("hard_gates") or []
+        elif isinstance(data, list):
+            gates = data
+
+    # gates are dicts like {"gate": "...", "status":"pass|risk|fail", ...}. With
+    # HARD_GATE_STATUS_FROM_EVIDENCE, in the hard_gate_extract schema a required gate
+    # the CV contradicts also fails and one the CV doesn't mention is a risk.
+    status_rank = {"clear": 0, "pass": 0, "risk": 1, "fail": 2}
+    evidence_rank = {"satisfied": 0, "unclear": 1, "missing": 2}
+    worst = 0
+    for g in gates or []:
+        if not isinstance(g, dict):
+            continue
+        s = (g.get("status") or "").lower().strip()
+        worst = max(worst, status_rank.get(s, 0))
+        if HARD_GATE_STATUS_FROM_EVIDENCE and (g.get("severity") or "").lower().strip() == "hard_gate":
+            ev = (g.get("cv_evidence_status") or "").lower().strip()
+            worst = max(worst, evidence_rank.get(ev, 0))
+    return "fail" if worst == 2 else ("risk" if worst == 1 else "clear")
+
+
+def extract_score_fallback(text: str, kind: str = "match") -> int:
+    """Fallback extraction if JSON missing; avoids crashing."""
+    if not text:
+        return 0
+    # Find last percentage-like number
+    nums = re.findall(r"\b(\d{1,3})\b", str(text))
+    for n in reversed(nums):
+        try:
+            v = int(n)
+            if 0 <= v <= 100:
+                return v
+        except Exception:
+            continue
+    return 0
+
+
+# -----------------------------
+# Deterministic hireability model
+# -----------------------------
+
+def compute_penalties(match_data: dict, weights: Optional[dict] = None) -> Tuple[int, dict]:
+    w = weights or SCORING_WEIGHTS
+    critical = match_data.get("critical_gaps") or []
+    moderate = match_data.get("moderate_gaps") or []
+    minor = match_data.get("minor_gaps") or []
+
+    crit_pen = w["critical_gap"] * len(critical)
+    mod_pen = w["moderate_gap"] * len(moderate)
+    min_pen = w["minor_gap"] * len(minor)
+
+    evq = (match_data.get("evidence_quality") or "medium").lower()
+    tl = (match_data.get("timeline_risk") or "low").lower()
+
+    ev_pen = level_penalty(w["evidence_penalty"], evq)
+    tl_pen = level_penalty(w["timeline_penalty"], tl)
+
+    total = crit_pen + mod_pen + min_pen + ev_pen + tl_pen
+    total = max(0, min(total, w["max_penalty"]))
+
+    breakdown = {
+        "critical_gaps": len(critical),
+        "moderate_gaps": len(moderate),
+        "minor_gaps": len(minor),
+        "critical_penalty": crit_pen,
+        "moderate_penalty": mod_pen,
+        "minor_penalty": min_pen,
+        "evidence_quality": evq,
+        "evidence_penalty": ev_pen,
+        "timeline_risk": tl,
+        "timeline_penalty": tl_pen,
+        "total_penalty": total,
+    }
+    return total, breakdown
+
+
+def compute_hireability_from_match(match_score: int, match_data: dict, hard_gate_status: str,
+                                   weights: Optional[dict] = None) -> Tuple[int, dict]:
+    penalties, breakdown = compute_penalties(match_data, weights)
+    raw = max(0, min(100, int(match_score) - penalties))
+
+    capped = apply_hard_gate_caps(raw, hard_gate_status, weights)
+
+    breakdown["raw_hireability"] = raw
+    breakdown["final_hireability"] = capped
+    breakdown["hard_gate_status"] = hard_gate_status
+    return capped, breakdown
+
+
+# -----------------------------
+# Layer 2: deterministic explanation (A + B)
+# -----------------------------
+
+def build_hireability_sections(match_score: int, hire_score: int, match_data: dict, breakdown: dict,
+                               weights: Optional[dict] = None) -> str:
+    w = weights or SCORING_WEIGHTS
+    crit = breakdown.get("critical_gaps", 0)
+    mod = breakdown.get("moderate_gaps", 0)
+    minor = breakdown.get("minor_gaps", 0)
+    evq = breakdown.get("evidence_quality", "medium")
+    tlr = breakdown.get("timeline_risk", "low")
+    total_pen = breakdown.get("total_penalty", 0)
+    hard_gate_status = breakdown.get("hard_gate_status", "clear")
+
+    if hire_score >= 75:
+        summary_line = "Overall likelihood of progressing is strong."
+    elif hire_score >= 50:
+        summary_line = "Overall likelihood of progressing is moderate."
+    elif hire_score >= 30:
+        summary_line = "Overall likelihood of progressing is limited due to significant gaps."
+    else:
+        summary_line = "Overall likelihood of progressing is low due to major misalignment or blockers."
+
+    hard_gate_note = ""
+    if hard_gate_status == "fail":
+        hard_gate_note = "Eligibility hard gate status is FAIL. This typically stops the application from progressing regardless of fit."
+    elif hard_gate_status == "risk":
+        hard_gate_note = "Eligibility hard gate status is RISK (unclear). This can materially reduce the chance of progressing until clarified."
+
+    def bullets(items, maxn=6):
+        items = [str(x).strip() for x in (items or []) if str(x).strip()]
+        return "\n".join([f"- {x}" for x in items[:maxn]]) if items else "- None identified"
+
+    blockers = match_data.get("blockers") or []
+    critical_list = match_data.get("critical_gaps") or []
+    moderate_list = match_data.get("moderate_gaps") or []
+    minor_list = match_data.get("minor_gaps") or []
+
+    a = []
+    a.append("Section A: Executive Summary (Narrative)")
+    a.append("")
+    a.append(f"The Recruiter Match Score for this role is {match_score}/100, indicating alignment between job requirements and CV evidence.")
+    a.append(f"The Hireability Score for this role is {hire_score}/100.")
+    a.append("")
+    a.append(f"Key drivers: {crit} critical gap(s), {mod} moderate gap(s), and {minor} minor issue(s). Evidence quality is {evq} and timeline risk is {tlr}.")
+    if blockers:
+        a.append("Notable blockers identified by the recruiter assessment:")
+        a.append(bullets(blockers, 4))
+    if hard_gate_note:
+        a.append("")
+        a.append(hard_gate_note)
+    a.append("")
+    a.append(summary_line)
+
+    b = []
+    b.append("Section B: Scoring Breakdown (Technical)")
+    b.append("")
+    b.append(f"Base fit (Recruiter Match): {match_score}/100")
+    b.append(f"Total penalties applied: {total_pen}")
+    b.append("")
+    b.append("Penalty breakdown:")
+    b.append(f"- Critical gaps: {crit} × {w['critical_gap']} = {breakdown.get('critical_penalty', 0)}")
+    b.append(f"- Moderate gaps: {mod} × {w['moderate_gap']} = {breakdown.get('moderate_penalty', 0)}")
+    b.append(f"- Minor issues: {minor} × {w['minor_gap']} = {breakdown.get('minor_penalty', 0)}")
+    b.append(f"- Evidence quality ({evq}): {breakdown.get('evidence_penalty', 0)}")
+    b.append(f"- Timeline risk ({tlr}): {breakdown.get('timeline_penalty', 0)}")
+    b.append("")
+    b.append(f"Hireability = Match ({match_score}) − Penalties ({total_pen}) (then hard-gate caps if applicable).")
+    b.append("")
+    b.append("Critical gaps:")
+    b.append(bullets(critical_list))
+    b.append("")
+    b.append("Moderate gaps:")
+    b.append(bullets(moderate_list))
+    b.append("")
+    b.append("Minor issues:")
+    b.append(bullets(minor_list))
+
+    return "\n".join(a + ["", ""] + b)
+
+
+# -----------------------------
+# Layer 3: optional safe LLM rewriter
+# -----------------------------
+
+def _numbers_in_text(s: str) -> set[str]:
+    return set(re.findall(r"\b\d{1,3}\b", s or ""))
+
+
+def validate_rewriter_output(output_text: str, allowed_numbers: set[str]) -> bool:
+    if not output_text:
+        return False
+    if "Section A:" not in output_text or "Section B:" not in output_text:
+        return False
+    found = _numbers_in_text(output_text)
+    return found.issubset(allowed_numbers)
+
+
+def polish_narrative_with_llm(structured: dict, draft_text: str) -> Optional[str]:
+    system = (
+        "You are a scoring explanation rewriter. "
+        "You MUST only use the structured data provided. "
+        "You MUST NOT add new facts, skills, requirements, certifications, languages, citizenship, or assumptions. "
+        "You MUST NOT change any numeric values. "
+        "If information is not in the JSON, you must not mention it. "
+        "Rewrite for clarity and executive tone. Output plain text only with the same two sections."
+    )
+    user = f"""Using ONLY this structured scoring data and the draft explanation, rewrite the text to be clearer and more executive.
+Do not add any facts not present below.
+
+Structured scoring data (JSON):
+{json.dumps(structured, ensure_ascii=False)}
+
+Draft explanation:
+{draft_text}
+"""
+    try:
+        return llm(system, user, agent="hireability_rewriter")
+    except Exception:
+        return None
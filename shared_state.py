@@ -0,0 +1,248 @@
+"""State shared by every gunicorn worker: rate-limit counters, pending streams, the secret key.
+
+STATE_URL picks the backend:
+    sqlite:///path/to/state.sqlite3  (default: DATA_DIR/state.sqlite3; workers on one host)
+    redis://host:6379/0               (any Redis-compatible server; needs the redis package;
+                                       also works across hosts)
+
+Importing this module registers the "sqlite" scheme with the limits library, so
+Flask-Limiter can keep its counters in the same SQLite file.
+"""
+import os
+import time
+import sqlite3
+import secrets
+import threading
+from typing import Optional, Tuple
+
+from limits.storage import Storage
+
+from run_store import DATA_DIR
+
+STATE_URL = os.getenv("STATE_URL", "sqlite:///" + os.path.join(DATA_DIR, "state.sqlite3"))
+
+
+class SQLiteState:
+    """Key/value store with per-key expiry in one SQLite table, safe across processes."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = None
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            db = sqlite3.connect(self.path, check_same_thread=False, timeout=10, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)")
+            self._db = db
+        return self._db
+
+    def _tx(self, fn):
+        """Run fn(db) in a write transaction, so read-modify-write is atomic across processes."""
+        with self._lock:
+            db = self._conn()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(db)
+                db.execute("COMMIT")
+                return result
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+
+    @staticmethod
+    def _live(db, key: str, now: float) -> Optional[Tuple[str, Optional[float]]]:
+        row = db.execute("SELECT value, expires_at FROM state WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        if row[1] is not None and row[1] <= now:
+            db.execute("DELETE FROM state WHERE key = ?", (key,))
+            return None
+        return row
+
+    def get(self, key: str) -> Optional[str]:
+        row = self._tx(lambda db: self._live(db, key, time.time()))
+        return row[0] if row else None
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        expires = time.time() + ttl if ttl else None
+        self._tx(lambda db: db.execute(
+            "INSERT OR REPLACE INTO state (key, value, expires_at) VALUES (?, ?, ?)", (key, value, expires)))
+
+    def setdefault(self, key: str, value: str, ttl: Optional[float] = None) -> str:
+        """Store value unless the key exists; return whichever value is stored."""
+        def run(db):
+            now = time.time()
+            row = self._live(db, key, now)
+            if row:
+                return row[0]
+            db.execute("INSERT INTO state (key, value, expires_at) VALUES (?, ?, ?)",
+                       (key, value, now + ttl if ttl else None))
+            return value
+        return self._tx(run)
+
+    def pop(self, key: str) -> Optional[str]:
+        def run(db):
+            row = self._live(db, key, time.time())
+            if row:
+                db.execute("DELETE FROM state WHERE key = ?", (key,))
+            return row[0] if row else None
+        return self._tx(run)
+
+    def delete(self, key: str) -> None:
+        self._tx(lambda db: db.execute("DELETE FROM state WHERE key = ?", (key,)))
+
+    def discard(self, key: str, value: str) -> None:
+        """Delete the key only while it still holds `value`."""
+        self._tx(lambda db: db.execute("DELETE FROM state WHERE key = ? AND value = ?", (key, value)))
+
+    def incr(self, key: str, amount: int, ttl: float) -> int:
+        """Add to a counter; a new (or expired) counter starts a fresh ttl window."""
+        def run(db):
+            now = time.time()
+            row = self._live(db, key, now)
+            if row is None:
+                db.execute("INSERT INTO state (key, value, expires_at) VALUES (?, ?, ?)", (key, str(amount), now + ttl))
+                return amount
+            value = int(row[0]) + amount
+            db.execute("UPDATE state SET value = ? WHERE key = ?", (str(value), key))
+            return value
+        return self._tx(run)
+
+    def expiry(self, key: str) -> Optional[float]:
+        row = self._tx(lambda db: self._live(db, key, time.time()))
+        return row[1] if row else None
+
+    def clear(self, prefix: str = "") -> int:
+        return self._tx(lambda db: db.execute(
+            "DELETE FROM state WHERE key LIKE ? ESCAPE '\\'",
+            (prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%",)).rowcount)
+
+    def purge(self) -> None:
+        self._tx(lambda db: db.execute("DELETE FROM state WHERE expires_at IS NOT NULL AND expires_at <= ?",
+                                       (time.time(),)))
+
+
+class RedisState:
+    """The same operations on a Redis-compatible server."""
+
+    def __init__(self, url: str):
+        import redis
+        self._redis = redis.Redis.from_url(url, decode_responses=True)
+
+    def get(self, key: str) -> Optional[str]:
+        return self._redis.get(key)
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        self._redis.set(key, value, px=int(ttl * 1000) if ttl else None)
+
+    def setdefault(self, key: str, value: str, ttl: Optional[float] = None) -> str:
+        self._redis.set(key, value, nx=True, px=int(ttl * 1000) if ttl else None)
+        return self._redis.get(key)
+
+    def pop(self, key: str) -> Optional[str]:
+        pipe = self._redis.pipeline()
+        pipe.get(key)
+        pipe.delete(key)
+        return pipe.execute()[0]
+
+    def delete(self, key: str) -> None:
+        self._redis.delete(key)
+
+    _DISCARD = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0"
+
+    def discard(self, key: str, value: str) -> None:
+        self._redis.eval(self._DISCARD, 1, key, value)
+
+    def incr(self, key: str, amount: int, ttl: float) -> int:
+        pipe = self._redis.pipeline()
+        pipe.incrby(key, amount)
+        pipe.pexpire(key, int(ttl * 1000), nx=True)
+        return pipe.execute()[0]
+
+    def expiry(self, key: str) -> Optional[float]:
+        ms = self._redis.pttl(key)
+        return time.time() + ms / 1000 if ms and ms > 0 else None
+
+    def clear(self, prefix: str = "") -> int:
+        keys = list(self._redis.scan_iter(match=f"{prefix}*"))
+        return self._redis.delete(*keys) if keys else 0
+
+    def purge(self) -> None:
+        pass  # Redis expires keys itself
+
+
+def open_state(url: str):
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisState(url)
+    if url.startswith("sqlite:///"):
+        return SQLiteState(url[len("sqlite:///"):])
+    raise ValueError(f"Unsupported STATE_URL: {url}")
+
+
+_state = None
+_state_lock = threading.Lock()
+
+
+def get_state():
+    global _state
+    if _state is None:
+        with _state_lock:
+            if _state is None:
+                _state = open_state(STATE_URL)
+    return _state
+
+
+def secret_key() -> str:
+    """FLASK_SECRET_KEY, or a key generated once and shared by every worker through the state store."""
+    return os.getenv("FLASK_SECRET_KEY") or get_state().setdefault("flask_secret_key", secrets.token_hex(32))
+
+
+def limiter_storage_uri() -> str:
+    """Flask-Limiter storage: RATELIMIT_STORAGE_URI, else the same backend as STATE_URL."""
+    return os.getenv("RATELIMIT_STORAGE_URI") or STATE_URL
+
+
+# -----------------------------
+# Rate-limit storage (limits library)
+# -----------------------------
+
+class SQLiteLimitsStorage(Storage):
+    """Fixed-window rate-limit counters in a SQLiteState file; registered as sqlite:///path."""
+
+    STORAGE_SCHEME = ["sqlite"]
+    PREFIX = "limits:"
+
+    def __init__(self, uri: str, wrap_exceptions: bool = False, **options):
+        path = uri[len("sqlite:///"):]
+        self._state = SQLiteState(path)
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def incr(self, key: str, expiry: int, elastic_expiry: bool = False, amount: int = 1) -> int:
+        return self._state.incr(self.PREFIX + key, amount, expiry)
+
+    def get(self, key: str) -> int:
+        value = self._state.get(self.PREFIX + key)
+        return int(value) if value else 0
+
+    def get_expiry(self, key: str) -> float:
+        return self._state.expiry(self.PREFIX + key) or time.time()
+
+    def check(self) -> bool:
+        try:
+            self._state.get(self.PREFIX + "check")
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self) -> Optional[int]:
+        return self._state.clear(self.PREFIX)
+
+    def clear(self, key: str) -> None:
+        self._state.delete(self.PREFIX + key)
@@ -0,0 +1,129 @@
+"""Single-flight deduplication: identical work already in progress is joined, not repeated.
+
+SingleFlight shares one call among concurrent identical callers in this process,
+either threads (do) or tasks on one event loop (ado). claim_run()/release_run()
+attach identical /run submissions to the analysis already running in any worker,
+through the shared state store.
+"""
+import os
+import asyncio
+import threading
+import weakref
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from cache import content_key
+from metrics import Counter
+from shared_state import get_state
+
+COALESCED = Counter("coalesced_calls_total", "Calls that joined an identical call already in flight, by level.")
+
+RUN_COALESCING = os.getenv("RUN_COALESCING", "true").strip().lower() == "true"
+# Upper bound on how long a crashed worker's claim can keep attaching new submissions.
+RUN_COALESCE_TTL_SECONDS = float(os.getenv("RUN_COALESCE_TTL_SECONDS", "900"))
+RUN_KEY = "inflight:run:{}"
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error: Optional[BaseException] = None
+
+
+class _Flight:
+    def __init__(self, task: "asyncio.Task"):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Concurrent callers with the same key share the first caller's result (or exception)."""
+
+    def __init__(self, level: str):
+        self.level = level
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self._flights = weakref.WeakKeyDictionary()  # event loop -> {key: _Flight}
+
+    def do(self, key: str, fn: Callable[[], Any], **labels) -> Tuple[Any, bool]:
+        """Return (fn(), shared); `shared` is True when another caller's result was reused."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            COALESCED.inc(level=self.level, **labels)
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value, True
+        try:
+            call.value = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.value, False
+
+    async def ado(self, key: str, fn: Callable[[], Awaitable[Any]], **labels) -> Tuple[Any, bool]:
+        """do() for coroutines; callers are coalesced per event loop.
+
+        fn() runs in its own task, so a cancelled caller (e.g. its client went away)
+        leaves the call running for the others; it is cancelled with its last caller.
+        """
+        flights = self._flights.setdefault(asyncio.get_running_loop(), {})
+        flight = flights.get(key)
+        shared = flight is not None
+        if shared:
+            COALESCED.inc(level=self.level, **labels)
+        else:
+            flight = flights[key] = _Flight(asyncio.ensure_future(fn()))
+
+            def finished(task):
+                if flights.get(key) is flight:
+                    del flights[key]
+                # Nobody may be waiting; don't log "exception was never retrieved".
+                task.cancelled() or task.exception()
+            flight.task.add_done_callback(finished)
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task), shared
+        except asyncio.CancelledError:
+            if flight.waiters == 1 and not flight.task.done():
+                # Later callers start a fresh call instead of joining the cancelled one.
+                if flights.get(key) is flight:
+                    del flights[key]
+                flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+
+
+# -----------------------------
+# /run submissions (across workers)
+# -----------------------------
+
+def run_key(args: tuple) -> str:
+    return content_key("run", *args)
+
+
+def claim_run(key: str, run_id: str) -> Optional[str]:
+    """Register run_id as the analysis for `key`; return the run an identical submission
+    already registered (the caller should attach to it), or None."""
+    if not RUN_COALESCING:
+        return None
+    existing = get_state().setdefault(RUN_KEY.format(key), run_id, ttl=RUN_COALESCE_TTL_SECONDS)
+    if existing == run_id:
+        return None
+    COALESCED.inc(level="run")
+    return existing
+
+
+def release_run(key: str, run_id: str) -> None:
+    """Stop attaching submissions to run_id, once its result is stored (or it failed)."""
+    if RUN_COALESCING:
+        get_state().discard(RUN_KEY.format(key), run_id)
@@ -0,0 +1,223 @@
+"""Structured (JSON) agent output: schema-constrained requests, incremental parsing, repair retries."""
+import os
+import json
+import logging
+from typing import Any, Callable, Dict, Optional
+
+from openai import BadRequestError
+
+from metrics import Counter
+from openai_client import llm, allm
+from routing import route, model_name
+from scoring import parse_json_with_repair
+
+log = logging.getLogger(__name__)
+
+# "schema" sends the agent's JSON schema (strict), "json" asks for any JSON object, "off" sends nothing.
+STRUCTURED_OUTPUT = os.getenv("LLM_STRUCTURED_OUTPUT", "schema").strip().lower()
+JSON_REPAIR_RETRIES = int(os.getenv("LLM_JSON_REPAIR_RETRIES", "1"))
+
+LLM_JSON_REPAIRS = Counter("llm_json_repairs_total", "Repair calls after an invalid JSON answer, by outcome.")
+
+_decoder = json.JSONDecoder()
+# Models that rejected response_format; later calls to them fall back to prompt-only JSON.
+_structured_unsupported = set()
+
+
+# -----------------------------
+# Incremental parsing
+# -----------------------------
+
+class IncrementalJSON:
+    """Parse a streamed JSON object, reporting each top-level field as soon as it is complete.
+
+    Text before the opening brace (e.g. a ```json fence) is ignored. Nested values are
+    reported whole once their closing bracket arrives.
+    """
+
+    def __init__(self, on_field: Optional[Callable[[str, Any], None]] = None):
+        self.on_field = on_field
+        self.fields: Dict[str, Any] = {}
+        self.done = False
+        self._buf = ""
+        self._pos = 0
+        self._phase = "start"
+        self._key = None
+
+    def feed(self, chunk: str) -> None:
+        self._buf += chunk
+        while not self.done and self._step():
+            pass
+
+    def _skip_ws(self) -> bool:
+        buf, pos = self._buf, self._pos
+        while pos < len(buf) and buf[pos] in " \t\r\n":
+            pos += 1
+        self._pos = pos
+        return pos < len(buf)
+
+    def _step(self) -> bool:
+        """Advance one token; False when more input is needed."""
+        if self._phase == "start":
+            start = self._buf.find("{", self._pos)
+            if start < 0:
+                self._pos = len(self._buf)
+                return False
+            self._pos, self._phase = start + 1, "key"
+            return True
+        if not self._skip_ws():
+            return False
+        ch = self._buf[self._pos]
+        if self._phase == "key":
+            if ch == ",":
+                self._pos += 1
+                return True
+            if ch == "}":
+                self.done = True
+                return False
+            try:
+                self._key, self._pos = _decoder.raw_decode(self._buf, self._pos)
+            except ValueError:
+                return False
+            self._phase = "colon"
+            return True
+        if self._phase == "colon":
+            if ch != ":":
+                self.done = True  # not JSON we can follow; the final parse decides
+                return False
+            self._pos += 1
+            self._phase = "value"
+            return True
+        try:
+            value, end = _decoder.raw_decode(self._buf, self._pos)
+        except ValueError:
+            return False
+        if isinstance(value, (int, float)) and not isinstance(value, bool) \
+                and (end == len(self._buf) or self._buf[end] in ".eE+-"):
+            return False  # the number may continue in the next chunk ("-0" then ".25")
+        self._pos, self._phase = end, "key"
+        self.fields[self._key] = value
+        if self.on_field:
+            self.on_field(self._key, value)
+        return True
+
+
+# -----------------------------
+# Schema-constrained calls
+# -----------------------------
+
+def _response_format(agent: str, schema: Optional[dict]) -> Optional[dict]:
+    if STRUCTURED_OUTPUT == "off" or model_name(route(agent)["model"]) in _structured_unsupported:
+        return None
+    if STRUCTURED_OUTPUT == "schema" and schema is not None:
+        return {"type": "json_schema", "json_schema": {"name": agent, "schema": schema, "strict": True}}
+    return {"type": "json_object"}
+
+
+def _rejects_response_format(e: BadRequestError) -> bool:
+    """Whether a 400 is about response_format itself (not context length, content filter, ...)."""
+    text = f"{getattr(e, 'param', None) or ''} {e.message}".lower()
+    return "response_format" in text or "json_schema" in text
+
+
+def _request_model(e: BadRequestError) -> Optional[str]:
+    try:
+        return json.loads(e.request.content).get("model")
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def _repair_prompt(user: str, content: str, error: str) -> str:
+    return (
+        f"{user}\n\nYour previous answer was rejected ({error}):\n{content}\n\n"
+        "Return the corrected JSON object only, following the schema above."
+    )
+
+
+class _JSONAttempts:
+    """Repair-retry bookkeeping shared by llm_json and allm_json."""
+
+    def __init__(self, user: str, agent: str, schema: Optional[dict], check: Optional[Callable[[dict], None]],
+                 on_field: Optional[Callable[[str, Any], None]], retries: Optional[int]):
+        self.user = user
+        self.agent = agent
+        self.schema = schema
+        self.check = check
+        self.on_field = on_field
+        self.retries = JSON_REPAIR_RETRIES if retries is None else retries
+        self.prompt = user
+        self.attempt = 0
+        self.response_format = None
+        self.structured = True
+        self.last = ""
+
+    def validate(self, content: str) -> None:
+        self.last = content
+        data = parse_json_with_repair(content)
+        if not isinstance(data, dict) or not data:
+            raise ValueError("not a JSON object")
+        if self.check:
+            self.check(data)
+
+    def next_call(self) -> dict:
+        """Keyword arguments for the next llm()/allm() call (everything but the system prompt)."""
+        parser = IncrementalJSON(self.on_field) if self.on_field and self.attempt == 0 else None
+        self.response_format = _response_format(self.agent, self.schema) if self.structured else None
+        return dict(user=self.prompt, agent=self.agent, response_format=self.response_format,
+                    validate=self.validate, on_delta=parser.feed if parser else None)
+
+    def accept(self, content: str) -> str:
+        if not content:
+            raise ValueError("empty answer")
+        if self.attempt:
+            LLM_JSON_REPAIRS.inc(agent=self.agent, outcome="repaired")
+        return content
+
+    def reject(self, e: Exception) -> None:
+        """Prepare the next attempt after `e`, or raise when there is none left."""
+        if isinstance(e, BadRequestError):
+            if self.response_format is None or not _rejects_response_format(e):
+                raise e
+            model = _request_model(e) or model_name(route(self.agent)["model"])
+            log.warning("%s rejected response_format (%s); continuing with prompt-only JSON", model, e)
+            _structured_unsupported.add(model)
+            self.structured = False
+            return
+        if self.attempt >= self.retries:
+            if self.attempt:
+                LLM_JSON_REPAIRS.inc(agent=self.agent, outcome="failed")
+            raise ValueError(f"{self.agent} returned invalid JSON after {self.attempt + 1} attempts: {e}") from e
+        self.prompt = _repair_prompt(self.user, self.last, str(e))
+        self.attempt += 1
+
+
+def llm_json(system: str, user: str, agent: str, schema: Optional[dict] = None,
+             check: Optional[Callable[[dict], None]] = None,
+             on_field: Optional[Callable[[str, Any], None]] = None,
+             retries: Optional[int] = None) -> str:
+    """JSON answer text that parses to an object and passes `check`.
+
+    Invalid answers are never cached. Each one triggers a repair call that shows the
+    model its answer and the error, up to `retries` times (LLM_JSON_REPAIR_RETRIES);
+    after that a ValueError is raised instead of returning unusable text.
+    `on_field(key, value)` receives top-level fields while the first answer streams.
+    """
+    attempts = _JSONAttempts(user, agent, schema, check, on_field, retries)
+    while True:
+        try:
+            return attempts.accept(llm(system, **attempts.next_call()))
+        except (BadRequestError, ValueError) as e:
+            attempts.reject(e)
+
+
+async def allm_json(system: str, user: str, agent: str, schema: Optional[dict] = None,
+                    check: Optional[Callable[[dict], None]] = None,
+                    on_field: Optional[Callable[[str, Any], None]] = None,
+                    retries: Optional[int] = None) -> str:
+    """llm_json() for the event loop."""
+    attempts = _JSONAttempts(user, agent, schema, check, on_field, retries)
+    while True:
+        try:
+            return attempts.accept(await allm(system, **attempts.next_call()))
+        except (BadRequestError, ValueError) as e:
+            attempts.reject(e)
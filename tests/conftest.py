@@ -0,0 +1,11 @@
+"""Shared setup: the repo root on sys.path, the fake LLM backend and throwaway data directories."""
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ.setdefault("LLM_BACKEND", "fake")
+os.environ.setdefault("DATA_DIR", tempfile.mkdtemp(prefix="tests-data-"))
+os.environ.setdefault("CACHE_DIR", tempfile.mkdtemp(prefix="tests-cache-"))
@@ -0,0 +1,97 @@
+from cache import TieredCache
+
+
+def make_cache(tmp_path, **kwargs):
+    return TieredCache("test_cache", path=str(tmp_path / "cache.sqlite3"), **dict({"ttl": 60}, **kwargs))
+
+
+def test_memory_tier_is_bounded_by_bytes(tmp_path):
+    cache = make_cache(tmp_path, memory_items=100, memory_max_bytes=2500)
+    for i in range(5):
+        cache.set(f"k{i}", str(i) * 1000)
+    assert list(cache._memory) == ["k3", "k4"]
+    assert cache._memory_bytes == 2000
+    # Evicted entries are still served from disk.
+    assert cache.get("k0") == "0" * 1000
+    assert cache.stats["disk_hits"] == 1
+
+
+def test_value_larger_than_the_memory_tier_stays_on_disk(tmp_path):
+    cache = make_cache(tmp_path, memory_max_bytes=100)
+    cache.set("small", "x")
+    cache.set("big", "y" * 1000)
+    assert list(cache._memory) == ["small"]
+    assert cache.get("big") == "y" * 1000
+    cache.set("small", "z" * 50)
+    assert cache._memory_bytes == 50
+
+
+def test_disk_reload_keeps_the_original_creation_time(tmp_path, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr("cache.time.time", lambda: clock[0])
+    writer = make_cache(tmp_path, ttl=10)
+    writer.set("k", "v")
+    reader = make_cache(tmp_path, ttl=10)
+    clock[0] += 8
+    assert reader.get("k") == "v"  # loaded from disk into memory
+    clock[0] += 3
+    # 11s after it was stored: expired in memory too, not 10s after the reload.
+    assert reader.get("k") is None
+    assert writer.get("k") is None
+
+
+def test_memory_lru_evicts_least_recently_used(tmp_path):
+    cache = make_cache(tmp_path, memory_items=2)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert cache.get("a") == "1"  # "a" is now the most recent
+    cache.set("c", "3")
+    assert list(cache._memory) == ["a", "c"]
+    assert cache.stats["memory_hits"] == 1
+
+
+def test_disk_tier_serves_other_instances(tmp_path):
+    make_cache(tmp_path).set("k", "shared")
+    other = make_cache(tmp_path)
+    assert other.get("k") == "shared"
+    assert other.get("k") == "shared"
+    assert (other.stats["disk_hits"], other.stats["memory_hits"], other.stats["misses"]) == (1, 1, 0)
+    assert other.get("missing") is None
+    assert other.stats["misses"] == 1
+    assert other.hit_ratio() == 2 / 3
+
+
+def test_ttl_expires_entries_in_both_tiers(tmp_path, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr("cache.time.time", lambda: clock[0])
+    cache = make_cache(tmp_path, ttl=10)
+    cache.set("k", "v")
+    clock[0] += 10
+    assert cache.get("k") == "v"
+    clock[0] += 1
+    assert cache.get("k") is None
+    assert make_cache(tmp_path, ttl=10).get("k") is None
+
+
+def test_disk_tier_pruned_to_max_bytes_oldest_access_first(tmp_path, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr("cache.time.time", lambda: clock[0])
+    cache = make_cache(tmp_path, max_bytes=250, memory_items=1)
+    for key in ("a", "b"):
+        clock[0] += 1
+        cache.set(key, key * 100)
+    clock[0] += 1
+    assert cache.get("a") == "a" * 100  # from disk; "b" is now the least recently used
+    clock[0] += 1
+    cache.set("c", "c" * 100)
+    disk = make_cache(tmp_path, max_bytes=250)
+    assert (disk.get("a"), disk.get("b"), disk.get("c")) == ("a" * 100, None, "c" * 100)
+    assert cache.stats["evictions"] == 1
+
+
+def test_clear_empties_both_tiers(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.set("k", "v")
+    cache.clear()
+    assert cache.get("k") is None
+    assert cache._memory_bytes == 0
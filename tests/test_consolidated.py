@@ -0,0 +1,40 @@
+import pytest
+
+import pipeline
+import openai_client
+from agents import CONSOLIDATED_SECTIONS
+from metrics import LLM_LATENCY
+
+CV = "Jane Doe\nBackend developer\n\nEXPERIENCE\nPython and Kubernetes at Acme for 6 years.\n\nLANGUAGES\nSwedish, English"
+JOB = "Backend Engineer\n\nRequirements:\nPython, Kubernetes, fluent Swedish. 5 years of experience."
+
+
+def llm_calls(agent):
+    return sum(v[-2] for k, v in LLM_LATENCY._values.items() if dict(k).get("agent") == agent)
+
+
+@pytest.fixture(autouse=True)
+def no_llm_cache(monkeypatch):
+    monkeypatch.setattr(openai_client, "LLM_CACHE_ENABLED", False)
+
+
+def run(monkeypatch, mode):
+    monkeypatch.setattr(pipeline, "AGENT_CALL_MODE", mode)
+    return pipeline.run_analysis(CV, JOB, "Backend Engineer", "en", "Acme", "open", "good")
+
+
+def test_consolidated_mode_fills_the_same_sections(monkeypatch):
+    separate = run(monkeypatch, "separate")
+    before = {a: llm_calls(a) for a in CONSOLIDATED_SECTIONS + ("consolidated_sections",)}
+    consolidated = run(monkeypatch, "consolidated")
+
+    assert set(consolidated) == set(separate)
+    for key, _title in pipeline.SECTION_TITLES:
+        assert (key in consolidated) == (key in separate)
+    for key in ("deep", "psyche", "interview"):
+        assert consolidated[key].strip()
+        assert key not in consolidated["errors"]
+    # The three sections came from the one consolidated response.
+    assert llm_calls("consolidated_sections") == before["consolidated_sections"] + 1
+    for agent in CONSOLIDATED_SECTIONS:
+        assert llm_calls(agent) == before[agent]
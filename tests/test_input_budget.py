@@ -0,0 +1,97 @@
+import sys
+import types
+
+import pytest
+
+import routing
+import input_budget
+from input_budget import InputFitter, count_tokens
+
+CV = "Jane Doe\nBackend developer\n\n" + "\n\n".join(
+    f"EXPERIENCE\nRole {i} at Company {i}\n" + "Built Python services on Kubernetes and AWS. " * 12
+    for i in range(40)
+)
+JOB = "Backend Engineer\n\nRequirements:\n" + "Python, Kubernetes, fluent Swedish. " * 150
+
+
+@pytest.fixture
+def budget(monkeypatch):
+    def set_budget(agent, tokens):
+        monkeypatch.setitem(routing.ROUTES, agent, dict(routing.route(agent), input_tokens=tokens))
+    return set_budget
+
+
+def test_rewrite_agents_are_not_trimmed_by_default():
+    inputs = InputFitter(CV, JOB, "Backend Engineer")
+    assert inputs.fit_cv("optimize_cv") == CV
+    assert inputs.fit("ats_submission") == (CV, JOB)
+    assert inputs.report == {}
+
+
+def test_cv_only_agent_keeps_its_full_budget(budget):
+    budget("optimize_cv", 2000)
+    budget("ats_submission", 2000)
+    inputs = InputFitter(CV, JOB, "Backend Engineer")
+    cv_only = inputs.fit_cv("optimize_cv")
+    shared_cv, shared_job = inputs.fit("ats_submission")
+    assert 1800 < count_tokens(cv_only) <= 2000
+    assert count_tokens(shared_cv) + count_tokens(shared_job) <= 2000
+    assert count_tokens(cv_only) > count_tokens(shared_cv)
+    assert "job" not in inputs.report["optimize_cv"]
+
+
+def test_no_token_counting_with_trimming_off(monkeypatch):
+    def fail(*args):
+        raise AssertionError("counted tokens with every budget at 0")
+    monkeypatch.setattr(input_budget, "count_tokens", fail)
+    inputs = InputFitter(CV, JOB, "Backend Engineer")
+    assert inputs.fit("recruiter_match") == (CV, JOB)
+    assert inputs.fit_cv("optimize_cv") == CV
+
+
+def test_tokenizer_failure_falls_back_to_estimate(monkeypatch):
+    def unavailable(*args):
+        raise OSError("could not download the BPE file")
+    fake = types.SimpleNamespace(encoding_for_model=unavailable, get_encoding=unavailable)
+    monkeypatch.setitem(sys.modules, "tiktoken", fake)
+    input_budget._encoding.cache_clear()
+    try:
+        assert count_tokens("abcdefgh", "some-model") == 2
+    finally:
+        input_budget._encoding.cache_clear()
+
+
+@pytest.mark.parametrize("cv_tokens, job_tokens, expected", [
+    (3, 20, (3, 7)),
+    (20, 3, (7, 3)),
+    (20, 20, (5, 5)),
+])
+def test_split_budget_gives_spare_half_to_the_other_side(cv_tokens, job_tokens, expected):
+    assert input_budget.split_budget(10, cv_tokens, job_tokens) == expected
+
+
+def test_fit_text_drops_least_relevant_sections():
+    text = "Jane Doe\n\nSKILLS\nPython Kubernetes\n\nHOBBIES\n" + "Sailing and chess. " * 40
+    fitted, report = input_budget.fit_text(text, 20, {"python": 1.0, "kubernetes": 1.0})
+    assert "Python Kubernetes" in fitted
+    assert "Sailing" not in fitted
+    assert report["kept_tokens"] <= 20 < report["tokens"]
+    assert [d.split(":")[0] for d in report["dropped"]] == ["HOBBIES"]
+
+
+def test_shared_budget_fit_is_reported_and_reused(budget, monkeypatch):
+    budget("recruiter_match", 2000)
+    budget("ats_submission", 2000)
+    inputs = InputFitter(CV, JOB, "Backend Engineer")
+    cv, job = inputs.fit("recruiter_match")
+    assert count_tokens(cv) + count_tokens(job) <= 2000
+    assert cv.startswith("Jane Doe")
+    report = inputs.report["recruiter_match"]
+    assert report["budget"] == 2000
+    assert report["cv"]["dropped"] and report["job"]["dropped"]
+
+    def fail(*args):
+        raise AssertionError("refitted inputs for the same budget")
+    monkeypatch.setattr(input_budget, "fit_text", fail)
+    assert inputs.fit("ats_submission") == (cv, job)
+    assert inputs.report["ats_submission"] == report
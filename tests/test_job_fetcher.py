@@ -0,0 +1,71 @@
+import os
+
+import pytest
+
+from job_fetcher import MAX_CHARS, TextStream, _extract_text, extract_text_stream
+
+CORPUS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks", "corpus", "jobs")
+PAGES = sorted(name for name in os.listdir(CORPUS) if name.endswith(".html"))
+
+TRICKY = (
+    "<html><head><title>Jobs</title><style>p { color: red }</style>"
+    "<script>var s = '</p><p>not text</p>'; if (a < b) {}</script></head>"
+    "<body><header><nav>Menu</nav></header>"
+    "<h1>Backend  Engineer</h1><p>Python &amp; Kubernetes,\n  fluent Swedish.</p>"
+    "<noscript>Enable JavaScript</noscript><svg><text>logo</text></svg>"
+    "<ul><li>5 years</li><li>Security clearance</li></ul><p>Åsa &lt;HR&gt;</p>"
+    "<footer>© Acme</footer></body></html>"
+)
+
+
+def read(name):
+    with open(os.path.join(CORPUS, name), encoding="utf-8") as f:
+        return f.read()
+
+
+def chunked(html, size):
+    return [html[i:i + size] for i in range(0, len(html), size)]
+
+
+@pytest.mark.parametrize("size", [1, 7, 64, 4096])
+def test_stream_matches_soup_across_chunk_boundaries(size):
+    text, truncated = extract_text_stream(chunked(TRICKY, size), max_chars=10 ** 9)
+    assert text == _extract_text(TRICKY)
+    assert not truncated
+
+
+@pytest.mark.parametrize("name", PAGES)
+@pytest.mark.parametrize("size", [100, 64 * 1024])
+def test_stream_matches_soup_on_corpus(name, size):
+    html = read(name)
+    text, truncated = extract_text_stream(chunked(html, size), max_chars=10 ** 9)
+    assert text == _extract_text(html)
+    assert not truncated
+
+
+@pytest.mark.parametrize("name", PAGES)
+def test_capped_text_is_a_prefix(name):
+    html = read(name)
+    full = _extract_text(html)
+    stream = TextStream(max_chars=500)
+    for chunk in chunked(html, 1000):
+        stream.feed(chunk)
+    text = stream.close()
+    assert full.startswith(text)
+    assert len(text) <= 500 + max(len(line) for line in full.splitlines())
+    assert stream.full == (len(full) >= 500)
+
+
+def test_stops_reading_once_max_chars_is_collected():
+    html = "<p>" + "word " * 20 + "</p>"
+    read_chunks = []
+
+    def chunks():
+        for _ in range(1000):
+            read_chunks.append(1)
+            yield html
+
+    text, truncated = extract_text_stream(chunks())
+    assert truncated
+    assert MAX_CHARS - 1 <= len(text) < MAX_CHARS + 200
+    assert len(read_chunks) < 250
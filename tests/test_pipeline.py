@@ -0,0 +1,107 @@
+import time
+import asyncio
+
+from pipeline import Step, StepSkipped, run_dag, arun_dag
+
+
+def test_results_flow_to_dependents():
+    results, errors = run_dag([
+        Step("a", lambda: 2),
+        Step("b", lambda a: a * 3, deps=["a"]),
+        Step("c", lambda a, b: a + b, deps=["a", "b"]),
+    ])
+    assert results == {"a": 2, "b": 6, "c": 8}
+    assert errors == {}
+
+
+def test_failed_dependency_skips_dependents():
+    def boom():
+        raise ValueError("bad input")
+
+    results, errors = run_dag([
+        Step("a", boom),
+        Step("b", lambda a: a, deps=["a"]),
+        Step("c", lambda b: b, deps=["b"]),
+        Step("d", lambda: "independent"),
+    ])
+    assert errors["a"] == "ValueError: bad input"
+    assert errors["b"] == "Skipped: dependency 'a' failed"
+    assert errors["c"] == "Skipped: dependency 'b' failed"
+    assert results == {"d": "independent"}
+
+
+def test_optional_dependency_passes_none():
+    def boom():
+        raise RuntimeError("down")
+
+    results, errors = run_dag([
+        Step("a", boom),
+        Step("b", lambda a: "got " + repr(a), deps=["a"], optional=["a"]),
+    ])
+    assert results == {"b": "got None"}
+    assert list(errors) == ["a"]
+
+
+def test_step_skipped_and_unresolved_dependency():
+    def skip():
+        raise StepSkipped("not needed")
+
+    results, errors = run_dag([
+        Step("a", skip),
+        Step("b", lambda x: x, deps=["missing"]),
+    ])
+    assert results == {}
+    assert errors == {"a": "Skipped: not needed", "b": "Skipped: unresolved dependency"}
+
+
+def test_timeout_settles_without_waiting_for_the_step():
+    started = time.monotonic()
+    results, errors = run_dag([
+        Step("slow", lambda: time.sleep(2), timeout=0.2),
+        Step("after", lambda slow: slow, deps=["slow"]),
+        Step("fast", lambda: 1),
+    ])
+    assert time.monotonic() - started < 1.5
+    assert errors["slow"] == "Timed out after 0.2s"
+    assert errors["after"] == "Skipped: dependency 'slow' failed"
+    assert results == {"fast": 1}
+
+
+def test_run_deadline_caps_step_timeouts():
+    results, errors = run_dag([Step("slow", lambda: time.sleep(2), timeout=60)],
+                              deadline=time.monotonic() + 0.2)
+    assert errors == {"slow": "Timed out: run deadline reached"}
+
+
+def test_on_result_sees_every_step():
+    seen = []
+    run_dag([Step("a", lambda: 1), Step("b", lambda a: a, deps=["a"], timeout=5)],
+            on_result=lambda name, value, error: seen.append((name, value, error)))
+    assert seen == [("a", 1, None), ("b", 1, None)]
+
+
+def test_arun_dag_matches_run_dag():
+    async def double(a):
+        await asyncio.sleep(0.01)
+        return a * 2
+
+    async def slow():
+        await asyncio.sleep(2)
+
+    def boom():
+        raise ValueError("bad")
+
+    results, errors = asyncio.run(arun_dag([
+        Step("a", lambda: 2),
+        Step("b", double, deps=["a"]),
+        Step("slow", slow, timeout=0.2),
+        Step("c", boom),
+        Step("d", lambda c: c, deps=["c"], optional=["c"]),
+        Step("e", lambda slow: slow, deps=["slow"]),
+    ]))
+    assert results == {"a": 2, "b": 4, "d": None}
+    assert errors == {
+        "slow": "Timed out after 0.2s",
+        "c": "ValueError: bad",
+        "e": "Skipped: dependency 'slow' failed",
+    }
@@ -0,0 +1,67 @@
+import time
+
+import pytest
+
+import run_store
+from run_store import create_run, get_run, save_result, update_run
+
+
+@pytest.fixture(autouse=True)
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(run_store, "RUNS_DB_PATH", str(tmp_path / "runs.sqlite3"))
+    monkeypatch.setattr(run_store, "_db", None)
+    yield
+    if run_store._db is not None:
+        run_store._db.close()
+
+
+def result(i):
+    # Incompressible text, so each stored run is about 2 KB.
+    return {"text": "".join(chr(0x4e00 + (i * 7919 + n * 104729) % 20000) for n in range(700))}
+
+
+def sizes():
+    return dict(run_store._conn().execute("SELECT id, size FROM runs").fetchall())
+
+
+def test_round_trip():
+    create_run("r1", "running")
+    save_result("r1", {"score": 42}, "sv")
+    run = get_run("r1")
+    assert run["status"] == "done"
+    assert run["result"] == {"score": 42, "lang": "sv"}
+    assert get_run("missing") is None
+
+
+def test_size_prune_drops_oldest_finished_runs(monkeypatch):
+    for i in range(3):
+        create_run(f"d{i}", "running")
+        save_result(f"d{i}", result(i), "en")
+    one = max(sizes().values())
+    monkeypatch.setattr(run_store, "RUNS_MAX_BYTES", int(one * 2.5))
+    create_run("d3", "running")
+    save_result("d3", result(3), "en")
+    assert sorted(sizes()) == ["d2", "d3"]
+
+
+def test_size_prune_keeps_unfinished_and_just_saved_runs(monkeypatch):
+    create_run("queued", "queued")
+    create_run("running", "running")
+    create_run("old", "running")
+    save_result("old", result(0), "en")
+    monkeypatch.setattr(run_store, "RUNS_MAX_BYTES", 1)
+    create_run("new", "running")
+    save_result("new", result(1), "en")
+    assert sorted(sizes()) == ["new", "queued", "running"]
+    # The unfinished runs can still store their results.
+    save_result("running", {"ok": True}, "en")
+    assert get_run("running")["result"] == {"ok": True, "lang": "en"}
+
+
+def test_retention_prune_drops_old_runs(monkeypatch):
+    create_run("old", "running")
+    run_store._conn().execute("UPDATE runs SET created_at = ?", (time.time() - 40 * 86400,))
+    create_run("new", "running")
+    update_run("new", "done", result={"ok": True})
+    assert get_run("old") is None
+    assert get_run("new")["status"] == "done"
@@ -0,0 +1,74 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import FixedWindowRateLimiter
+
+from shared_state import SQLiteLimitsStorage
+
+
+@pytest.fixture
+def uri(tmp_path):
+    return f"sqlite:///{tmp_path / 'state.sqlite3'}"
+
+
+def hit_many(uri, n):
+    storage = SQLiteLimitsStorage(uri)
+    return [storage.incr("shared", 60) for _ in range(n)]
+
+
+def test_registered_for_sqlite_uris(uri):
+    assert isinstance(storage_from_string(uri), SQLiteLimitsStorage)
+
+
+def test_counters_are_shared_across_connections(uri):
+    a, b = SQLiteLimitsStorage(uri), SQLiteLimitsStorage(uri)
+    assert a.incr("k", 60) == 1
+    assert b.incr("k", 60) == 2
+    assert a.incr("k", 60, amount=3) == 5
+    assert b.get("k") == 5
+    assert a.get("other") == 0
+
+
+def test_expiry_starts_a_new_window(uri):
+    a, b = SQLiteLimitsStorage(uri), SQLiteLimitsStorage(uri)
+    before = time.time()
+    a.incr("k", 1)
+    assert before + 1 <= b.get_expiry("k") <= time.time() + 1
+    # Later hits do not extend the window.
+    b.incr("k", 60)
+    assert b.get_expiry("k") <= time.time() + 1
+    time.sleep(1.1)
+    assert a.get("k") == 0
+    assert b.incr("k", 60) == 1
+
+
+def test_clear_and_reset_are_seen_by_other_connections(uri):
+    a, b = SQLiteLimitsStorage(uri), SQLiteLimitsStorage(uri)
+    a.incr("k1", 60)
+    a.incr("k2", 60)
+    b.clear("k1")
+    assert a.get("k1") == 0
+    assert a.get("k2") == 1
+    assert b.reset() == 1
+    assert a.get("k2") == 0
+    assert a.check() and b.check()
+
+
+def test_increments_are_atomic_across_processes(uri):
+    with ProcessPoolExecutor(max_workers=4) as ex:
+        results = list(ex.map(hit_many, [uri] * 4, [25] * 4))
+    counts = sorted(c for r in results for c in r)
+    assert counts == list(range(1, 101))
+    assert SQLiteLimitsStorage(uri).get("shared") == 100
+
+
+def test_fixed_window_limiter_across_connections(uri):
+    limit = parse("3 per minute")
+    a = FixedWindowRateLimiter(SQLiteLimitsStorage(uri))
+    b = FixedWindowRateLimiter(SQLiteLimitsStorage(uri))
+    assert [a.hit(limit, "ip"), b.hit(limit, "ip"), a.hit(limit, "ip")] == [True, True, True]
+    assert not b.hit(limit, "ip")
+    assert a.hit(limit, "other-ip")
@@ -0,0 +1,139 @@
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from pipeline import Step, arun_dag
+from singleflight import SingleFlight
+
+
+def test_do_shares_one_call_between_threads():
+    flight = SingleFlight("test")
+    calls = []
+    gate = threading.Event()
+
+    def work():
+        calls.append(1)
+        gate.wait(5)
+        return "answer"
+
+    with ThreadPoolExecutor(4) as ex:
+        futures = [ex.submit(flight.do, "k", work) for _ in range(4)]
+        time.sleep(0.1)
+        gate.set()
+        results = sorted(f.result() for f in futures)
+    assert calls == [1]
+    assert results == [("answer", False)] + [("answer", True)] * 3
+    # Once settled, the next call runs again.
+    assert flight.do("k", lambda: "again") == ("again", False)
+
+
+def test_do_error_reaches_every_caller():
+    flight = SingleFlight("test")
+    gate = threading.Event()
+
+    def work():
+        gate.wait(5)
+        raise ValueError("upstream failed")
+
+    with ThreadPoolExecutor(3) as ex:
+        futures = [ex.submit(flight.do, "k", work) for _ in range(3)]
+        time.sleep(0.1)
+        gate.set()
+        for f in futures:
+            with pytest.raises(ValueError, match="upstream failed"):
+                f.result()
+    assert flight.do("k", lambda: "recovered") == ("recovered", False)
+
+
+def test_ado_shares_results_and_errors():
+    flight = SingleFlight("test")
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    async def fail():
+        await asyncio.sleep(0.05)
+        raise ValueError("upstream failed")
+
+    async def main():
+        ok = await asyncio.gather(*[flight.ado("ok", work) for _ in range(3)])
+        errors = await asyncio.gather(*[flight.ado("bad", fail) for _ in range(3)], return_exceptions=True)
+        return ok, errors
+
+    ok, errors = asyncio.run(main())
+    assert calls == [1]
+    assert ok == [("answer", False), ("answer", True), ("answer", True)]
+    assert all(isinstance(e, ValueError) for e in errors)
+
+
+def test_ado_leader_cancelled_follower_still_gets_the_result():
+    flight = SingleFlight("test")
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return "answer"
+
+    async def main():
+        leader = asyncio.ensure_future(flight.ado("k", work))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.ado("k", work))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(main()) == ("answer", True)
+    assert calls == [1]
+
+
+def test_ado_cancels_the_call_with_its_last_caller():
+    flight = SingleFlight("test")
+    state = {}
+
+    async def work():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            state["cancelled"] = True
+            raise
+
+    async def quick():
+        return "fresh"
+
+    async def main():
+        callers = [asyncio.ensure_future(flight.ado("k", work)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for c in callers:
+            c.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        # A new caller starts a new call rather than joining the cancelled one.
+        return await flight.ado("k", quick)
+
+    assert asyncio.run(main()) == ("fresh", False)
+    assert state == {"cancelled": True}
+
+
+def test_arun_dag_settles_a_cancelled_step_as_an_error():
+    async def cancelled():
+        raise asyncio.CancelledError()
+
+    async def fine():
+        await asyncio.sleep(0.01)
+        return "ok"
+
+    results, errors = asyncio.run(arun_dag([
+        Step("a", cancelled),
+        Step("b", lambda a: a, deps=["a"]),
+        Step("c", fine),
+    ]))
+    assert results == {"c": "ok"}
+    assert errors == {"a": "Cancelled", "b": "Skipped: dependency 'a' failed"}
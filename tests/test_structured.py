@@ -0,0 +1,80 @@
+import json
+
+import pytest
+
+from structured import IncrementalJSON
+
+DOC = json.dumps({
+    "match_score": 87,
+    "ratio": -0.25,
+    "summary": "Strong \"fit\" for Göteborg\nwith a \\ and é 🚀",
+    "eligible": True,
+    "sponsor": None,
+    "gaps": ["Kubernetes", {"level": "senior", "years": [5, 7]}],
+    "notes": {},
+    "last": 1e3,
+})
+EXPECTED = json.loads(DOC)
+
+
+def parse(chunks):
+    seen = []
+    parser = IncrementalJSON(on_field=lambda key, value: seen.append((key, value)))
+    for chunk in chunks:
+        parser.feed(chunk)
+    return parser, seen
+
+
+@pytest.mark.parametrize("cut", range(1, len(DOC)))
+def test_every_two_chunk_split(cut):
+    parser, seen = parse([DOC[:cut], DOC[cut:]])
+    assert parser.done
+    assert parser.fields == EXPECTED
+    assert seen == list(EXPECTED.items())
+
+
+def test_one_character_chunks_report_fields_as_they_complete():
+    parser = IncrementalJSON()
+    reported = []
+    for i, ch in enumerate(DOC):
+        parser.feed(ch)
+        if len(parser.fields) > len(reported):
+            reported.append(i)
+    assert parser.fields == EXPECTED
+    # A string or nested value is reported on its closing character, not at the end.
+    assert DOC[reported[2]] == '"'
+    assert DOC[reported[5]] == "]"
+
+
+def test_number_waits_for_its_end():
+    parser = IncrementalJSON()
+    parser.feed('{"match_score": 8')
+    assert parser.fields == {}
+    parser.feed('7, "x": 1')
+    assert parser.fields == {"match_score": 87}
+    parser.feed("}")
+    assert parser.fields == {"match_score": 87, "x": 1}
+    assert parser.done
+
+
+@pytest.mark.parametrize("chunks, value", [
+    (['{"r": -0', ".", "25}"], -0.25),
+    (['{"r": 1', "e", "3}"], 1000.0),
+    (['{"r": 2.5E', "-", "1}"], 0.25),
+])
+def test_number_split_inside_fraction_or_exponent(chunks, value):
+    parser, seen = parse(chunks)
+    assert seen == [("r", value)]
+    assert parser.done
+
+
+def test_text_before_the_object_is_ignored():
+    parser, _ = parse(["```json\n", '{"a": [1,', ' 2]}', "\n```"])
+    assert parser.fields == {"a": [1, 2]}
+    assert parser.done
+
+
+def test_stops_on_something_that_is_not_an_object():
+    parser, _ = parse(['{"a": 1, "b" 2}'])
+    assert parser.done
+    assert parser.fields == {"a": 1}
@@ -13,7 +13,8 @@ translations = {
         "download_txt": "Download Enhanced CV (.txt)",
         "hireability_score": "Hireability Score",
         "match_score": "Recruiter Match Score",
-        "run_again": "Run Again"
+        "run_again": "Run Again",
+        "inputs_trimmed": "Long inputs were shortened to fit the agents' token budgets. Left out:"
     },
     "sv": {
         "app_title": "Karriar Sverige AI",
@@ -29,6 +30,7 @@ translations = {
         "download_txt": "Ladda ner Förbättrat CV (.txt)",
         "hireability_score": "Anställningsbarhetspoäng",
         "match_score": "Matchningspoäng",
-        "run_again": "Kör igen"
+        "run_again": "Kör igen",
+        "inputs_trimmed": "Långa underlag kortades för att rymmas i agenternas tokenbudget. Utelämnat:"
     }
 }